@@ -0,0 +1,89 @@
+"""
+Mapa de bits de asientos ocupados por horario.
+
+El asiento N corresponde al bit N-1 (little-endian), así que un bus
+de 40 asientos ocupa solo 5 bytes. Buscar el primer asiento libre es
+una operación de bits, no un recorrido de 1..capacidad.
+"""
+
+
+def a_entero(bitmap):
+    return int.from_bytes(bytes(bitmap or b""), "little")
+
+
+def a_bytes(bits):
+    return bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+
+
+def bit(asiento):
+    """Bit del asiento; los asientos empiezan en 1."""
+    if asiento < 1:
+        raise ValueError(f"Número de asiento inválido: {asiento}")
+    return 1 << (asiento - 1)
+
+
+def desde_asientos(asientos):
+    """Construye el mapa de bits a partir de una lista de números de asiento."""
+    bits = 0
+    for asiento in asientos:
+        bits |= bit(asiento)
+    return a_bytes(bits)
+
+
+def marcar(bitmap, asiento):
+    return a_bytes(a_entero(bitmap) | bit(asiento))
+
+
+def liberar(bitmap, asiento):
+    return a_bytes(a_entero(bitmap) & ~bit(asiento))
+
+
+def esta_ocupado(bitmap, asiento):
+    return bool(a_entero(bitmap) & bit(asiento))
+
+
+def unir(*bitmaps):
+    """Mapa con los asientos marcados en cualquiera de los mapas (ocupados | retenidos)."""
+    bits = 0
+    for bitmap in bitmaps:
+        bits |= a_entero(bitmap)
+    return a_bytes(bits)
+
+
+def contar(bitmap):
+    return a_entero(bitmap).bit_count()
+
+
+def marcados(bitmap):
+    """Lista (ordenada) de los asientos con su bit en 1."""
+    bits = a_entero(bitmap)
+    resultado = []
+
+    while bits:
+        bit = bits & -bits
+        resultado.append(bit.bit_length())
+        bits ^= bit
+
+    return resultado
+
+
+def primer_libre(bitmap, capacidad):
+    """Primer asiento libre en 1..capacidad, o None si el bus está lleno."""
+    libres = ~a_entero(bitmap) & ((1 << capacidad) - 1)
+    if not libres:
+        return None
+    # El bit menos significativo en 1 es el primer asiento libre
+    return (libres & -libres).bit_length()
+
+
+def libres(bitmap, capacidad, cantidad=None):
+    """Lista (ordenada) de asientos libres; como máximo 'cantidad'."""
+    restantes = ~a_entero(bitmap) & ((1 << capacidad) - 1)
+    resultado = []
+
+    while restantes and (cantidad is None or len(resultado) < cantidad):
+        bit = restantes & -restantes
+        resultado.append(bit.bit_length())
+        restantes ^= bit
+
+    return resultado
@@ -26,6 +26,11 @@ class HorarioForm(forms.ModelForm):
         model = Horario
         fields = ['bus', 'ruta', 'hora_salida']
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Bus.__str__ usa la cooperativa: sin esto, una consulta por opción
+        self.fields['bus'].queryset = Bus.objects.select_related('cooperativa')
+
     def save(self, commit=True):
         horario = super().save(commit=False)
         horario.capacidad_total = horario.bus.capacidad
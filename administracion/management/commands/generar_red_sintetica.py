@@ -0,0 +1,240 @@
+import os
+import random
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from administracion.models import CIUDADES, Bus, Cooperativa, Horario, Operador, Ruta
+from reservas.models import Reserva
+from reservas.services import borrar_reservas, sembrar_reservas
+from core.seed_real import pasajero_real
+
+
+PREFIJO = "Coop Sintética"
+PREFIJO_RUC = "99"
+PREFIJO_USUARIO = "op_sint_"
+
+# Ciudades con más salidas (el resto se conecta sobre todo con estas)
+HUBS = ["Quito", "Guayaquil", "Cuenca", "Ambato", "Santo Domingo"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera una red sintética reproducible (con --seed) de cooperativas, buses, "
+        "rutas sobre CIUDADES, horarios recurrentes y reservas, usando inserciones masivas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cooperativas", type=int, default=20)
+        parser.add_argument("--buses", type=int, default=10, help="Buses por cooperativa.")
+        parser.add_argument("--rutas", type=int, default=60, help="Rutas del grafo (pares origen → destino).")
+        parser.add_argument("--rutas-por-cooperativa", type=int, default=6)
+        parser.add_argument("--dias", type=int, default=14, help="Días de horarios a partir de hoy.")
+        parser.add_argument("--salidas-por-dia", type=int, default=2, help="Salidas diarias por bus.")
+        parser.add_argument(
+            "--criticos",
+            type=float,
+            default=0.2,
+            help="Fracción de salidas con ocupación baja (default 0.2).",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--limpiar",
+            action="store_true",
+            help="Borra antes la red sintética generada por este comando.",
+        )
+
+    def handle(self, *args, **options):
+        # Con 0 no hay red que armar (y las rutas por cooperativa dividen por la cantidad)
+        for opcion in (
+            "cooperativas", "buses", "rutas", "rutas_por_cooperativa",
+            "dias", "salidas_por_dia", "batch_size",
+        ):
+            if options[opcion] < 1:
+                raise CommandError(f"--{opcion.replace('_', '-')} debe ser al menos 1.")
+        if not 0 <= options["criticos"] <= 1:
+            raise CommandError("--criticos debe estar entre 0 y 1.")
+
+        rnd = random.Random(options["seed"])
+        random.seed(options["seed"])  # nombres/cédulas de pasajero_real
+        tiempos = {}
+
+        if options["limpiar"]:
+            with self._medir(tiempos, "limpiar"):
+                self._limpiar()
+
+        with self._medir(tiempos, "cooperativas"), transaction.atomic():
+            cooperativas = self._crear_cooperativas(options["cooperativas"])
+
+        with self._medir(tiempos, "rutas"), transaction.atomic():
+            rutas = self._crear_rutas(rnd, options["rutas"])
+
+        with self._medir(tiempos, "buses"), transaction.atomic():
+            buses = self._crear_buses(rnd, cooperativas, options["buses"], options["batch_size"])
+
+        with self._medir(tiempos, "horarios"):
+            self._crear_horarios(rnd, cooperativas, buses, rutas, options)
+
+        with self._medir(tiempos, "reservas"):
+            criticos = options["criticos"]
+
+            def ocupacion(horario_id, capacidad):
+                # Mezcla: salidas flojas (CRÍTICO) y salidas normales/llenas
+                if rnd.random() < criticos:
+                    fraccion = rnd.betavariate(1.5, 8)
+                else:
+                    fraccion = rnd.betavariate(5, 2)
+                return int(round(fraccion * capacidad))
+
+            reservas = sembrar_reservas(
+                Horario.objects.filter(bus__cooperativa__in=cooperativas),
+                ocupacion,
+                pasajero=pasajero_real,
+                asientos_aleatorios=True,
+                batch_size=options["batch_size"],
+                rnd=rnd,
+            )
+
+        self._resumen(tiempos, reservas)
+
+    # -----------------------------
+    # Creación
+    # -----------------------------
+
+    def _crear_cooperativas(self, n):
+        inicio = Cooperativa.objects.filter(nombre__startswith=PREFIJO).count()
+
+        cooperativas = Cooperativa.objects.bulk_create([
+            Cooperativa(
+                nombre=f"{PREFIJO} {i:04d}",
+                ruc=f"{PREFIJO_RUC}{i:011d}",
+                telefono=f"09{i:08d}",
+            )
+            for i in range(inicio + 1, inicio + n + 1)
+        ])
+        cooperativas = list(
+            Cooperativa.objects.filter(nombre__in=[c.nombre for c in cooperativas]).order_by("id")
+        )
+
+        # Un operador por cooperativa (sin contraseña usable) para benchmarks
+        users = User.objects.bulk_create([
+            User(username=f"{PREFIJO_USUARIO}{c.ruc}", password="!") for c in cooperativas
+        ])
+        users = User.objects.filter(username__in=[u.username for u in users]).order_by("username")
+        por_ruc = {u.username[len(PREFIJO_USUARIO):]: u for u in users}
+        Operador.objects.bulk_create([
+            Operador(user=por_ruc[c.ruc], cooperativa=c) for c in cooperativas
+        ])
+
+        return cooperativas
+
+    def _crear_rutas(self, rnd, n):
+        ciudades = [c[0] for c in CIUDADES]
+        existentes = {(r.origen, r.destino): r for r in Ruta.objects.all()}
+
+        pares = []
+        vistos = set()
+        intentos = 0
+        while len(pares) < n and intentos < n * 50:
+            intentos += 1
+            origen = rnd.choice(HUBS) if rnd.random() < 0.7 else rnd.choice(ciudades)
+            destino = rnd.choice(ciudades)
+            if origen == destino or (origen, destino) in vistos:
+                continue
+            vistos.add((origen, destino))
+            pares.append((origen, destino))
+
+        nuevas = [Ruta(origen=o, destino=d) for o, d in pares if (o, d) not in existentes]
+        Ruta.objects.bulk_create(nuevas)
+
+        existentes = {(r.origen, r.destino): r for r in Ruta.objects.all()}
+        return [existentes[p] for p in pares]
+
+    def _crear_buses(self, rnd, cooperativas, por_cooperativa, batch_size):
+        Bus.objects.bulk_create(
+            [
+                Bus(
+                    cooperativa=c,
+                    placa=f"S{i:03d}-{j:04d}",
+                    capacidad=rnd.choice((30, 40, 40, 45, 50)),
+                )
+                for i, c in enumerate(cooperativas, start=1)
+                for j in range(1, por_cooperativa + 1)
+            ],
+            batch_size=batch_size,
+        )
+        return list(Bus.objects.filter(cooperativa__in=cooperativas).order_by("id"))
+
+    def _crear_horarios(self, rnd, cooperativas, buses, rutas, options):
+        hoy = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        rutas_coop = {
+            c.id: rnd.sample(rutas, min(options["rutas_por_cooperativa"], len(rutas)))
+            for c in cooperativas
+        }
+
+        lote = []
+
+        def guardar():
+            with transaction.atomic():
+                Horario.objects.bulk_create(lote, batch_size=options["batch_size"])
+            lote.clear()
+
+        for bus in buses:
+            propias = rutas_coop[bus.cooperativa_id]
+            hora_base = rnd.randrange(5, 12)
+
+            for dia in range(options["dias"]):
+                for k in range(options["salidas_por_dia"]):
+                    lote.append(Horario(
+                        bus=bus,
+                        ruta=propias[(dia + k) % len(propias)],
+                        hora_salida=hoy + timezone.timedelta(
+                            days=dia, hours=hora_base + k * 6, minutes=rnd.choice((0, 15, 30, 45))
+                        ),
+                    ))
+
+            if len(lote) >= options["batch_size"]:
+                guardar()
+
+        if lote:
+            guardar()
+
+    def _limpiar(self):
+        horarios = Horario.objects.filter(bus__cooperativa__nombre__startswith=PREFIJO)
+        borrar_reservas(list(horarios.values_list("id", flat=True)))
+        Cooperativa.objects.filter(nombre__startswith=PREFIJO).delete()
+        User.objects.filter(username__startswith=PREFIJO_USUARIO).delete()
+
+    # -----------------------------
+    # Reporte
+    # -----------------------------
+
+    @contextmanager
+    def _medir(self, tiempos, fase):
+        inicio = time.perf_counter()
+        yield
+        tiempos[fase] = time.perf_counter() - inicio
+
+    def _resumen(self, tiempos, reservas):
+        self.stdout.write("Tabla               Filas")
+        for modelo in (Cooperativa, Operador, Bus, Ruta, Horario, Reserva):
+            self.stdout.write(f"  {modelo.__name__:<16} {modelo.objects.count():>10}")
+
+        self.stdout.write("Fase                Segundos")
+        for fase, segundos in tiempos.items():
+            self.stdout.write(f"  {fase:<16} {segundos:>10.2f}")
+
+        nombre_bd = connection.settings_dict["NAME"]
+        if connection.vendor == "sqlite" and os.path.exists(str(nombre_bd)):
+            self.stdout.write(f"Tamaño de la BD: {os.path.getsize(nombre_bd) / 1024 / 1024:.1f} MB")
+
+        total = sum(tiempos.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ Red sintética generada en {total:.2f}s ({reservas} reservas nuevas)."
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from administracion.models import Horario
+
+
+class Command(BaseCommand):
+    help = "Reconstruye (o verifica) el mapa de asientos y el contador de cada Horario desde la tabla Reserva."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verificar",
+            action="store_true",
+            help="Solo reporta diferencias, no guarda nada (termina con error si hay alguna).",
+        )
+        parser.add_argument(
+            "--horario",
+            type=int,
+            action="append",
+            dest="horarios",
+            help="ID de horario a procesar (se puede repetir). Por defecto, todos.",
+        )
+
+    def handle(self, *args, **options):
+        verificar = options["verificar"]
+
+        with transaction.atomic():
+            distintos = Horario.recalcular_asientos(
+                horario_ids=options["horarios"],
+                guardar=not verificar,
+            )
+
+        for h in distintos:
+            self.stdout.write(f" - Horario #{h.id}: {h.asientos_ocupados} asientos ocupados")
+
+        if verificar:
+            if distintos:
+                raise CommandError(f"{len(distintos)} horarios con mapa de asientos desactualizado.")
+            self.stdout.write(self.style.SUCCESS("✔ Todos los mapas de asientos coinciden con Reserva."))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"✔ {len(distintos)} horarios actualizados."))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:42
+
+from django.db import migrations, models
+
+
+def poblar_asientos(apps, schema_editor):
+    Horario = apps.get_model('administracion', 'Horario')
+    Reserva = apps.get_model('reservas', 'Reserva')
+
+    bits = {}
+    conteo = {}
+    for horario_id, asiento in Reserva.objects.values_list('horario_id', 'asiento').iterator():
+        bits[horario_id] = bits.get(horario_id, 0) | (1 << (asiento - 1))
+        conteo[horario_id] = conteo.get(horario_id, 0) + 1
+
+    horarios = []
+    for horario in Horario.objects.filter(id__in=conteo.keys()):
+        b = bits[horario.id]
+        horario.asientos_bitmap = b.to_bytes((b.bit_length() + 7) // 8, 'little')
+        horario.asientos_ocupados = conteo[horario.id]
+        horarios.append(horario)
+
+    Horario.objects.bulk_update(horarios, ['asientos_bitmap', 'asientos_ocupados'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0001_initial'),
+        ('reservas', '0008_alter_reserva_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='horario',
+            name='asientos_bitmap',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='horario',
+            name='asientos_ocupados',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(poblar_asientos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0002_horario_asientos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='horario',
+            index=models.Index(fields=['ruta', 'hora_salida'], name='horario_ruta_salida_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0003_horario_ruta_salida_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='horario',
+            index=models.Index(fields=['hora_salida', 'id'], name='horario_salida_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0004_horario_horario_salida_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='horario',
+            name='retenidos_bitmap',
+            field=models.BinaryField(default=b''),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+def poblar_retenidos(apps, schema_editor):
+    Horario = apps.get_model('administracion', 'Horario')
+
+    horarios = []
+    for horario in Horario.objects.exclude(retenidos_bitmap=b'').only('id', 'retenidos_bitmap'):
+        horario.asientos_retenidos = int.from_bytes(bytes(horario.retenidos_bitmap), 'little').bit_count()
+        horarios.append(horario)
+
+    Horario.objects.bulk_update(horarios, ['asientos_retenidos'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0005_horario_retenidos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='horario',
+            name='asientos_retenidos',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(poblar_retenidos, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,11 @@
+from django.apps import apps
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
 
+from . import asientos
+from .signals import ocupacion_cambiada
+
 # -----------------------------------
 # LISTA DE CIUDADES (DEBE IR ARRIBA)
 # -----------------------------------
@@ -114,5 +118,137 @@ class Horario(models.Model):
     ruta = models.ForeignKey(Ruta, on_delete=models.CASCADE)
     hora_salida = models.DateTimeField()
 
+    # Desnormalizado desde Reserva (se mantiene en Reserva.save / post_delete)
+    asientos_bitmap = models.BinaryField(default=b"", editable=False)
+    asientos_ocupados = models.PositiveIntegerField(default=0, editable=False)
+
+    # Asientos con una retención vigente (reservas.RetencionAsiento), aparte
+    # de los ocupados: la asignación los salta sin mirar la tabla
+    retenidos_bitmap = models.BinaryField(default=b"", editable=False)
+    # Bits en 1 de retenidos_bitmap, para que las consultas resten los
+    # retenidos sin contar filas (se mantiene en marcar/liberar_retenidos)
+    asientos_retenidos = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Búsqueda de opciones de transferencia por ruta + ventana de salida
+            models.Index(fields=["ruta", "hora_salida"], name="horario_ruta_salida_idx"),
+            # Paginación por clave del listado de horarios
+            models.Index(fields=["hora_salida", "id"], name="horario_salida_idx"),
+        ]
+
     def __str__(self):
         return f"{self.ruta} - {self.hora_salida} - {self.bus.placa}"
+
+    def _no_disponibles(self):
+        return asientos.unir(self.asientos_bitmap, self.retenidos_bitmap)
+
+    def primer_asiento_libre(self):
+        """Primer asiento ni ocupado ni retenido, o None."""
+        return asientos.primer_libre(self._no_disponibles(), self.bus.capacidad)
+
+    def asientos_libres(self, cantidad=None):
+        return asientos.libres(self._no_disponibles(), self.bus.capacidad, cantidad)
+
+    def esta_disponible(self, asiento):
+        return (
+            1 <= asiento <= self.bus.capacidad
+            and not asientos.esta_ocupado(self._no_disponibles(), asiento)
+        )
+
+    def marcar_retenidos(self, lista):
+        """Prende los bits de 'lista' en el mapa de retenidos (el horario debe estar bloqueado)."""
+        for asiento in lista:
+            self.retenidos_bitmap = asientos.marcar(self.retenidos_bitmap, asiento)
+        self.asientos_retenidos = asientos.contar(self.retenidos_bitmap)
+        self.save(update_fields=["retenidos_bitmap", "asientos_retenidos"])
+
+    def liberar_retenidos(self, lista):
+        for asiento in lista:
+            self.retenidos_bitmap = asientos.liberar(self.retenidos_bitmap, asiento)
+        self.asientos_retenidos = asientos.contar(self.retenidos_bitmap)
+        self.save(update_fields=["retenidos_bitmap", "asientos_retenidos"])
+
+    @classmethod
+    def bloquear(cls, horario_ids):
+        """
+        SELECT ... FOR UPDATE de varios horarios (con su bus) en una
+        consulta y en orden de id: si todas las transacciones bloquean en
+        el mismo orden, dos que tocan A y B no se quedan esperando una a
+        la otra (deadlock). Devuelve {id: Horario}.
+        """
+        ids = sorted({int(i) for i in horario_ids if i is not None})
+        horarios = (
+            cls.objects.select_for_update(of=("self",))
+            .select_related("bus")
+            .filter(id__in=ids)
+            .order_by("id")
+        )
+        return {h.id: h for h in horarios}
+
+    @classmethod
+    def ocupar_asiento(cls, horario_id, asiento):
+        """Marca el asiento y suma 1 al contador (con el horario bloqueado)."""
+        horario = cls.objects.select_for_update().filter(pk=horario_id).first()
+        if horario is None:
+            return None
+
+        horario.asientos_bitmap = asientos.marcar(horario.asientos_bitmap, asiento)
+        horario.asientos_ocupados += 1
+        horario.save(update_fields=["asientos_bitmap", "asientos_ocupados"])
+        return horario
+
+    @classmethod
+    def liberar_asiento(cls, horario_id, asiento):
+        """
+        Resta 1 al contador y libera el bit. El índice único
+        (horario, asiento) de Reserva garantiza que nadie más ocupa ese
+        asiento, así que no hace falta consultarlo.
+        """
+        horario = cls.objects.select_for_update().filter(pk=horario_id).first()
+        if horario is None:
+            return None
+
+        horario.asientos_bitmap = asientos.liberar(horario.asientos_bitmap, asiento)
+        horario.asientos_ocupados = max(horario.asientos_ocupados - 1, 0)
+        horario.save(update_fields=["asientos_bitmap", "asientos_ocupados"])
+        return horario
+
+    @classmethod
+    def recalcular_asientos(cls, horario_ids=None, guardar=True):
+        """
+        Reconstruye bitmap y contador desde la tabla Reserva.
+        Devuelve los horarios cuyo valor guardado no coincidía.
+        Se usa después de operaciones masivas (bulk_create, update, ...).
+        """
+        Reserva = apps.get_model("reservas", "Reserva")
+
+        horarios = cls.objects.only("id", "asientos_bitmap", "asientos_ocupados").order_by("id")
+        reservas = Reserva.objects.all()
+        if horario_ids is not None:
+            horarios = horarios.filter(id__in=horario_ids)
+            reservas = reservas.filter(horario_id__in=horario_ids)
+
+        bits = {}
+        conteo = {}
+        for horario_id, asiento in reservas.values_list("horario_id", "asiento").iterator(chunk_size=5000):
+            bits[horario_id] = bits.get(horario_id, 0) | asientos.bit(asiento)
+            conteo[horario_id] = conteo.get(horario_id, 0) + 1
+
+        distintos = []
+        for horario in horarios.iterator(chunk_size=5000):
+            bitmap = asientos.a_bytes(bits.get(horario.id, 0))
+            ocupados = conteo.get(horario.id, 0)
+
+            if bytes(horario.asientos_bitmap) != bitmap or horario.asientos_ocupados != ocupados:
+                horario.asientos_bitmap = bitmap
+                horario.asientos_ocupados = ocupados
+                distintos.append(horario)
+
+        if guardar and distintos:
+            cls.objects.bulk_update(
+                distintos, ["asientos_bitmap", "asientos_ocupados"], batch_size=500
+            )
+            ocupacion_cambiada.send(sender=cls, horario_ids=[h.id for h in distintos])
+
+        return distintos
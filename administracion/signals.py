@@ -0,0 +1,7 @@
+from django.dispatch import Signal
+
+
+# Se envía cuando cambia la ocupación de horarios sin pasar por
+# Horario.save() (bulk_update, update, SQL directo).
+# Argumentos: horario_ids (lista de ids).
+ocupacion_cambiada = Signal()
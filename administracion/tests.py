@@ -1,3 +1,91 @@
+import io
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Sum
 from django.test import TestCase
 
-# Create your tests here.
+from administracion import urls
+from administracion.models import Bus, Cooperativa, Horario, Ruta
+from reservas.models import Reserva
+from core.testing import PresupuestoConsultasMixin
+
+
+class PresupuestoConsultasVistasTests(PresupuestoConsultasMixin, TestCase):
+    URLS = urls
+
+    # url name -> (máximo de consultas, argumentos según los datos sembrados)
+    PRESUPUESTOS = {
+        "login": (0, lambda d: []),
+        "panel_home": (0, lambda d: []),
+        "usuario_home": (3, lambda d: []),
+        "cooperativa_list": (1, lambda d: []),
+        "cooperativa_create": (0, lambda d: []),
+        "bus_list": (1, lambda d: []),
+        "bus_create": (1, lambda d: []),
+        "reserva_list": (1, lambda d: []),
+        "api_buses_por_cooperativa": (3, lambda d: []),
+        "panel_admin": (8, lambda d: []),
+        "super_cooperativa_list": (3, lambda d: []),
+        "super_cooperativa_create": (2, lambda d: []),
+        "super_cooperativa_edit": (3, lambda d: [d["horario"].bus.cooperativa_id]),
+        "super_cooperativa_delete": (3, lambda d: [d["horario"].bus.cooperativa_id]),
+        "super_bus_list": (3, lambda d: []),
+        "super_bus_create": (3, lambda d: []),
+        "super_bus_edit": (4, lambda d: [d["horario"].bus_id]),
+        "super_bus_delete": (4, lambda d: [d["horario"].bus_id]),
+        "super_ruta_list": (3, lambda d: []),
+        "super_ruta_create": (2, lambda d: []),
+        "super_ruta_edit": (3, lambda d: [d["horario"].ruta_id]),
+        "super_ruta_delete": (3, lambda d: [d["horario"].ruta_id]),
+        "super_horario_list": (3, lambda d: []),
+        "super_horario_create": (4, lambda d: []),
+        "super_horario_edit": (5, lambda d: [d["horario"].id]),
+        "super_horario_delete": (5, lambda d: [d["horario"].id]),
+        "operador_list": (3, lambda d: []),
+        "operador_create": (3, lambda d: []),
+        "operador_edit": (6, lambda d: [d["operador"].id]),
+        "operador_delete": (4, lambda d: [d["operador"].id]),
+        "exportar_datos": (3, lambda d: ["reservas"]),
+        "buscar_pasajero": (5, lambda d: []),
+        "logout": (4, lambda d: []),
+    }
+
+    # url name -> querystring según los datos sembrados (las que lo necesitan)
+    PARAMETROS = {
+        "buscar_pasajero": lambda d: {"q": d["transferida"].cedula},
+    }
+
+    # Vistas que hoy no renderizan; salen de la lista cuando se arreglen
+    EXCLUIDAS = {
+        "reserva_create": "el formulario pide el campo 'pasajeros', que Reserva no tiene",
+        "monitoreo": "falta la plantilla administracion/monitoreo.html",
+    }
+
+
+class GenerarRedSinteticaTests(TestCase):
+    OPCIONES = {
+        "cooperativas": 2, "buses": 2, "rutas": 4, "rutas_por_cooperativa": 2,
+        "dias": 2, "salidas_por_dia": 2, "seed": 7, "stdout": io.StringIO(),
+    }
+
+    def _foto(self):
+        horarios = Horario.objects.filter(bus__cooperativa__nombre__startswith="Coop Sintética")
+        return (
+            Cooperativa.objects.count(), Bus.objects.count(), Ruta.objects.count(),
+            horarios.count(), Reserva.objects.count(),
+            horarios.aggregate(total=Sum("asientos_ocupados"))["total"],
+        )
+
+    def test_misma_semilla_misma_red(self):
+        call_command("generar_red_sintetica", **self.OPCIONES)
+        primera = self._foto()
+        call_command("generar_red_sintetica", limpiar=True, **self.OPCIONES)
+
+        self.assertEqual(self._foto(), primera)
+        self.assertEqual(primera[4], primera[5])
+
+    def test_cantidades_en_cero(self):
+        for opcion in ("rutas", "rutas_por_cooperativa"):
+            with self.assertRaisesMessage(CommandError, "debe ser al menos 1"):
+                call_command("generar_red_sintetica", **{**self.OPCIONES, opcion: 0})
@@ -70,6 +70,12 @@ urlpatterns = [
     path('panel/operadores/<int:pk>/editar/', views.operador_edit, name='operador_edit'),
     path('panel/operadores/<int:pk>/eliminar/', views.operador_delete, name='operador_delete'),
 
+    # EXPORTACIÓN (Panel)
+    path('panel/exportar/<str:tipo>/', views.exportar_datos, name='exportar_datos'),
+
+    # BÚSQUEDA DE PASAJEROS (Panel): por cédula o prefijo de nombre
+    path('panel/pasajeros/', views.buscar_pasajero, name='buscar_pasajero'),
+
 
 
 ]
@@ -2,7 +2,9 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponseForbidden
+from django.http import (
+    Http404, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse,
+)
 from django.views.generic import ListView, CreateView, TemplateView
 from django.urls import reverse_lazy
 from django.db.models import Count
@@ -19,6 +21,12 @@ from .forms import (
 )
 from .models import Cooperativa, Bus, Ruta, Horario, Operador
 from reservas.models import Reserva
+from core.metricas import PANEL_SEGUNDOS, cronometrar
+from core.paginacion import KeysetPaginationMixin, paginar_keyset
+from core.services.busqueda_pasajeros_service import buscar_pasajeros
+from core.services.exportacion_service import (
+    EXPORTABLES, FORMATOS, exportar, nombre_archivo, parsear_fecha,
+)
 
 
 # =======================
@@ -116,6 +124,7 @@ def usuario_home(request):
 # =======================
 
 @login_required
+@cronometrar(PANEL_SEGUNDOS, vista="panel_admin")
 def panel_admin(request):
     if not _solo_staff(request):
         return HttpResponseForbidden("No tienes permiso para ver este panel.")
@@ -160,8 +169,9 @@ class CooperativaCreateView(CreateView):
     success_url = reverse_lazy('cooperativa_list')
 
 
-class BusListView(ListView):
+class BusListView(KeysetPaginationMixin, ListView):
     model = Bus
+    queryset = Bus.objects.select_related('cooperativa')
     template_name = 'administracion/bus_list.html'
     context_object_name = 'buses'
 
@@ -173,8 +183,9 @@ class BusCreateView(CreateView):
     success_url = reverse_lazy('bus_list')
 
 
-class ReservaListView(ListView):
+class ReservaListView(KeysetPaginationMixin, ListView):
     model = Reserva
+    queryset = Reserva.objects.select_related('horario__bus', 'horario__ruta')
     template_name = 'administracion/reserva_list.html'
     context_object_name = 'reservas'
 
@@ -262,8 +273,10 @@ def cooperativa_delete(request, pk):
 def bus_list(request):
     if not _solo_staff(request):
         return HttpResponseForbidden("No tienes permiso.")
-    buses = Bus.objects.select_related('cooperativa')
-    return render(request, 'administracion/bus_list.html', {'buses': buses})
+    buses = paginar_keyset(
+        Bus.objects.select_related('cooperativa'), ('id',), request.GET.get('cursor')
+    )
+    return render(request, 'administracion/bus_list.html', {'buses': buses, 'pagina': buses})
 
 
 @login_required
@@ -362,9 +375,14 @@ def ruta_delete(request, pk):
 def horario_list(request):
     if not _solo_staff(request):
         return HttpResponseForbidden("No tienes permiso.")
-    horarios = Horario.objects.select_related('bus', 'ruta')
+    horarios = paginar_keyset(
+        Horario.objects.select_related('bus__cooperativa', 'ruta'),
+        ('hora_salida', 'id'),
+        request.GET.get('cursor'),
+    )
     return render(request, 'administracion/horario_list.html', {
-        'horarios': horarios
+        'horarios': horarios,
+        'pagina': horarios,
     })
 
 
@@ -477,3 +495,58 @@ def operador_delete(request, pk):
     return render(request, "administracion/operador_confirm_delete.html", {
         "operador": operador
     })
+
+
+# --- EXPORTACIÓN (Panel) ---
+
+@login_required
+def exportar_datos(request, tipo):
+    """
+    Volcado en streaming de reservas / transferencias / negociaciones.
+    ?formato=csv|ndjson  &cooperativa=<id>  &desde=AAAA-MM-DD  &hasta=AAAA-MM-DD  &gzip=1
+    """
+    if not _solo_staff(request):
+        return HttpResponseForbidden("No tienes permiso.")
+    if tipo not in EXPORTABLES:
+        raise Http404("Tipo de exportación desconocido.")
+
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS:
+        return HttpResponseBadRequest("Formato no soportado.")
+
+    try:
+        cooperativa = request.GET.get('cooperativa')
+        cooperativa_id = int(cooperativa) if cooperativa else None
+        desde = parsear_fecha(request.GET.get('desde'))
+        hasta = parsear_fecha(request.GET.get('hasta'))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    comprimir = request.GET.get('gzip') == '1'
+
+    response = StreamingHttpResponse(
+        exportar(tipo, formato, cooperativa_id, desde, hasta, comprimir=comprimir),
+        content_type='application/gzip' if comprimir else f'{FORMATOS[formato]}; charset=utf-8',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{nombre_archivo(tipo, formato, comprimir)}"'
+    )
+    return response
+
+
+# --- BÚSQUEDA DE PASAJEROS (Panel) ---
+
+@login_required
+def buscar_pasajero(request):
+    """
+    ?q=<cédula> o ?q=<prefijo de nombre>: dónde está hoy el pasajero
+    (horario y asiento) y por qué transferencias pasó, en orden.
+    """
+    if not _solo_staff(request):
+        return HttpResponseForbidden("No tienes permiso.")
+
+    q = request.GET.get('q', '').strip()
+    return render(request, 'administracion/buscar_pasajero.html', {
+        'q': q,
+        'resultados': buscar_pasajeros(q),
+    })
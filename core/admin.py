@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import TransferLog
+from .models import IncidenteCooperativa, ReactivacionLog, SolicitudIdempotente, TransferLog
 
 @admin.register(TransferLog)
 class TransferLogAdmin(admin.ModelAdmin):
@@ -13,4 +13,27 @@ class TransferLogAdmin(admin.ModelAdmin):
         'estado',
     )
     list_filter = ('estado', 'fecha')
-    search_fields = ('reservas',)
+    list_select_related = ('operador', 'origen__ruta', 'origen__bus', 'destino__ruta', 'destino__bus')
+    # Por id o cédula de la reserva, vía el índice TransferLogReserva (no el JSON)
+    search_fields = ('=enlaces__reserva__id', '=enlaces__reserva__cedula')
+
+
+@admin.register(IncidenteCooperativa)
+class IncidenteCooperativaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'fecha', 'expira', 'cooperativa', 'bus', 'ruta', 'activo')
+    list_filter = ('activo',)
+    list_select_related = ('cooperativa', 'bus__cooperativa', 'ruta')
+
+
+@admin.register(ReactivacionLog)
+class ReactivacionLogAdmin(admin.ModelAdmin):
+    list_display = ('id', 'fecha', 'operador', 'cooperativa', 'criterio', 'cantidad', 'incidente')
+    list_filter = ('criterio', 'fecha')
+    list_select_related = ('operador', 'cooperativa', 'incidente__cooperativa')
+
+
+@admin.register(SolicitudIdempotente)
+class SolicitudIdempotenteAdmin(admin.ModelAdmin):
+    list_display = ('id', 'fecha', 'operador', 'operacion', 'clave', 'ok')
+    list_filter = ('ok',)
+    list_select_related = ('operador',)
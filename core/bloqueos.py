@@ -0,0 +1,16 @@
+import time
+
+from administracion.models import Horario
+from core import metricas
+
+
+def bloquear_horarios(horario_ids, via):
+    """
+    Horario.bloquear() (todos en orden de id, una consulta) midiendo la
+    espera en smartbus_espera_bloqueo_segundos{via=...}. Va al principio
+    de la transacción, antes de leer capacidad u ocupación.
+    """
+    inicio = time.perf_counter()
+    horarios = Horario.bloquear(horario_ids)
+    metricas.ESPERA_BLOQUEO_SEGUNDOS.observar(time.perf_counter() - inicio, via=via)
+    return horarios
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.services.retencion_service import barrer_retenciones
+
+
+class Command(BaseCommand):
+    help = (
+        "Libera las retenciones de asiento vencidas (borra la fila y apaga el bit "
+        "en el horario), por lotes. Con --cada queda corriendo como proceso de fondo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote", type=int,
+            help="Retenciones por lote (por defecto RETENCION_ASIENTOS['LOTE_BARRIDO']).",
+        )
+        parser.add_argument(
+            "--cada", type=float,
+            help="Repetir cada N segundos (sin esto, una sola pasada).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            liberadas = barrer_retenciones(lote=options["lote"])
+            if liberadas or not options["cada"]:
+                self.stdout.write(f"✔ {liberadas} retenciones vencidas liberadas")
+            if not options["cada"]:
+                return
+            time.sleep(options["cada"])
@@ -0,0 +1,209 @@
+import io
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+import django
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from administracion.models import Horario, Operador
+from reservas.models import Reserva
+from core.services import build_transferencia_facade
+from core.services_old import buscar_opciones_transferencia, ejecutar_transferencia
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide tiempo y número de consultas de los caminos críticos (panel, transferencias, "
+        "estadísticas, facade) sobre redes sintéticas de varios tamaños. Corre en una BD de "
+        "prueba aparte y emite JSON para comparar entre commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tamanos",
+            default="2,10,40",
+            help="Cantidad de cooperativas de cada red sintética, separadas por coma (default 2,10,40).",
+        )
+        parser.add_argument("--buses", type=int, default=10, help="Buses por cooperativa.")
+        parser.add_argument("--dias", type=int, default=7)
+        parser.add_argument("--repeticiones", type=int, default=5)
+        parser.add_argument("--pasajeros", type=int, default=5, help="Pasajeros por transferencia.")
+        parser.add_argument("--salida", help="Archivo JSON de salida (por defecto, stdout).")
+
+    def handle(self, *args, **options):
+        nombre_original = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+        try:
+            resultados = []
+            for tamano in [int(t) for t in options["tamanos"].split(",") if t.strip()]:
+                call_command(
+                    "generar_red_sintetica",
+                    limpiar=True,
+                    cooperativas=tamano,
+                    buses=options["buses"],
+                    dias=options["dias"],
+                    stdout=io.StringIO(),
+                )
+                resultados.extend(self._medir_red(tamano, options))
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+        reporte = {
+            "commit": _commit_actual(),
+            "fecha": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "repeticiones": options["repeticiones"],
+            "resultados": resultados,
+        }
+        texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+
+        if options["salida"]:
+            with open(options["salida"], "w", encoding="utf-8") as f:
+                f.write(texto)
+            for r in resultados:
+                self.stdout.write(
+                    f"{r['horarios']:>7} horarios | {r['caso']:<28} "
+                    f"{r['mediana_ms']:>9.2f} ms | {r['consultas_max']:>5} consultas"
+                )
+            self.stdout.write(self.style.SUCCESS(f"✔ Resultados guardados en {options['salida']}"))
+        else:
+            self.stdout.write(texto)
+
+    # -----------------------------
+    # Casos
+    # -----------------------------
+
+    def _medir_red(self, tamano, options):
+        operador = Operador.objects.select_related("user", "cooperativa").order_by("id").first()
+        coop = operador.cooperativa
+
+        admin, _ = User.objects.get_or_create(username="benchmark_admin", defaults={"is_staff": True})
+        cliente_operador = Client()
+        cliente_operador.force_login(operador.user)
+        cliente_admin = Client()
+        cliente_admin.force_login(admin)
+
+        facade = build_transferencia_facade()
+        origen, destino = self._par_transferencia(coop, options["pasajeros"])
+        critico, destino_critico = self._par_critico(coop, facade)
+
+        # (nombre, función, verificación): los casos que transfieren tienen
+        # que transferir de verdad; si no, se estaría midiendo un rechazo
+        casos = [
+            ("panel_operador", lambda: cliente_operador.get(reverse("panel_operador")), None),
+            ("panel_admin", lambda: cliente_admin.get(reverse("panel_admin")), None),
+            ("estadisticas_reserva", lambda: cliente_operador.get(reverse("estadisticas_reserva", args=[origen.id])), None),
+            ("transferencias GET", lambda: cliente_operador.get(reverse("transferencias", args=[origen.id])), None),
+        ]
+
+        if destino is not None:
+            ids = list(
+                Reserva.objects.filter(horario=origen).order_by("asiento")
+                .values_list("id", flat=True)[:options["pasajeros"]]
+            )
+            casos += [
+                ("transferencias POST", lambda: cliente_operador.post(
+                    reverse("transferencias", args=[origen.id]),
+                    {"reservas": ids, "destino": destino.id},
+                ), _redirige_al_panel),
+                ("ejecutar_transferencia", lambda: ejecutar_transferencia(
+                    Reserva.objects.filter(id__in=ids), destino
+                ), lambda resultado: resultado[0]),
+            ]
+
+        if destino_critico is not None:
+            casos.append((
+                "TransferenciaFacade.ejecutar",
+                lambda: facade.ejecutar(critico, destino_critico),
+                lambda resultado: resultado["ok"],
+            ))
+
+        tamanos = {
+            "cooperativas": tamano,
+            "horarios": Horario.objects.count(),
+            "reservas": Reserva.objects.count(),
+        }
+        return [
+            dict(tamanos, **self._medir(nombre, fn, verificar, options["repeticiones"]))
+            for nombre, fn, verificar in casos
+        ]
+
+    def _medir(self, nombre, fn, verificar, repeticiones):
+        tiempos = []
+        consultas = []
+
+        for _ in range(repeticiones):
+            # Cada corrida se revierte: las transferencias no cambian la red
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as ctx:
+                    inicio = time.perf_counter()
+                    resultado = fn()
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                consultas.append(len(ctx))
+                transaction.set_rollback(True)
+
+            if verificar is not None and not verificar(resultado):
+                raise CommandError(f"{nombre}: no transfirió, se estaría midiendo un rechazo ({resultado!r}).")
+
+        return {
+            "caso": nombre,
+            "mediana_ms": round(statistics.median(tiempos), 3),
+            "min_ms": round(min(tiempos), 3),
+            "max_ms": round(max(tiempos), 3),
+            "consultas": consultas,
+            "consultas_max": max(consultas),
+        }
+
+    def _par_transferencia(self, coop, pasajeros):
+        ahora = timezone.now()
+        candidatos = (
+            Horario.objects.filter(bus__cooperativa=coop, hora_salida__gt=ahora, asientos_ocupados__gte=pasajeros)
+            .exclude(reserva__transferida=True)
+            .order_by("hora_salida")
+        )
+        for origen in candidatos[:50]:
+            opciones = [h for h in buscar_opciones_transferencia(origen, pasajeros) if h.bus.cooperativa_id == coop.id]
+            if opciones:
+                return origen, opciones[0]
+        return candidatos.first(), None
+
+    def _par_critico(self, coop, facade):
+        # Solo orígenes que la regla de umbral de la facade deja transferir
+        ahora = timezone.now()
+        for h in Horario.objects.filter(
+            bus__cooperativa=coop, hora_salida__gt=ahora, asientos_ocupados__gt=0
+        ).select_related("bus").order_by("asientos_ocupados")[:50]:
+            ocupacion, _, _ = facade.ocupacion_service.calcular(h)
+            if not facade.umbral_strategy.cumple(ocupacion):
+                continue
+            opciones = buscar_opciones_transferencia(h, h.asientos_ocupados)
+            if opciones:
+                return h, opciones[0]
+        return None, None
+
+
+def _redirige_al_panel(response):
+    # La vista redirige al panel si transfirió y de vuelta al formulario si no
+    return response.status_code == 302 and response.url == reverse("panel_operador")
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
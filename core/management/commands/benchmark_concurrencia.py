@@ -0,0 +1,181 @@
+import io
+import json
+import random
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from administracion.models import Horario
+from reservas.models import Reserva
+from core import metricas
+from core.services_old import ejecutar_transferencia
+
+
+# El modo WAL queda grabado en el archivo: el perfil por defecto lo vuelve a DELETE
+PERFILES = {
+    "defecto": {"init_command": "PRAGMA journal_mode=DELETE"},
+    "produccion": settings.SQLITE_OPCIONES_PRODUCCION,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Lecturas y transferencias concurrentes (hilos) sobre una BD SQLite de prueba en "
+        "archivo, con el perfil por defecto y con el de producción (WAL, pragmas, BEGIN "
+        "IMMEDIATE). Reporta throughput, latencia, errores de bloqueo y reintentos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lectores", type=int, default=4, help="Hilos que solo leen.")
+        parser.add_argument("--escritores", type=int, default=4, help="Hilos que transfieren.")
+        parser.add_argument("--segundos", type=float, default=5.0, help="Duración de cada corrida.")
+        parser.add_argument("--cooperativas", type=int, default=4)
+        parser.add_argument("--destinos", type=int, default=10, help="Horarios destino que se disputan los escritores.")
+        parser.add_argument(
+            "--perfiles", default="defecto,produccion",
+            help=f"Perfiles a comparar, separados por coma ({', '.join(PERFILES)}).",
+        )
+        parser.add_argument(
+            "--sin-reintentos", action="store_true",
+            help="Un solo intento por transferencia: muestra los 'database is locked' crudos.",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--salida", help="Archivo JSON con los resultados.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Este benchmark compara perfiles de SQLite.")
+        perfiles = [p.strip() for p in options["perfiles"].split(",") if p.strip()]
+        desconocidos = set(perfiles) - set(PERFILES)
+        if desconocidos:
+            raise CommandError(f"Perfiles desconocidos: {', '.join(sorted(desconocidos))}")
+
+        reintentos = dict(getattr(settings, "REINTENTOS_BLOQUEO", {}))
+        if options["sin_reintentos"]:
+            reintentos["INTENTOS"] = 1
+
+        nombre_original = connection.settings_dict["NAME"]
+        opciones_originales = connection.settings_dict.get("OPTIONS", {})
+        resultados = []
+
+        with tempfile.TemporaryDirectory() as directorio, override_settings(REINTENTOS_BLOQUEO=reintentos):
+            # Un archivo (no :memory:): los hilos abren sus propias conexiones
+            connection.settings_dict["TEST"]["NAME"] = str(Path(directorio) / "concurrencia.sqlite3")
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                for perfil in perfiles:
+                    self._usar_perfil(perfil)
+                    # Misma red (misma semilla) para cada perfil
+                    call_command(
+                        "generar_red_sintetica", limpiar=True, seed=options["seed"],
+                        cooperativas=options["cooperativas"], buses=5, dias=7,
+                        stdout=io.StringIO(),
+                    )
+                    resultados.append(self._correr(perfil, options))
+            finally:
+                connection.settings_dict["OPTIONS"] = opciones_originales
+                connection.close()
+                connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+        for r in resultados:
+            self.stdout.write(
+                f"{r['perfil']:<11} | lecturas {r['lecturas_por_s']:>8.1f}/s "
+                f"| transferencias {r['transferencias_por_s']:>7.1f}/s "
+                f"(p50 {r['transferencia_p50_ms']:.1f} ms, p95 {r['transferencia_p95_ms']:.1f} ms) "
+                f"| bloqueos {r['errores_bloqueo']:>4} | reintentos {r['reintentos']:>4}"
+            )
+        if options["salida"]:
+            with open(options["salida"], "w", encoding="utf-8") as f:
+                json.dump(resultados, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"✔ Resultados guardados en {options['salida']}"))
+
+    def _usar_perfil(self, perfil):
+        # Los hilos crean sus conexiones con este mismo settings_dict
+        connection.settings_dict["OPTIONS"] = dict(PERFILES[perfil])
+        connection.close()
+
+    def _correr(self, perfil, options):
+        rnd = random.Random(options["seed"])
+        ahora = timezone.now()
+
+        destinos = list(
+            Horario.objects.filter(hora_salida__gt=ahora + timezone.timedelta(hours=1))
+            .order_by("asientos_ocupados", "id")[:options["destinos"]]
+        )
+        pendientes = list(
+            Reserva.objects.filter(transferida=False, horario__hora_salida__gt=ahora)
+            .exclude(horario__in=destinos)
+            .values_list("id", flat=True)
+        )
+        rnd.shuffle(pendientes)
+        horario_ids = list(Horario.objects.values_list("id", flat=True))
+
+        fin = time.perf_counter() + options["segundos"]
+        lecturas = [0] * options["lectores"]
+        latencias = [[] for _ in range(options["escritores"])]
+        errores = [0] * options["escritores"]
+        reintentos_antes = metricas.REINTENTOS_BLOQUEO.valor(via="ejecutar_transferencia")
+
+        def lector(n):
+            r = random.Random(n)
+            try:
+                while time.perf_counter() < fin:
+                    list(
+                        Horario.objects.filter(hora_salida__gt=ahora)
+                        .select_related("bus", "ruta").order_by("hora_salida", "id")[:50]
+                    )
+                    Reserva.objects.filter(horario_id=r.choice(horario_ids)).count()
+                    lecturas[n] += 1
+            finally:
+                connections.close_all()
+
+        def escritor(n):
+            r = random.Random(1000 + n)
+            propias = pendientes[n::options["escritores"]]
+            try:
+                for reserva_id in propias:
+                    if time.perf_counter() >= fin:
+                        break
+                    inicio = time.perf_counter()
+                    try:
+                        ejecutar_transferencia(Reserva.objects.filter(id=reserva_id), r.choice(destinos))
+                    except OperationalError:
+                        errores[n] += 1
+                        continue
+                    latencias[n].append((time.perf_counter() - inicio) * 1000)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=lector, args=(i,)) for i in range(options["lectores"])]
+        hilos += [threading.Thread(target=escritor, args=(i,)) for i in range(options["escritores"])]
+        inicio = time.perf_counter()
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        duracion = time.perf_counter() - inicio
+
+        todas = sorted(ms for lista in latencias for ms in lista)
+        return {
+            "perfil": perfil,
+            "segundos": round(duracion, 2),
+            "lectores": options["lectores"],
+            "escritores": options["escritores"],
+            "lecturas_por_s": round(sum(lecturas) / duracion, 1),
+            "transferencias_por_s": round(len(todas) / duracion, 1),
+            "transferencia_p50_ms": round(statistics.median(todas), 2) if todas else 0.0,
+            "transferencia_p95_ms": round(todas[int(len(todas) * 0.95) - 1], 2) if todas else 0.0,
+            "errores_bloqueo": sum(errores),
+            "reintentos": int(
+                metricas.REINTENTOS_BLOQUEO.valor(via="ejecutar_transferencia") - reintentos_antes
+            ),
+        }
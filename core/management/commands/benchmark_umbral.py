@@ -0,0 +1,39 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.strategies import UmbralPorcentajeStrategy, UmbralRangoStrategy
+from core.strategies import umbral_strategy
+
+
+class Command(BaseCommand):
+    help = "Compara cumple() (uno por uno) contra cumple_muchos() (por lotes) en N porcentajes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("-n", type=int, default=1_000_000, help="Cantidad de valores (default 1M).")
+
+    def handle(self, *args, **options):
+        rnd = random.Random(42)
+        valores = [round(rnd.uniform(0, 100), 2) for _ in range(options["n"])]
+
+        backend = "NumPy" if umbral_strategy.np is not None else "Python puro (sin NumPy)"
+        self.stdout.write(f"{len(valores)} valores | cumple_muchos con {backend}")
+
+        for strategy in (UmbralPorcentajeStrategy(30), UmbralRangoStrategy(20, 60)):
+            inicio = time.perf_counter()
+            escalar = [strategy.cumple(x) for x in valores]
+            t_escalar = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            lote = strategy.cumple_muchos(valores)
+            t_lote = time.perf_counter() - inicio
+
+            if list(map(bool, lote)) != escalar:
+                self.stdout.write(self.style.ERROR(f"{type(strategy).__name__}: resultados distintos"))
+                continue
+
+            self.stdout.write(
+                f"{type(strategy).__name__:<26} cumple: {t_escalar:.3f}s | "
+                f"cumple_muchos: {t_lote:.3f}s | x{t_escalar / t_lote:.1f}"
+            )
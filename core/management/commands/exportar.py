@@ -0,0 +1,56 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.exportacion_service import (
+    EXPORTABLES, FORMATOS, EstadisticasExportacion, exportar, parsear_fecha,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta reservas, transferencias o negociaciones (CSV o NDJSON, opcionalmente "
+        "gzip) en streaming, con memoria constante, y reporta el throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("tipo", choices=sorted(EXPORTABLES))
+        parser.add_argument("--formato", choices=sorted(FORMATOS), default="csv")
+        parser.add_argument("--cooperativa", type=int, help="Solo filas de esta cooperativa (id).")
+        parser.add_argument("--desde", help="AAAA-MM-DD o fecha/hora ISO (incluida).")
+        parser.add_argument("--hasta", help="AAAA-MM-DD o fecha/hora ISO (excluida).")
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument("--salida", default="-", help="Archivo de salida ('-' = stdout).")
+
+    def handle(self, *args, **options):
+        try:
+            desde = parsear_fecha(options["desde"])
+            hasta = parsear_fecha(options["hasta"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        estadisticas = EstadisticasExportacion()
+        bloques = exportar(
+            options["tipo"],
+            options["formato"],
+            options["cooperativa"],
+            desde,
+            hasta,
+            comprimir=options["gzip"],
+            chunk_size=options["chunk_size"],
+            estadisticas=estadisticas,
+        )
+
+        if options["salida"] == "-":
+            salida = getattr(self.stdout._out, "buffer", None) or sys.stdout.buffer
+            for bloque in bloques:
+                salida.write(bloque)
+            salida.flush()
+        else:
+            with open(options["salida"], "wb") as salida:
+                for bloque in bloques:
+                    salida.write(bloque)
+
+        # El resumen va a stderr: stdout puede ser el volcado
+        self.stderr.write(f"✔ {options['tipo']}: {estadisticas.resumen()}")
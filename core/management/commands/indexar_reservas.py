@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.indice_reservas_service import INDICES, indexar_reservas, verificar_indice
+
+
+class Command(BaseCommand):
+    help = (
+        "Llena las tablas de enlaces log↔reserva y negociación↔reserva a partir de "
+        "las listas JSON existentes. Idempotente; con --verificar solo compara."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tipo", choices=sorted(INDICES),
+            help="Qué indexar (por defecto, todo).",
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--verificar", action="store_true",
+            help="No escribe: lista las filas cuyo índice no coincide con el JSON.",
+        )
+
+    def handle(self, *args, **options):
+        tipos = [options["tipo"]] if options["tipo"] else sorted(INDICES)
+        chunk_size = options["chunk_size"]
+
+        if options["verificar"]:
+            errores = 0
+            for tipo in tipos:
+                distintos = verificar_indice(tipo, chunk_size)
+                errores += len(distintos)
+                if distintos:
+                    muestra = ", ".join(map(str, distintos[:20])) + (", ..." if len(distintos) > 20 else "")
+                    self.stdout.write(f"✘ {tipo}: {len(distintos)} sin indexar ({muestra})")
+                else:
+                    self.stdout.write(f"✔ {tipo}: índice completo")
+            if errores:
+                raise CommandError("El índice no coincide; ejecuta indexar_reservas sin --verificar.")
+            return
+
+        for tipo in tipos:
+            filas, nuevos = indexar_reservas(tipo, chunk_size)
+            self.stdout.write(f"✔ {tipo}: {filas} filas recorridas, {nuevos} enlaces nuevos")
@@ -0,0 +1,100 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from administracion.models import Horario
+from core.services import ModeloOcupacion, build_planificador_rebalanceo
+
+
+class Command(BaseCommand):
+    help = (
+        "Arma un plan para vaciar las salidas CRÍTICAS en otras salidas de la "
+        "misma ruta y cooperativa. Por defecto solo muestra el plan (dry-run)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--umbral", type=float, default=30, help="Ocupación mínima en %% (default 30).")
+        parser.add_argument("--ventana-horas", type=float, default=24, help="Ventana de salida aceptable (default 24h).")
+        parser.add_argument("--cooperativa", type=int, help="Limitar a una cooperativa (ID).")
+        parser.add_argument("--aplicar", action="store_true", help="Ejecuta las transferencias del plan.")
+        parser.add_argument(
+            "--benchmark",
+            type=int,
+            metavar="N",
+            help="No toca la BD: planifica N salidas sintéticas y muestra los tiempos.",
+        )
+
+    def handle(self, *args, **options):
+        planificador = build_planificador_rebalanceo(
+            umbral=options["umbral"],
+            ventana=timezone.timedelta(hours=options["ventana_horas"]),
+        )
+
+        if options["benchmark"]:
+            return self._benchmark(planificador, options["benchmark"])
+
+        horarios = Horario.objects.all()
+        if options["cooperativa"]:
+            horarios = horarios.filter(bus__cooperativa_id=options["cooperativa"])
+
+        inicio = time.perf_counter()
+        modelo = ModeloOcupacion.desde_bd(horarios)
+        carga = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        plan = planificador.planificar(modelo)
+        calculo = time.perf_counter() - inicio
+
+        for m in plan["movimientos"]:
+            self.stdout.write(
+                f" - Horario #{m['origen']} → #{m['destino']} ({m['pasajeros']} pasajeros)"
+            )
+        self._resumen(plan, carga, calculo)
+
+        if not options["aplicar"]:
+            self.stdout.write("(dry-run: no se movió ningún pasajero; usa --aplicar)")
+            return
+
+        resultados = planificador.aplicar(plan)
+        fallidos = [(m, msg) for m, ok, msg in resultados if not ok]
+        for m, msg in fallidos:
+            self.stdout.write(self.style.WARNING(f" ⚠ #{m['origen']} → #{m['destino']}: {msg}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {len(resultados) - len(fallidos)} transferencias aplicadas, {len(fallidos)} fallidas."
+        ))
+
+    def _resumen(self, plan, carga, calculo):
+        self.stdout.write(
+            f"Salidas: {plan['salidas']} | Críticas: {plan['criticos']} "
+            f"(vacías: {plan['vacios']}) | Buses liberados: {plan['buses_liberados']} | "
+            f"Pasajeros a mover: {plan['pasajeros_movidos']} | Sin destino: {len(plan['sin_destino'])}"
+        )
+        self.stdout.write(f"Carga: {carga:.3f}s | Planificación: {calculo:.3f}s")
+
+    def _benchmark(self, planificador, n):
+        rnd = random.Random(42)
+        rutas = max(1, n // 250)
+        ahora = time.time()
+
+        inicio = time.perf_counter()
+        modelo = ModeloOcupacion()
+        for i in range(n):
+            capacidad = rnd.choice((30, 40, 45))
+            modelo.agregar(
+                i + 1,
+                rnd.randrange(rutas),
+                rnd.randrange(5),
+                ahora + rnd.uniform(0, 30 * 24 * 3600),
+                capacidad,
+                rnd.randint(0, capacidad),
+            )
+        carga = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        plan = planificador.planificar(modelo)
+        calculo = time.perf_counter() - inicio
+
+        self._resumen(plan, carga, calculo)
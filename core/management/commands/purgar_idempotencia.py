@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.services.idempotencia_service import purgar_solicitudes
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las claves de idempotencia viejas (transferencias y aceptación de "
+        "negociaciones). Pasado ese tiempo un reenvío ya no se reconoce como repetido."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--horas", type=int, default=24,
+            help="Conservar las claves de las últimas N horas (por defecto 24).",
+        )
+
+    def handle(self, *args, **options):
+        borradas = purgar_solicitudes(horas=options["horas"])
+        self.stdout.write(f"✔ {borradas} claves de idempotencia borradas")
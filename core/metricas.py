@@ -0,0 +1,345 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+
+
+# ---------------------------------------------------
+# Almacenes de valores
+# ---------------------------------------------------
+
+class AlmacenMemoria:
+    """Valores del proceso actual (un solo worker o tests)."""
+
+    def __init__(self):
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def sumar(self, clave, cantidad):
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0.0) + cantidad
+
+    def leer(self):
+        with self._lock:
+            return dict(self._valores)
+
+
+class ArchivoMmap:
+    """
+    Valores de UN proceso en un archivo mapeado a memoria, para que el
+    endpoint de cualquier worker sume los de todos.
+
+    Formato: 8 bytes de cabecera (bytes usados) y luego entradas
+    [largo de la clave (uint32) | clave utf-8 con relleno a 8 | double].
+    Solo este proceso escribe el archivo; los demás solo lo leen.
+    """
+
+    TAMANO_INICIAL = 64 * 1024
+    _CABECERA = struct.Struct("<I4x")
+    _LARGO = struct.Struct("<I")
+    _VALOR = struct.Struct("<d")
+
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        self._lock = threading.Lock()
+        self._offsets = {}
+
+        nuevo = not self.ruta.exists() or self.ruta.stat().st_size == 0
+        self._archivo = open(self.ruta, "a+b")
+        if nuevo:
+            self._archivo.truncate(self.TAMANO_INICIAL)
+        self._mapa = mmap.mmap(self._archivo.fileno(), 0)
+
+        if nuevo:
+            self._CABECERA.pack_into(self._mapa, 0, self._CABECERA.size)
+        for clave, _, offset in self._entradas(self._mapa):
+            self._offsets[clave] = offset
+
+    @classmethod
+    def _entradas(cls, datos):
+        usados = cls._CABECERA.unpack_from(datos, 0)[0]
+        pos = cls._CABECERA.size
+        while pos < usados:
+            largo = cls._LARGO.unpack_from(datos, pos)[0]
+            inicio_clave = pos + cls._LARGO.size
+            clave = bytes(datos[inicio_clave:inicio_clave + largo]).decode("utf-8")
+            offset = pos + _relleno(cls._LARGO.size + largo)
+            yield clave, cls._VALOR.unpack_from(datos, offset)[0], offset
+            pos = offset + cls._VALOR.size
+
+    @classmethod
+    def leer_archivo(cls, ruta):
+        with open(ruta, "rb") as f:
+            datos = f.read()
+        if len(datos) < cls._CABECERA.size:
+            return {}
+        return {clave: valor for clave, valor, _ in cls._entradas(datos)}
+
+    def _agregar(self, clave):
+        codificada = clave.encode("utf-8")
+        usados = self._CABECERA.unpack_from(self._mapa, 0)[0]
+        bloque = _relleno(self._LARGO.size + len(codificada))
+        fin = usados + bloque + self._VALOR.size
+
+        if fin > len(self._mapa):
+            tamano = len(self._mapa)
+            while tamano < fin:
+                tamano *= 2
+            self._mapa.close()
+            self._archivo.truncate(tamano)
+            self._mapa = mmap.mmap(self._archivo.fileno(), 0)
+
+        self._LARGO.pack_into(self._mapa, usados, len(codificada))
+        self._mapa[usados + self._LARGO.size:usados + self._LARGO.size + len(codificada)] = codificada
+        offset = usados + bloque
+        self._VALOR.pack_into(self._mapa, offset, 0.0)
+        # La cabecera se mueve al final: un lector nunca ve una entrada a medias
+        self._CABECERA.pack_into(self._mapa, 0, fin)
+        self._offsets[clave] = offset
+        return offset
+
+    def sumar(self, clave, cantidad):
+        with self._lock:
+            offset = self._offsets.get(clave)
+            if offset is None:
+                offset = self._agregar(clave)
+            actual = self._VALOR.unpack_from(self._mapa, offset)[0]
+            self._VALOR.pack_into(self._mapa, offset, actual + cantidad)
+
+    def leer(self):
+        with self._lock:
+            return {clave: valor for clave, valor, _ in self._entradas(self._mapa)}
+
+    def cerrar(self):
+        self._mapa.close()
+        self._archivo.close()
+
+
+def _relleno(n):
+    return (n + 7) // 8 * 8
+
+
+# ---------------------------------------------------
+# Métricas
+# ---------------------------------------------------
+
+def _clave(muestra, etiquetas):
+    return json.dumps([muestra, sorted(etiquetas.items())], ensure_ascii=False)
+
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, registro, nombre, ayuda, etiquetas=()):
+        self.registro = registro
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+
+    def inc(self, cantidad=1, **etiquetas):
+        self.registro.almacen().sumar(_clave(self.nombre, etiquetas), cantidad)
+
+    def valor(self, **etiquetas):
+        """Valor acumulado en este proceso (para benchmarks y tests)."""
+        return self.registro.almacen().leer().get(_clave(self.nombre, etiquetas), 0)
+
+    def muestras(self):
+        return (self.nombre,)
+
+
+class Histograma:
+    tipo = "histogram"
+
+    def __init__(self, registro, nombre, ayuda, buckets, etiquetas=()):
+        self.registro = registro
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.buckets = tuple(sorted(float(b) for b in buckets)) + (float("inf"),)
+        self.etiquetas = tuple(etiquetas)
+
+    def observar(self, valor, **etiquetas):
+        almacen = self.registro.almacen()
+        for limite in self.buckets:
+            if valor <= limite:
+                almacen.sumar(_clave(f"{self.nombre}_bucket", dict(etiquetas, le=_formato(limite))), 1)
+        almacen.sumar(_clave(f"{self.nombre}_sum", etiquetas), valor)
+        almacen.sumar(_clave(f"{self.nombre}_count", etiquetas), 1)
+
+    def muestras(self):
+        return (f"{self.nombre}_bucket", f"{self.nombre}_sum", f"{self.nombre}_count")
+
+
+def _formato(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor))
+
+
+class RegistroMetricas:
+    """
+    Registro en proceso. Si settings.METRICAS["DIRECTORIO"] está definido,
+    cada proceso (worker de gunicorn) escribe en '<pid>.db' dentro de ese
+    directorio y exponer() suma los archivos de todos; si no, los valores
+    quedan en memoria del proceso.
+    """
+
+    def __init__(self):
+        self.metricas = []
+        self._almacen = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        metrica = Contador(self, nombre, ayuda, etiquetas)
+        self.metricas.append(metrica)
+        return metrica
+
+    def histograma(self, nombre, ayuda, buckets, etiquetas=()):
+        metrica = Histograma(self, nombre, ayuda, buckets, etiquetas)
+        self.metricas.append(metrica)
+        return metrica
+
+    def _directorio(self):
+        return getattr(settings, "METRICAS", {}).get("DIRECTORIO")
+
+    def almacen(self):
+        # Después de un fork (gunicorn --preload) el hijo abre su propio archivo
+        pid = os.getpid()
+        if self._almacen is None or self._pid != pid:
+            with self._lock:
+                if self._almacen is None or self._pid != pid:
+                    directorio = self._directorio()
+                    if directorio:
+                        Path(directorio).mkdir(parents=True, exist_ok=True)
+                        self._almacen = ArchivoMmap(Path(directorio) / f"{pid}.db")
+                    else:
+                        self._almacen = AlmacenMemoria()
+                    self._pid = pid
+        return self._almacen
+
+    def reiniciar(self):
+        """Olvida el almacén actual (tests, o cambio de DIRECTORIO)."""
+        with self._lock:
+            if isinstance(self._almacen, ArchivoMmap):
+                self._almacen.cerrar()
+            self._almacen = None
+
+    def valores(self):
+        directorio = self._directorio()
+        if not directorio:
+            return self.almacen().leer()
+
+        totales = {}
+        for ruta in sorted(Path(directorio).glob("*.db")):
+            for clave, valor in ArchivoMmap.leer_archivo(ruta).items():
+                totales[clave] = totales.get(clave, 0.0) + valor
+        return totales
+
+    def exponer(self):
+        """Formato de texto de Prometheus (version 0.0.4)."""
+        por_muestra = {}
+        for clave, valor in self.valores().items():
+            muestra, etiquetas = json.loads(clave)
+            por_muestra.setdefault(muestra, []).append((etiquetas, valor))
+
+        lineas = []
+        for metrica in self.metricas:
+            lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+            lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+
+            filas = []
+            for muestra in metrica.muestras():
+                for etiquetas, valor in por_muestra.get(muestra, []):
+                    sin_le = [(k, v) for k, v in etiquetas if k != "le"]
+                    le = next((float(v) for k, v in etiquetas if k == "le"), 0.0)
+                    filas.append((sin_le, muestra != f"{metrica.nombre}_bucket", le, muestra, etiquetas, valor))
+
+            for _, _, _, muestra, etiquetas, valor in sorted(filas, key=lambda f: f[:3]):
+                lineas.append(f"{muestra}{_etiquetas(etiquetas)} {_numero(valor)}")
+
+        return "\n".join(lineas) + "\n"
+
+
+def _etiquetas(pares):
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _numero(valor):
+    return str(int(valor)) if float(valor).is_integer() else repr(valor)
+
+
+def cronometrar(histograma, **etiquetas):
+    """Decorador: observa en 'histograma' la duración de cada llamada."""
+    def decorador(func):
+        @wraps(func)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histograma.observar(time.perf_counter() - inicio, **etiquetas)
+        return envoltura
+    return decorador
+
+
+# ---------------------------------------------------
+# Métricas de SmartBus
+# ---------------------------------------------------
+
+REGISTRO = RegistroMetricas()
+
+_SEGUNDOS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+TRANSFERENCIAS = REGISTRO.contador(
+    "smartbus_transferencias_total",
+    "Transferencias terminadas, por camino (via) y resultado (ok, rechazada, sin_capacidad, error).",
+    etiquetas=("via", "resultado"),
+)
+TRANSFERENCIA_SEGUNDOS = REGISTRO.histograma(
+    "smartbus_transferencia_segundos",
+    "Latencia total de la transferencia, incluidos los reintentos por bloqueo y sus esperas.",
+    _SEGUNDOS,
+    etiquetas=("via",),
+)
+TRANSFERENCIA_PASAJEROS = REGISTRO.histograma(
+    "smartbus_transferencia_pasajeros",
+    "Pasajeros movidos por transferencia exitosa.",
+    (1, 2, 5, 10, 20, 30, 45, 60),
+    etiquetas=("via",),
+)
+ESPERA_BLOQUEO_SEGUNDOS = REGISTRO.histograma(
+    "smartbus_espera_bloqueo_segundos",
+    "Espera por el bloqueo (select_for_update, en orden de id) de los horarios de la transferencia.",
+    _SEGUNDOS,
+    etiquetas=("via",),
+)
+REINTENTOS_BLOQUEO = REGISTRO.contador(
+    "smartbus_reintentos_bloqueo_total",
+    "Transacciones repetidas por chocar con un bloqueo (database is locked, deadlock).",
+    etiquetas=("via",),
+)
+PANEL_SEGUNDOS = REGISTRO.histograma(
+    "smartbus_panel_render_segundos",
+    "Tiempo de respuesta de los paneles (consultas + render).",
+    _SEGUNDOS,
+    etiquetas=("vista",),
+)
+
+
+def registrar_transferencia(via, resultado, segundos, pasajeros=0):
+    TRANSFERENCIAS.inc(via=via, resultado=resultado)
+    TRANSFERENCIA_SEGUNDOS.observar(segundos, via=via)
+    if resultado == "ok":
+        TRANSFERENCIA_PASAJEROS.observar(pasajeros, via=via)
@@ -0,0 +1,224 @@
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template import base as template_base
+
+
+logger = logging.getLogger("smartbus.perfilamiento")
+
+_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def normalizar_sql(sql):
+    # Misma consulta con otros parámetros = misma forma (así se ven los N+1)
+    return _LITERALES.sub("?", sql)
+
+
+# ---------------------------------------------------
+# Perfil de un request
+# ---------------------------------------------------
+
+_perfil_actual = ContextVar("perfil_actual", default=None)
+
+
+class PerfilRequest:
+    """Tiempos y consultas SQL acumulados durante un request."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.inicio_vista = None
+        self.fin_vista = None
+        self.fin = None
+        self.plantillas = 0.0
+        self.consultas = []            # (sql, segundos)
+        self._profundidad_plantilla = 0
+
+    # Se engancha con connection.execute_wrapper()
+    def registrar_sql(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append((sql, time.perf_counter() - inicio))
+
+    @property
+    def total(self):
+        return self.fin - self.inicio
+
+    @property
+    def sql(self):
+        return sum(segundos for _, segundos in self.consultas)
+
+    @property
+    def vista(self):
+        # Lo que marca PerfilamientoVistaMiddleware, sin el render de plantillas
+        if self.inicio_vista is None:
+            return 0.0
+        fin = self.fin_vista or self.fin
+        return max(fin - self.inicio_vista - self.plantillas, 0.0)
+
+    def mas_lentas(self, n):
+        return sorted(self.consultas, key=lambda c: c[1], reverse=True)[:n]
+
+    def repetidas(self, n):
+        formas = Counter(normalizar_sql(sql) for sql, _ in self.consultas)
+        return [(sql, veces) for sql, veces in formas.most_common(n) if veces > 1]
+
+
+def _render_con_tiempo(render):
+    # Solo se mide el render de más afuera: los {% include %} ya están dentro
+    def envoltura(self, context):
+        perfil = _perfil_actual.get()
+        if perfil is None:
+            return render(self, context)
+
+        externo = perfil._profundidad_plantilla == 0
+        perfil._profundidad_plantilla += 1
+        inicio = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            perfil._profundidad_plantilla -= 1
+            if externo:
+                perfil.plantillas += time.perf_counter() - inicio
+
+    envoltura._perfilamiento = True
+    return envoltura
+
+
+def _instrumentar_plantillas():
+    if not getattr(template_base.Template.render, "_perfilamiento", False):
+        template_base.Template.render = _render_con_tiempo(template_base.Template.render)
+
+
+# ---------------------------------------------------
+# Middleware
+# ---------------------------------------------------
+
+class PerfilamientoMiddleware:
+    """
+    Perfilamiento opt-in (settings.PERFILAMIENTO["ACTIVO"]). Por cada
+    request muestreado registra tiempo total, de la vista, de plantillas
+    y de SQL (cantidad, las más lentas y las repetidas) en un log
+    rotativo, y los expone en la cabecera Server-Timing.
+
+    Va primero en MIDDLEWARE: "total" y el SQL cubren toda la pila
+    (sesión, autenticación, mensajes...). "vista" lo marca
+    PerfilamientoVistaMiddleware, que va al final.
+    """
+
+    def __init__(self, get_response):
+        config = getattr(settings, "PERFILAMIENTO", {})
+        if not config.get("ACTIVO"):
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.muestreo = float(config.get("MUESTREO", 1.0))
+        self.top = int(config.get("TOP", 5))
+
+        _instrumentar_plantillas()
+        self._configurar_log(config)
+
+    def _configurar_log(self, config):
+        ruta = config.get("LOG")
+        if not ruta or logger.handlers:
+            return
+
+        Path(ruta).parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(
+            ruta,
+            maxBytes=int(config.get("MAX_BYTES", 5 * 1024 * 1024)),
+            backupCount=int(config.get("BACKUPS", 5)),
+            encoding="utf-8",
+            delay=True,
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    def __call__(self, request):
+        if random.random() >= self.muestreo:
+            return self.get_response(request)
+
+        perfil = PerfilRequest()
+        token = _perfil_actual.set(perfil)
+        request._perfil = perfil
+
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(perfil.registrar_sql))
+                response = self.get_response(request)
+        finally:
+            perfil.fin = time.perf_counter()
+            _perfil_actual.reset(token)
+
+        response["Server-Timing"] = self._server_timing(perfil)
+        logger.info(json.dumps(self._registro(request, response, perfil), ensure_ascii=False))
+        return response
+
+    def _server_timing(self, perfil):
+        return ", ".join([
+            f"total;dur={perfil.total * 1000:.2f}",
+            f"vista;dur={perfil.vista * 1000:.2f}",
+            f"plantillas;dur={perfil.plantillas * 1000:.2f}",
+            f'sql;dur={perfil.sql * 1000:.2f};desc="{len(perfil.consultas)} consultas"',
+        ])
+
+    def _registro(self, request, response, perfil):
+        match = getattr(request, "resolver_match", None)
+        return {
+            "metodo": request.method,
+            "ruta": request.path,
+            "vista": match.view_name if match else None,
+            "status": response.status_code,
+            "total_ms": round(perfil.total * 1000, 2),
+            "vista_ms": round(perfil.vista * 1000, 2),
+            "plantillas_ms": round(perfil.plantillas * 1000, 2),
+            "sql_ms": round(perfil.sql * 1000, 2),
+            "consultas": len(perfil.consultas),
+            "mas_lentas": [
+                {"sql": sql, "ms": round(segundos * 1000, 2)}
+                for sql, segundos in perfil.mas_lentas(self.top)
+            ],
+            "repetidas": [
+                {"sql": sql, "veces": veces}
+                for sql, veces in perfil.repetidas(self.top)
+            ],
+        }
+
+
+class PerfilamientoVistaMiddleware:
+    """
+    Pareja de PerfilamientoMiddleware, al final de MIDDLEWARE: marca
+    inicio y fin de lo que queda adentro (resolución de URL, process_view
+    y la vista) para que "vista" no incluya a los demás middlewares.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PERFILAMIENTO", {}).get("ACTIVO"):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        perfil = getattr(request, "_perfil", None)
+        if perfil is None:  # request no muestreado
+            return self.get_response(request)
+
+        perfil.inicio_vista = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            perfil.fin_vista = time.perf_counter()
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_incidentecooperativa'),
+        ('reservas', '0010_negociacionreserva'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransferLogReserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('log', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enlaces', to='core.transferlog')),
+                ('reserva', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='enlaces_transferencia', to='reservas.reserva')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['reserva', 'log'], name='transferlog_reserva_idx')],
+                'constraints': [models.UniqueConstraint(fields=('log', 'reserva'), name='transferlog_reserva_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0004_horario_horario_salida_idx'),
+        ('core', '0003_transferlogreserva'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incidentecooperativa',
+            name='expira',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='incidentecooperativa',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['bus'], name='incidente_activo_bus_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incidentecooperativa',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['ruta'], name='incidente_activo_ruta_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incidentecooperativa',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['cooperativa'], name='incidente_activo_coop_idx'),
+        ),
+    ]
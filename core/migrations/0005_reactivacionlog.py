@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0004_horario_horario_salida_idx'),
+        ('core', '0004_incidente_expira_indices'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReactivacionLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('criterio', models.CharField(choices=[('SELECCION', 'Pasajeros seleccionados'), ('HORARIO', 'Todos los de un horario'), ('INCIDENTE', 'Todos los afectados por un incidente'), ('TODOS', 'Todos los transferidos de la cooperativa')], max_length=10)),
+                ('cantidad', models.PositiveIntegerField()),
+                ('reservas', models.JSONField()),
+                ('horarios', models.JSONField()),
+                ('cooperativa', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='administracion.cooperativa')),
+                ('incidente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.incidentecooperativa')),
+                ('operador', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_reactivacionlog'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SolicitudIdempotente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operacion', models.CharField(max_length=50)),
+                ('clave', models.CharField(max_length=64)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('ok', models.BooleanField(default=False)),
+                ('mensaje', models.TextField(blank=True)),
+                ('operador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha'], name='idempotencia_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('operador', 'operacion', 'clave'), name='idempotencia_clave_unica')],
+            },
+        ),
+    ]
@@ -1,8 +1,12 @@
+from datetime import timedelta
+
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from administracion.models import Horario
 from django.db import models
 from administracion.models import Cooperativa, Bus, Ruta
+from reservas.models import Reserva
 
 
 
@@ -52,10 +56,57 @@ class TransferLog(models.Model):
     def __str__(self):
         return f"Log transferencia {self.id} - {self.estado}"
 
+    def indexar_reservas(self):
+        """Copia self.reservas (JSON) a TransferLogReserva; se puede repetir."""
+        ids = {int(i) for i in self.reservas or []}
+        TransferLogReserva.objects.bulk_create(
+            [TransferLogReserva(log=self, reserva_id=i) for i in ids], ignore_conflicts=True
+        )
+
+
+class TransferLogReserva(models.Model):
+    """
+    Índice relacional de TransferLog.reservas: una fila por reserva
+    movida. Responde "qué transferencias tocaron la reserva X" con el
+    índice (reserva, log) en vez de recorrer el JSON de todos los logs.
+    """
+    log = models.ForeignKey(TransferLog, related_name="enlaces", on_delete=models.CASCADE)
+
+    # Sin FK real: el log es auditoría y sobrevive a la reserva borrada
+    reserva = models.ForeignKey(
+        Reserva,
+        related_name="enlaces_transferencia",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["log", "reserva"], name="transferlog_reserva_unica"),
+        ]
+        indexes = [
+            models.Index(fields=["reserva", "log"], name="transferlog_reserva_idx"),
+        ]
+
+    def __str__(self):
+        return f"Log {self.log_id} - Reserva {self.reserva_id}"
+
+
 
 
+class IncidenteQuerySet(models.QuerySet):
+    def vigentes(self, ahora=None):
+        """Activos y sin vencer (expira vacío = hasta que se desactive)."""
+        ahora = ahora or timezone.now()
+        return self.filter(activo=True).filter(
+            models.Q(expira__isnull=True) | models.Q(expira__gt=ahora)
+        )
+
 
 class IncidenteCooperativa(models.Model):
+    # Ventana por defecto de un incidente nuevo sin 'expira'
+    VIGENCIA = timedelta(hours=24)
+
     cooperativa = models.ForeignKey(Cooperativa, on_delete=models.CASCADE, null=True, blank=True)
     bus = models.ForeignKey(Bus, on_delete=models.CASCADE, null=True, blank=True)
     ruta = models.ForeignKey(Ruta, on_delete=models.CASCADE, null=True, blank=True)
@@ -64,6 +115,98 @@ class IncidenteCooperativa(models.Model):
     activo = models.BooleanField(default=True)
 
     fecha = models.DateTimeField(auto_now_add=True)
+    expira = models.DateTimeField(null=True, blank=True)
+
+    objects = IncidenteQuerySet.as_manager()
+
+    class Meta:
+        # (activo, alcance) como índices parciales: solo entran los activos, y
+        # SQLite los usa con el WHERE "activo" que genera filter(activo=True)
+        # (un índice compuesto (activo, bus) no, porque no hay "activo = 1").
+        indexes = [
+            models.Index(fields=["bus"], condition=models.Q(activo=True), name="incidente_activo_bus_idx"),
+            models.Index(fields=["ruta"], condition=models.Q(activo=True), name="incidente_activo_ruta_idx"),
+            models.Index(
+                fields=["cooperativa"], condition=models.Q(activo=True), name="incidente_activo_coop_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"Incidente {self.cooperativa} - {self.fecha:%Y-%m-%d}"
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.expira is None:
+            self.expira = timezone.now() + self.VIGENCIA
+        super().save(*args, **kwargs)
+
+    @property
+    def esta_activo(self):
+        return self.activo and (self.expira is None or self.expira > timezone.now())
+
+    @property
+    def tipo(self):
+        """Alcance del incidente: el más específico que tenga."""
+        if self.bus_id:
+            return "bus"
+        if self.ruta_id:
+            return "ruta"
+        return "cooperativa"
+
+
+class ReactivacionLog(models.Model):
+    """Una entrada por reactivación masiva (resumen, no una por pasajero)."""
+    CRITERIOS = (
+        ("SELECCION", "Pasajeros seleccionados"),
+        ("HORARIO", "Todos los de un horario"),
+        ("INCIDENTE", "Todos los afectados por un incidente"),
+        ("TODOS", "Todos los transferidos de la cooperativa"),
+    )
+
+    fecha = models.DateTimeField(auto_now_add=True)
+    operador = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    cooperativa = models.ForeignKey(Cooperativa, on_delete=models.SET_NULL, null=True)
+    incidente = models.ForeignKey(
+        IncidenteCooperativa, on_delete=models.SET_NULL, null=True, blank=True
+    )
+
+    criterio = models.CharField(max_length=10, choices=CRITERIOS)
+    cantidad = models.PositiveIntegerField()
+
+    # IDs de las reservas reactivadas y de sus horarios
+    reservas = models.JSONField()
+    horarios = models.JSONField()
+
+    def __str__(self):
+        return f"Reactivación {self.id} - {self.cantidad} pasajeros"
+
+
+class SolicitudIdempotente(models.Model):
+    """
+    Resultado de un POST de transferencia / aceptación de negociación,
+    por clave de idempotencia: si el mismo envío llega otra vez (doble
+    clic, reintento del navegador) se responde con esto sin repetirlo.
+    """
+    operador = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    operacion = models.CharField(max_length=50)     # "transferencia", "aceptar_negociacion:<id>"
+    clave = models.CharField(max_length=64)         # la manda el formulario (uuid4 hex)
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    ok = models.BooleanField(default=False)
+    mensaje = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            # La búsqueda del envío repetido (una consulta) y el candado contra dos a la vez
+            models.UniqueConstraint(
+                fields=["operador", "operacion", "clave"], name="idempotencia_clave_unica"
+            ),
+        ]
+        indexes = [
+            # Purga de las viejas (purgar_idempotencia)
+            models.Index(fields=["fecha"], name="idempotencia_fecha_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.operacion} ({self.clave}) - {'OK' if self.ok else 'ERROR'}"
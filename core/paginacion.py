@@ -0,0 +1,135 @@
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from django.http import Http404
+
+
+class CursorInvalido(Http404):
+    pass
+
+
+class PaginaKeyset:
+    """
+    Una página de paginación por clave (seek): en lugar de OFFSET se
+    filtra "después de la última fila vista" sobre columnas indexadas,
+    así la página N cuesta lo mismo que la primera.
+
+    'orden' son nombres de campo (con '-' para descendente); el último
+    debe ser único (normalmente 'id') para que el cursor sea estable.
+    """
+
+    def __init__(self, filas, siguiente, anterior):
+        self.filas = filas
+        self.siguiente = siguiente      # cursor o None
+        self.anterior = anterior        # cursor o None
+
+    def __iter__(self):
+        return iter(self.filas)
+
+    def __len__(self):
+        return len(self.filas)
+
+    @property
+    def tiene_siguiente(self):
+        return self.siguiente is not None
+
+    @property
+    def tiene_anterior(self):
+        return self.anterior is not None
+
+
+def paginar_keyset(queryset, orden, cursor=None, tamano=50):
+    orden = tuple(orden)
+    campos = [o.lstrip("-") for o in orden]
+    valores, hacia_atras = _decodificar(queryset.model, campos, cursor)
+
+    qs = queryset
+    if valores is not None:
+        qs = qs.filter(_despues_de(orden, valores, invertir=hacia_atras))
+
+    orden_consulta = _invertir(orden) if hacia_atras else orden
+    filas = list(qs.order_by(*orden_consulta)[:tamano + 1])
+
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    if hacia_atras:
+        filas.reverse()
+
+    if not filas:
+        return PaginaKeyset(filas, None, None)
+
+    # Hacia adelante: hay anterior si vinimos con cursor. Hacia atrás: al revés.
+    hay_siguiente = hay_mas if not hacia_atras else True
+    hay_anterior = (valores is not None) if not hacia_atras else hay_mas
+
+    return PaginaKeyset(
+        filas,
+        _codificar(filas[-1], campos, False) if hay_siguiente else None,
+        _codificar(filas[0], campos, True) if hay_anterior else None,
+    )
+
+
+def _invertir(orden):
+    return tuple(o[1:] if o.startswith("-") else f"-{o}" for o in orden)
+
+
+def _despues_de(orden, valores, invertir=False):
+    # (a, b, c) > (va, vb, vc)  ==  a > va | (a = va & b > vb) | (a = va & b = vb & c > vc)
+    condicion = Q()
+    iguales = Q()
+    for campo, valor in zip(orden, valores):
+        descendente = campo.startswith("-") != invertir
+        nombre = campo.lstrip("-")
+        condicion |= iguales & Q(**{f"{nombre}__{'lt' if descendente else 'gt'}": valor})
+        iguales &= Q(**{nombre: valor})
+    return condicion
+
+
+def _codificar(fila, campos, hacia_atras):
+    valores = [_valor(fila, c) for c in campos]
+    texto = json.dumps({"v": valores, "a": hacia_atras}, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+
+def _decodificar(modelo, campos, cursor):
+    if not cursor:
+        return None, False
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        valores = [
+            _campo(modelo, c).to_python(v) if v is not None else None
+            for c, v in zip(campos, datos["v"])
+        ]
+        if len(valores) != len(campos):
+            raise ValueError
+        return valores, bool(datos.get("a"))
+    except (ValueError, TypeError, KeyError, FieldDoesNotExist):
+        raise CursorInvalido("Cursor de paginación inválido.")
+
+
+def _valor(fila, campo):
+    valor = getattr(fila, campo)
+    return valor.isoformat() if hasattr(valor, "isoformat") else valor
+
+
+def _campo(modelo, nombre):
+    campo = modelo._meta.get_field(nombre)
+    # 'horario_id' → el valor crudo es el de la FK destino
+    return campo.target_field if campo.is_relation else campo
+
+
+class KeysetPaginationMixin:
+    """Para ListView: pagina object_list con paginar_keyset (?cursor=...)."""
+
+    orden_keyset = ("id",)
+    tamano_pagina = 50
+
+    def get_context_data(self, **kwargs):
+        pagina = paginar_keyset(
+            self.object_list, self.orden_keyset, self.request.GET.get("cursor"), self.tamano_pagina
+        )
+        kwargs.setdefault("object_list", pagina.filas)
+        kwargs["pagina"] = pagina
+        return super().get_context_data(**kwargs)
@@ -0,0 +1,52 @@
+"""
+Reintento con espera exponencial para transacciones que chocan con un
+bloqueo: "database is locked" en SQLite, deadlock o falla de
+serialización en PostgreSQL. Cada intento es una transacción nueva, así
+que solo se reintenta en el bloque atómico más externo.
+"""
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+from core import metricas
+
+
+_MENSAJES = (
+    "database is locked",
+    "database table is locked",
+    "deadlock detected",
+    "could not serialize access",
+)
+
+
+def es_bloqueo(error):
+    mensaje = str(error).lower()
+    return any(m in mensaje for m in _MENSAJES)
+
+
+def con_reintentos(funcion, via, intentos=None, espera=None):
+    """
+    Llama funcion(intento) (intento = 1, 2, ...) hasta que no falle por
+    bloqueo o se acaben los intentos. Entre intentos espera 'espera',
+    2 * espera, 4 * espera... con ±50 % de azar, para que dos que
+    chocaron no vuelvan a chocar juntos. Cuenta cada reintento en
+    smartbus_reintentos_bloqueo_total{via=...}.
+
+    'funcion' debe abrir su propia transacción y no depender de lo que
+    dejó en memoria un intento fallido.
+    """
+    config = getattr(settings, "REINTENTOS_BLOQUEO", {})
+    intentos = intentos or config.get("INTENTOS", 5)
+    espera = config.get("ESPERA", 0.05) if espera is None else espera
+
+    for intento in range(1, intentos + 1):
+        try:
+            return funcion(intento)
+        except OperationalError as error:
+            # Dentro de otra transacción el reintento no sirve: ya está rota
+            if intento == intentos or not es_bloqueo(error) or connection.in_atomic_block:
+                raise
+            metricas.REINTENTOS_BLOQUEO.inc(via=via)
+            time.sleep(espera * 2 ** (intento - 1) * random.uniform(0.5, 1.5))
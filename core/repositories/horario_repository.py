@@ -1,5 +1,53 @@
+from django.db.models import Case, DateTimeField, DurationField, F, Value, When
+from django.utils import timezone
+
 from administracion.models import Horario
 
+
+def _distancia_a(momento):
+    # |hora_salida - momento| como intervalo (ABS de un intervalo no existe en todas las bases)
+    momento = Value(momento, output_field=DateTimeField())
+    return Case(
+        When(hora_salida__gte=momento, then=F("hora_salida") - momento),
+        default=momento - F("hora_salida"),
+        output_field=DurationField(),
+    )
+
+
 class HorarioRepository:
     def get(self, horario_id: int):
         return Horario.objects.get(id=horario_id)
+
+    def buscar_opciones_transferencia(self, horario_origen, cantidad_minima=1, ventana=None):
+        """
+        Horarios de la misma ruta que salen dentro de la ventana alrededor
+        del origen, que aún no han salido y con al menos 'cantidad_minima'
+        asientos libres. Usa el índice (ruta, hora_salida) y devuelve un
+        solo queryset con 'libres' y 'diferencia' (distancia a la salida
+        del origen, antes o después) anotados, ordenado por la salida más
+        próxima a la del origen y, a igual distancia, por el que tiene más
+        asientos libres.
+
+        Los asientos retenidos no cuentan como libres (igual que al
+        transferir): se resta el contador Horario.asientos_retenidos, el
+        mismo que usan la fachada y _transferir.
+        """
+        ventana = ventana or timezone.timedelta(hours=24)
+        desde = max(timezone.now(), horario_origen.hora_salida - ventana)
+        hasta = horario_origen.hora_salida + ventana
+
+        return (
+            Horario.objects
+            .filter(
+                ruta_id=horario_origen.ruta_id,
+                hora_salida__gt=desde,
+                hora_salida__lte=hasta,
+            )
+            .exclude(id=horario_origen.id)
+            .annotate(
+                libres=F("bus__capacidad") - F("asientos_ocupados") - F("asientos_retenidos")
+            )
+            .filter(libres__gte=cantidad_minima)
+            .annotate(diferencia=_distancia_a(horario_origen.hora_salida))
+            .order_by("diferencia", "-libres", "id")
+        )
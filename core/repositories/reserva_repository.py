@@ -1,12 +1,36 @@
+from django.db.models import F
+
+from administracion.models import Horario
 from reservas.models import Reserva
+from reservas.services import mover_a_asientos_libres
 
 class ReservaRepository:
     def contar_por_horario(self, horario):
         return Reserva.objects.filter(horario=horario).count()
 
+    def anotar_usados(self, horarios):
+        # Un solo SELECT: el conteo ya vive en Horario.asientos_ocupados (+ bus/ruta en el JOIN)
+        if not hasattr(horarios, "annotate"):
+            horarios = Horario.objects.filter(id__in=[h.id for h in horarios])
+
+        return (
+            horarios
+            .select_related("bus__cooperativa", "ruta")
+            .annotate(usados=F("asientos_ocupados"))
+        )
+
     def obtener_por_horario(self, horario):
         return Reserva.objects.filter(horario=horario).order_by("id")
 
     def mover_reservas(self, reservas_qs, nuevo_horario):
-        # Update masivo simple (puedes cambiar a iterativo si necesitas log por reserva)
-        return reservas_qs.update(horario=nuevo_horario)
+        # Cada reserva toma un asiento libre del destino: el número que traía
+        # puede estar ocupado allá (índice único horario + asiento)
+        reservas = list(reservas_qs.only("id", "horario_id", "asiento"))
+        origenes = {r.horario_id for r in reservas}
+        # Origen(es) y destino, en orden de id (si ya los bloqueó quien llama, no espera)
+        destino = Horario.bloquear(origenes | {nuevo_horario.id})[nuevo_horario.id]
+        mover_a_asientos_libres(reservas, destino)
+
+        # bulk_update no pasa por Reserva.save(): reconstruir mapas de asientos
+        Horario.recalcular_asientos(origenes | {nuevo_horario.id})
+        return len(reservas)
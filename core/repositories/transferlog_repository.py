@@ -2,4 +2,6 @@ from core.models import TransferLog
 
 class TransferLogRepository:
     def crear_log(self, **data):
-        return TransferLog.objects.create(**data)
+        log = TransferLog.objects.create(**data)
+        log.indexar_reservas()
+        return log
@@ -1,7 +1,6 @@
 import random
-from django.utils import timezone
-from reservas.models import Reserva
-from administracion.models import Bus, Horario
+from administracion.models import Horario
+from reservas.services import borrar_reservas, sembrar_reservas
 
 
 NOMBRES = [
@@ -16,54 +15,46 @@ APELLIDOS = [
 ]
 
 
+def pasajero_real(horario_id, n):
+    """Nombre y cédula al azar (módulo random); 'pasajero' de sembrar_reservas."""
+    nombre = random.choice(NOMBRES)
+    apellido = random.choice(APELLIDOS)
+    return f"{nombre} {apellido}", f"{random.randint(1000000000, 9999999999)}"
+
+
 def crear_reservas_para_horario(horario, cantidad=20):
     """
     Crea exactamente 'cantidad' reservas dummy en el horario dado.
-    Respeta la capacidad del bus y genera asientos únicos.
+    Respeta la capacidad del bus y genera asientos únicos (aleatorios).
     """
 
     print(f" → Creando {cantidad} reservas para horario #{horario.id} - Bus {horario.bus.placa}")
 
-    capacidad = horario.bus.capacidad
-
-    # Ajusta el número si el bus tiene menos capacidad
-    cantidad = min(cantidad, capacidad)
-
     # Limpia reservas anteriores
-    Reserva.objects.filter(horario=horario).delete()
-
-    # Generar lista de asientos disponibles
-    asientos = list(range(1, capacidad + 1))
-    random.shuffle(asientos)
-
-    for i in range(cantidad):
-        nombre = random.choice(NOMBRES)
-        apellido = random.choice(APELLIDOS)
-        nombre_completo = f"{nombre} {apellido}"
-
-        cedula = f"{random.randint(1000000000, 9999999999)}"
+    borrar_reservas([horario.id])
 
-        Reserva.objects.create(
-            horario=horario,
-            asiento=asientos[i],
-            nombre_pasajero=nombre_completo,
-            cedula=cedula,
-        )
+    creadas = sembrar_reservas(
+        Horario.objects.filter(id=horario.id),
+        cantidad,
+        pasajero=pasajero_real,
+        asientos_aleatorios=True,
+    )
 
-    print(f" ✔ {cantidad} reservas creadas correctamente.")
+    print(f" ✔ {creadas} reservas creadas correctamente.")
 
 
-def cargar_datos_reales():
+def cargar_datos_reales(cantidad=20, batch_size=5000):
     """
     Llena TODOS los horarios reales con 20 reservas.
+    Se inserta con bulk_create por lotes (ver reservas.services.sembrar_reservas).
     """
 
     print("\n==============================")
-    print("  CARGANDO 20 RESERVAS POR HORARIO...")
+    print(f"  CARGANDO {cantidad} RESERVAS POR HORARIO...")
     print("==============================\n")
 
     # 1. Borrar todas las reservas previas
-    Reserva.objects.all().delete()
+    borrar_reservas()
     print("✔ Reservas anteriores eliminadas.\n")
 
     # 2. Obtener todos los horarios
@@ -75,11 +66,16 @@ def cargar_datos_reales():
 
     print(f"Se encontraron {horarios.count()} horarios.\n")
 
-    # 3. Crear 20 reservas por cada horario
-    for h in horarios:
-        crear_reservas_para_horario(h, cantidad=20)
+    # 3. Crear las reservas de todos los horarios en lotes
+    creadas = sembrar_reservas(
+        horarios,
+        cantidad,
+        pasajero=pasajero_real,
+        asientos_aleatorios=True,
+        batch_size=batch_size,
+    )
 
     print("\n==============================")
-    print("✔ TODOS LOS HORARIOS TIENEN 20 PASAJEROS")
+    print(f"✔ {creadas} RESERVAS CREADAS ({cantidad} POR HORARIO)")
     print("==============================\n")
     return True
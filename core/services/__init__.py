@@ -1,3 +1,14 @@
 from .ocupacion_service import OcupacionService
+from .cache_ocupacion_service import (
+    CacheOcupacionService,
+    estadisticas_cache,
+    invalidar_ocupacion,
+)
 from .transferencia_service import TransferenciaFacade
-from .factory import build_transferencia_facade
+from .incidente_service import IncidenteService, incidentes_del_request
+from .rebalanceo_service import ModeloOcupacion, PlanificadorRebalanceo
+from .factory import (
+    build_transferencia_facade,
+    build_ocupacion_service,
+    build_planificador_rebalanceo,
+)
@@ -0,0 +1,86 @@
+from django.db import connection
+
+from reservas import fts
+from reservas.models import Reserva
+from core.models import TransferLogReserva
+
+
+class HistorialPasajero:
+    """Una reserva (dónde está hoy el pasajero) y su cadena de transferencias."""
+
+    def __init__(self, reserva, transferencias):
+        self.reserva = reserva
+        self.transferencias = transferencias    # TransferLog, del más viejo al más nuevo
+
+    @property
+    def horario(self):
+        return self.reserva.horario
+
+    @property
+    def asiento(self):
+        return self.reserva.asiento
+
+    @property
+    def veces(self):
+        return len(self.transferencias)
+
+
+def _reservas():
+    return Reserva.objects.select_related("horario__ruta", "horario__bus__cooperativa")
+
+
+def buscar_por_cedula(cedula, limite=50):
+    """Reservas con esa cédula (índice reserva_cedula_idx), las más nuevas primero."""
+    reservas = list(_reservas().filter(cedula=cedula.strip()).order_by("-id")[:limite])
+    return _historiales(reservas)
+
+
+def buscar_por_nombre(prefijo, limite=50):
+    """
+    Reservas cuyo nombre tiene esas palabras, la última como prefijo
+    ("juan pe" → Juan Pérez). En SQLite va por el índice FTS5 (ver
+    reservas/fts.py); en otra base, por istartswith sobre el nombre.
+    """
+    if fts.disponible(connection):
+        ids = fts.buscar_ids(connection, prefijo, limite)
+        if not ids:
+            return []
+        reservas = list(_reservas().filter(id__in=ids).order_by("-id"))
+    else:
+        prefijo = prefijo.strip()
+        if len(prefijo) < fts.MIN_PREFIJO:
+            return []
+        reservas = list(
+            _reservas().filter(nombre_pasajero__istartswith=prefijo).order_by("-id")[:limite]
+        )
+    return _historiales(reservas)
+
+
+def buscar_pasajeros(texto, limite=50):
+    """Solo dígitos → cédula; cualquier otra cosa → prefijo de nombre."""
+    texto = (texto or "").strip()
+    if not texto:
+        return []
+    if texto.isdigit():
+        return buscar_por_cedula(texto, limite)
+    return buscar_por_nombre(texto, limite)
+
+
+def _historiales(reservas):
+    if not reservas:
+        return []
+
+    # Todas las cadenas en una consulta, por el índice (reserva, log)
+    cadenas = {}
+    enlaces = (
+        TransferLogReserva.objects.filter(reserva_id__in=[r.id for r in reservas])
+        .select_related(
+            "log__operador", "log__origen__ruta", "log__origen__bus",
+            "log__destino__ruta", "log__destino__bus",
+        )
+        .order_by("log__fecha", "log_id")
+    )
+    for enlace in enlaces:
+        cadenas.setdefault(enlace.reserva_id, []).append(enlace.log)
+
+    return [HistorialPasajero(r, cadenas.get(r.id, [])) for r in reservas]
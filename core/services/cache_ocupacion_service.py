@@ -0,0 +1,163 @@
+import itertools
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from administracion.models import Horario
+from core import metricas
+
+
+CACHE_HITS = metricas.REGISTRO.contador(
+    "smartbus_cache_ocupacion_total",
+    "Lecturas de ocupación contra la caché, por resultado (hit, miss).",
+    etiquetas=("resultado",),
+)
+
+_estadisticas = {"hits": 0, "misses": 0}
+_lock = threading.Lock()
+_secuencia = itertools.count()
+
+
+def _config():
+    return getattr(settings, "OCUPACION_CACHE", {})
+
+
+def _cache():
+    return caches[_config().get("ALIAS", "default")]
+
+
+def _timeout():
+    return _config().get("TIMEOUT", 300)
+
+
+def _clave_version(horario_id):
+    return f"ocupacion:v:{horario_id}"
+
+
+def _clave_valor(horario_id, version):
+    return f"ocupacion:{horario_id}:{version}"
+
+
+def _nueva_version():
+    # Única por proceso y en el tiempo: no hace falta incr() (FileBasedCache no es atómico)
+    return f"{time.time_ns():x}.{next(_secuencia)}"
+
+
+def _contar(hits, misses):
+    with _lock:
+        _estadisticas["hits"] += hits
+        _estadisticas["misses"] += misses
+    if hits:
+        CACHE_HITS.inc(hits, resultado="hit")
+    if misses:
+        CACHE_HITS.inc(misses, resultado="miss")
+
+
+def estadisticas_cache():
+    """Hits/misses de este proceso (el total entre workers está en /metrics/)."""
+    with _lock:
+        hits, misses = _estadisticas["hits"], _estadisticas["misses"]
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "ratio": round(hits / total, 4) if total else 0.0,
+    }
+
+
+def reiniciar_estadisticas():
+    with _lock:
+        _estadisticas["hits"] = _estadisticas["misses"] = 0
+
+
+def invalidar_ocupacion(horario_ids):
+    """
+    Sube la versión de esos horarios: ya y otra vez al commit. La de
+    ahora es para quien escribe (lee su propio cambio dentro de la
+    transacción); la del commit descarta lo que otro request haya
+    guardado en el medio con datos todavía sin confirmar.
+    """
+    ids = {int(i) for i in horario_ids if i is not None}
+    if not ids:
+        return
+
+    def subir():
+        _cache().set_many(
+            {_clave_version(i): _nueva_version() for i in ids}, timeout=None
+        )
+
+    subir()
+    transaction.on_commit(subir)
+
+
+class CacheOcupacionService:
+    """
+    Decorator de OcupacionService: calcular() se guarda en la caché de
+    Django con clave (horario id, versión). La versión la sube
+    invalidar_ocupacion() (señales de Reserva/Horario y caminos de
+    transferencia), así nunca se lee una ocupación anterior a un cambio.
+
+    Funciona con LocMemCache (un proceso) y FileBasedCache (compartida
+    entre workers). calcular_muchos() delega sin caché: ya es una consulta.
+    """
+
+    def __init__(self, servicio):
+        self.servicio = servicio
+
+    def calcular(self, horario):
+        return self.calcular_ids([horario.id])[horario.id]
+
+    def calcular_ids(self, horario_ids):
+        """{horario_id: (ocupacion, usados, capacidad)} con a lo sumo una consulta."""
+        cache = _cache()
+        ids = list(dict.fromkeys(horario_ids))
+
+        # 1) versiones (antes de leer la BD: si cambia algo después, esa versión ya no sirve)
+        claves_version = {i: _clave_version(i) for i in ids}
+        versiones = cache.get_many(claves_version.values())
+        nuevas = {
+            clave: _nueva_version()
+            for clave in claves_version.values() if clave not in versiones
+        }
+        if nuevas:
+            cache.set_many(nuevas, timeout=None)
+            versiones.update(nuevas)
+
+        # 2) valores cacheados
+        claves_valor = {i: _clave_valor(i, versiones[claves_version[i]]) for i in ids}
+        guardados = cache.get_many(claves_valor.values())
+
+        resultado = {}
+        faltan = []
+        for i in ids:
+            valor = guardados.get(claves_valor[i])
+            if valor is None:
+                faltan.append(i)
+            else:
+                resultado[i] = tuple(valor)
+
+        # 3) los que faltan, desde la BD en una sola consulta
+        if faltan:
+            calculados = {}
+            for horario_id, capacidad, usados in Horario.objects.filter(id__in=faltan).values_list(
+                "id", "bus__capacidad", "asientos_ocupados"
+            ):
+                calculados[claves_valor[horario_id]] = _ocupacion(usados, capacidad or 0)
+                resultado[horario_id] = calculados[claves_valor[horario_id]]
+            cache.set_many(calculados, timeout=_timeout())
+
+        _contar(len(ids) - len(faltan), len(faltan))
+        return resultado
+
+    def calcular_muchos(self, horarios, umbral_strategy=None):
+        return self.servicio.calcular_muchos(horarios, umbral_strategy=umbral_strategy)
+
+
+def _ocupacion(usados, capacidad):
+    # Misma cuenta que OcupacionService.calcular
+    if capacidad <= 0:
+        return 0.0, usados, capacidad
+    return round((usados / capacidad) * 100.0, 2), usados, capacidad
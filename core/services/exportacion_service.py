@@ -0,0 +1,226 @@
+import csv
+import datetime
+import json
+import logging
+import time
+import zlib
+from decimal import Decimal
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from reservas.models import Negociacion, Reserva
+from core import metricas
+from core.models import TransferLog
+
+
+logger = logging.getLogger("smartbus.exportacion")
+
+EXPORTACION_FILAS = metricas.REGISTRO.contador(
+    "smartbus_exportacion_filas_total",
+    "Filas exportadas (CSV/NDJSON), por tipo.",
+    etiquetas=("tipo",),
+)
+
+
+# ---------------------------------------------------
+# Qué se exporta de cada modelo
+# ---------------------------------------------------
+
+class Exportable:
+    """
+    Columnas (rutas de values_list) de un modelo, el campo de fecha del
+    rango y cómo filtrar por cooperativa.
+    """
+
+    def __init__(self, modelo, columnas, campo_fecha, filtro_cooperativa):
+        self.modelo = modelo
+        self.columnas = columnas
+        self.campo_fecha = campo_fecha
+        self.filtro_cooperativa = filtro_cooperativa
+
+    def queryset(self, cooperativa_id=None, desde=None, hasta=None):
+        qs = self.modelo.objects.all()
+        if cooperativa_id is not None:
+            qs = qs.filter(self.filtro_cooperativa(cooperativa_id))
+        if desde is not None:
+            qs = qs.filter(**{f"{self.campo_fecha}__gte": desde})
+        if hasta is not None:
+            qs = qs.filter(**{f"{self.campo_fecha}__lt": hasta})
+        # Orden por pk: el recorrido es estable y no necesita ordenar en memoria
+        return qs.order_by("pk").values_list(*self.columnas)
+
+
+EXPORTABLES = {
+    "reservas": Exportable(
+        Reserva,
+        (
+            "id", "horario_id", "horario__hora_salida", "horario__ruta__origen",
+            "horario__ruta__destino", "horario__bus__placa", "horario__bus__cooperativa_id",
+            "asiento", "nombre_pasajero", "cedula", "transferida", "restringida",
+        ),
+        "horario__hora_salida",
+        lambda coop: Q(horario__bus__cooperativa_id=coop),
+    ),
+    "transferencias": Exportable(
+        TransferLog,
+        (
+            "id", "fecha", "operador__username", "origen_id", "origen__bus__cooperativa_id",
+            "destino_id", "destino__bus__cooperativa_id", "cantidad_pasajeros", "reservas",
+            "capacidad_origen_antes", "capacidad_origen_despues",
+            "capacidad_destino_antes", "capacidad_destino_despues", "estado", "mensaje",
+        ),
+        "fecha",
+        lambda coop: Q(origen__bus__cooperativa_id=coop) | Q(destino__bus__cooperativa_id=coop),
+    ),
+    "negociaciones": Exportable(
+        Negociacion,
+        (
+            "id", "fecha", "origen_id", "origen__bus__cooperativa_id", "destino_id",
+            "destino__bus__cooperativa_id", "reservas", "cantidad_pasajeros", "costo_por_pasajero",
+            "costo_operativo_destino", "compensacion_minima", "precio_final", "estado",
+        ),
+        "fecha",
+        lambda coop: Q(origen__bus__cooperativa_id=coop) | Q(cooperativa_destino_id=coop),
+    ),
+}
+
+FORMATOS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+# ---------------------------------------------------
+# Serialización en streaming
+# ---------------------------------------------------
+
+class _Linea:
+    """Destino de csv.writer que solo devuelve lo escrito."""
+
+    def write(self, valor):
+        return valor
+
+
+def _json_valor(valor):
+    if isinstance(valor, (datetime.date, datetime.datetime)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+class EstadisticasExportacion:
+    def __init__(self):
+        self.filas = 0
+        self.bytes = 0
+        self.inicio = time.perf_counter()
+        self.fin = None
+
+    @property
+    def segundos(self):
+        return (self.fin or time.perf_counter()) - self.inicio
+
+    @property
+    def filas_por_segundo(self):
+        return self.filas / self.segundos if self.segundos else 0.0
+
+    def resumen(self):
+        return (
+            f"{self.filas} filas, {self.bytes / 1024 / 1024:.2f} MB en {self.segundos:.2f}s "
+            f"({self.filas_por_segundo:,.0f} filas/s)"
+        )
+
+
+def exportar(tipo, formato="csv", cooperativa_id=None, desde=None, hasta=None,
+             comprimir=False, chunk_size=2000, estadisticas=None, bloque=64 * 1024):
+    """
+    Generador de bytes con el volcado de 'tipo' (ver EXPORTABLES).
+
+    Las filas salen de values_list().iterator(chunk_size): en memoria
+    solo hay un tramo de filas y un bloque de salida (~'bloque' bytes)
+    a la vez, sin importar cuántas filas haya. Con comprimir=True la
+    salida es gzip.
+    """
+    exportable = EXPORTABLES[tipo]
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}")
+
+    estadisticas = estadisticas or EstadisticasExportacion()
+    filas = exportable.queryset(cooperativa_id, desde, hasta).iterator(chunk_size=chunk_size)
+    columnas = [c.replace("__", "_") for c in exportable.columnas]
+
+    if formato == "csv":
+        escritor = csv.writer(_Linea())
+        lineas = _lineas_csv(escritor, columnas, filas, estadisticas)
+    else:
+        lineas = _lineas_ndjson(columnas, filas, estadisticas)
+
+    compresor = zlib.compressobj(wbits=31) if comprimir else None  # 31 = formato gzip
+    buffer = []
+    tamano = 0
+
+    def vaciar():
+        datos = "".join(buffer).encode("utf-8")
+        buffer.clear()
+        if compresor is not None:
+            datos = compresor.compress(datos)
+        estadisticas.bytes += len(datos)
+        return datos
+
+    for linea in lineas:
+        buffer.append(linea)
+        tamano += len(linea)
+        if tamano >= bloque:
+            tamano = 0
+            datos = vaciar()
+            if datos:
+                yield datos
+
+    datos = vaciar()
+    if compresor is not None:
+        final = compresor.flush()
+        estadisticas.bytes += len(final)
+        datos += final
+    estadisticas.fin = time.perf_counter()
+    if datos:
+        yield datos
+
+    EXPORTACION_FILAS.inc(estadisticas.filas, tipo=tipo)
+    logger.info("Exportación %s (%s): %s", tipo, formato, estadisticas.resumen())
+
+
+def _lineas_csv(escritor, columnas, filas, estadisticas):
+    yield escritor.writerow(columnas)
+    for fila in filas:
+        estadisticas.filas += 1
+        yield escritor.writerow([
+            json.dumps(v) if isinstance(v, (list, dict)) else v for v in fila
+        ])
+
+
+def _lineas_ndjson(columnas, filas, estadisticas):
+    for fila in filas:
+        estadisticas.filas += 1
+        yield json.dumps(
+            dict(zip(columnas, map(_json_valor, fila))), ensure_ascii=False
+        ) + "\n"
+
+
+def parsear_fecha(texto):
+    """'AAAA-MM-DD' o fecha/hora ISO -> datetime con zona (None si viene vacío)."""
+    if not texto:
+        return None
+
+    valor = parse_datetime(texto)
+    if valor is None:
+        fecha = parse_date(texto)
+        if fecha is None:
+            raise ValueError(f"Fecha inválida: {texto}")
+        valor = datetime.datetime.combine(fecha, datetime.time.min)
+
+    if timezone.is_naive(valor):
+        valor = timezone.make_aware(valor)
+    return valor
+
+
+def nombre_archivo(tipo, formato, comprimir):
+    return f"{tipo}.{formato}" + (".gz" if comprimir else "")
@@ -1,13 +1,27 @@
+from django.conf import settings
+
 from core.repositories import ReservaRepository, TransferLogRepository
+from core.services.cache_ocupacion_service import CacheOcupacionService
 from core.services.ocupacion_service import OcupacionService
+from core.services.rebalanceo_service import PlanificadorRebalanceo
 from core.services.transferencia_service import TransferenciaFacade
 from core.strategies import UmbralPorcentajeStrategy
 
 
+def build_ocupacion_service(reserva_repo=None):
+    servicio = OcupacionService(reserva_repo or ReservaRepository())
+
+    if getattr(settings, "OCUPACION_CACHE", {}).get("ACTIVA", True):
+        return CacheOcupacionService(servicio)
+    return servicio
+
+
 def build_transferencia_facade():
     reserva_repo = ReservaRepository()
     log_repo = TransferLogRepository()
 
+    # Sin caché: la facade calcula sobre los horarios que acaba de bloquear
+    # (la caché local de otro proceso puede estar atrasada)
     ocupacion_service = OcupacionService(reserva_repo)
 
     # Regla actual (ajusta el número si tu umbral es otro)
@@ -19,3 +33,10 @@ def build_transferencia_facade():
         reserva_repo=reserva_repo,
         log_repo=log_repo,
     )
+
+
+def build_planificador_rebalanceo(umbral=30, ventana=None):
+    return PlanificadorRebalanceo(
+        umbral_strategy=UmbralPorcentajeStrategy(umbral_minimo=umbral),
+        ventana=ventana,
+    )
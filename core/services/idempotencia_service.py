@@ -0,0 +1,90 @@
+import uuid
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from core.models import SolicitudIdempotente
+from core.reintentos import con_reintentos
+
+
+CAMPO = "clave_idempotencia"
+
+
+def nueva_clave():
+    """Clave para un formulario / enlace recién mostrado."""
+    return uuid.uuid4().hex
+
+
+def clave_del_request(request):
+    """La clave que mandó el cliente (POST o querystring), o None si no hay o no sirve."""
+    clave = (request.POST.get(CAMPO) or request.GET.get(CAMPO) or "").strip()
+    if not clave or len(clave) > SolicitudIdempotente._meta.get_field("clave").max_length:
+        return None
+    return clave
+
+
+def _filtro(usuario, operacion, clave):
+    return {"operador": usuario, "operacion": operacion, "clave": clave}
+
+
+def resultado_previo(usuario, operacion, clave):
+    """
+    (ok, mensaje) guardado para este envío, o None si es nuevo (o no
+    trae clave). Una consulta por el índice idempotencia_clave_unica:
+    la vista la hace antes que nada y, si hay resultado, responde con él
+    sin volver a entrar a la transacción.
+    """
+    if not clave or not usuario.is_authenticated:
+        return None
+    previa = (
+        SolicitudIdempotente.objects.filter(**_filtro(usuario, operacion, clave))
+        .only("ok", "mensaje")
+        .first()
+    )
+    return None if previa is None else (previa.ok, previa.mensaje)
+
+
+def ejecutar_una_vez(usuario, operacion, clave, funcion):
+    """
+    Ejecuta funcion() -> (ok, mensaje) y guarda el resultado con la
+    clave, en la misma transacción (llamar después de resultado_previo).
+
+    La transacción es una sola y es la que se reintenta si choca con un
+    bloqueo: funcion() no debe reintentar por su cuenta (p. ej.
+    ejecutar_transferencia(..., reintentar=False)).
+
+    Dos envíos a la vez: el segundo choca con el índice único al
+    insertar la clave (cuando el primero ya confirmó) y devuelve lo que
+    guardó el primero. Si funcion() lanza una excepción no queda nada
+    guardado y el envío se puede repetir. Sin clave, solo funcion() en
+    su transacción.
+    """
+    con_clave = bool(clave) and usuario.is_authenticated
+    filtro = _filtro(usuario, operacion, clave)
+
+    def transaccion(intento):
+        with transaction.atomic():
+            if not con_clave:
+                return funcion()
+            solicitud = SolicitudIdempotente.objects.create(**filtro)
+            ok, mensaje = funcion()
+            solicitud.ok, solicitud.mensaje = ok, mensaje
+            solicitud.save(update_fields=["ok", "mensaje"])
+        return ok, mensaje
+
+    try:
+        return con_reintentos(transaccion, via=operacion.split(":")[0])
+    except IntegrityError:
+        previa = resultado_previo(usuario, operacion, clave)
+        if previa is None:
+            raise
+        return previa
+
+
+def purgar_solicitudes(horas=24):
+    """Borra las claves de más de 'horas' horas; devuelve cuántas."""
+    borradas, _ = SolicitudIdempotente.objects.filter(
+        fecha__lt=timezone.now() - timedelta(hours=horas)
+    ).delete()
+    return borradas
@@ -0,0 +1,55 @@
+from django.db.models import Value
+from django.utils import timezone
+
+from core.models import IncidenteCooperativa
+
+
+class IncidenteService:
+    """
+    ¿Hay un incidente vigente que afecte a este bus / ruta / cooperativa?
+
+    Una sola consulta, sobre los índices parciales de activos por bus,
+    ruta y cooperativa: no depende de cuántos incidentes haya. La respuesta se recuerda en la instancia, así que
+    una instancia por request (ver incidentes_del_request) evita repetir
+    la consulta para pasajeros del mismo horario.
+    """
+
+    def __init__(self, ahora=None):
+        self.ahora = ahora or timezone.now()
+        self._cache = {}
+
+    def incidente_para(self, bus_id=None, ruta_id=None, cooperativa_id=None):
+        """El incidente más específico (bus > ruta > cooperativa) y más nuevo, o None."""
+        clave = (bus_id, ruta_id, cooperativa_id)
+        if clave not in self._cache:
+            self._cache[clave] = self._buscar(bus_id, ruta_id, cooperativa_id)
+        return self._cache[clave]
+
+    def incidente_para_horario(self, horario):
+        return self.incidente_para(horario.bus_id, horario.ruta_id, horario.bus.cooperativa_id)
+
+    def _buscar(self, bus_id, ruta_id, cooperativa_id):
+        # Un SELECT por alcance unidos con UNION ALL: cada uno entra por su
+        # índice parcial; con un OR entre columnas SQLite usa los de la FK
+        # y recorre también los incidentes inactivos.
+        vigentes = IncidenteCooperativa.objects.vigentes(self.ahora)
+        partes = [
+            vigentes.filter(**{campo: valor}).annotate(prioridad=Value(prioridad))
+            for prioridad, (campo, valor) in enumerate(
+                (("bus_id", bus_id), ("ruta_id", ruta_id), ("cooperativa_id", cooperativa_id))
+            )
+            if valor is not None
+        ]
+        if not partes:
+            return None
+
+        consulta = partes[0].union(*partes[1:], all=True) if len(partes) > 1 else partes[0]
+        return consulta.order_by("prioridad", "-fecha", "-id").first()
+
+
+def incidentes_del_request(request):
+    """IncidenteService compartido por todo el request (caché de una sola vida)."""
+    servicio = getattr(request, "_incidentes", None)
+    if servicio is None:
+        servicio = request._incidentes = IncidenteService()
+    return servicio
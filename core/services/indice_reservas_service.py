@@ -0,0 +1,80 @@
+from django.db.models import Count
+
+from reservas.models import Negociacion, NegociacionReserva
+from core.models import TransferLog, TransferLogReserva
+
+
+class IndiceReservas:
+    """Un modelo con lista JSON 'reservas' y su tabla de enlaces."""
+
+    def __init__(self, modelo, enlace, campo):
+        self.modelo = modelo
+        self.enlace = enlace
+        self.campo = campo          # FK del enlace hacia 'modelo'
+
+    def tramos(self, chunk_size):
+        """(id, reservas) ordenados por id, de a 'chunk_size' (paginación por clave)."""
+        ultimo = 0
+        while True:
+            filas = list(
+                self.modelo.objects.filter(id__gt=ultimo)
+                .order_by("id")
+                .values_list("id", "reservas")[:chunk_size]
+            )
+            if not filas:
+                return
+            yield filas
+            ultimo = filas[-1][0]
+
+
+INDICES = {
+    "transferencias": IndiceReservas(TransferLog, TransferLogReserva, "log"),
+    "negociaciones": IndiceReservas(Negociacion, NegociacionReserva, "negociacion"),
+}
+
+
+def _ids(reservas):
+    return {int(i) for i in reservas or []}
+
+
+def indexar_reservas(tipo, chunk_size=1000):
+    """
+    Llena la tabla de enlaces de 'tipo' (ver INDICES) con las listas
+    JSON ya guardadas. Es idempotente (ignore_conflicts sobre la
+    restricción única), así que se puede cortar y volver a correr.
+
+    Devuelve (filas recorridas, enlaces nuevos).
+    """
+    indice = INDICES[tipo]
+    antes = indice.enlace.objects.count()
+    filas = 0
+
+    for tramo in indice.tramos(chunk_size):
+        filas += len(tramo)
+        indice.enlace.objects.bulk_create(
+            [
+                indice.enlace(**{f"{indice.campo}_id": pk, "reserva_id": reserva_id})
+                for pk, reservas in tramo
+                for reserva_id in _ids(reservas)
+            ],
+            ignore_conflicts=True,
+            batch_size=chunk_size,
+        )
+
+    return filas, indice.enlace.objects.count() - antes
+
+
+def verificar_indice(tipo, chunk_size=1000):
+    """Ids cuyo número de enlaces no coincide con su lista JSON."""
+    indice = INDICES[tipo]
+    distintos = []
+
+    for tramo in indice.tramos(chunk_size):
+        enlaces = dict(
+            indice.modelo.objects.filter(id__in=[pk for pk, _ in tramo])
+            .annotate(n=Count("enlaces"))
+            .values_list("id", "n")
+        )
+        distintos.extend(pk for pk, reservas in tramo if enlaces.get(pk) != len(_ids(reservas)))
+
+    return distintos
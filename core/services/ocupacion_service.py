@@ -4,10 +4,39 @@ class OcupacionService:
 
     def calcular(self, horario):
         capacidad = getattr(horario.bus, "capacidad", 0) or 0
-        usados = self.reserva_repo.contar_por_horario(horario)
+        usados = horario.asientos_ocupados  # contador desnormalizado en Horario
 
         if capacidad <= 0:
             return 0.0, usados, capacidad
 
         ocupacion = (usados / capacidad) * 100.0
         return round(ocupacion, 2), usados, capacidad
+
+    def calcular_muchos(self, horarios, umbral_strategy=None):
+        """
+        Versión por lotes de calcular(): una sola consulta agregada
+        para todos los horarios. Devuelve la lista de horarios con los
+        atributos usados, capacidad, libres (sin los retenidos) y ocupacion_porcentaje
+        (y estado, si se pasa una estrategia de umbral).
+        """
+        resultado = []
+
+        for h in self.reserva_repo.anotar_usados(horarios):
+            capacidad = getattr(h.bus, "capacidad", 0) or 0
+
+            if capacidad <= 0:
+                ocupacion = 0.0
+            else:
+                ocupacion = round((h.usados / capacidad) * 100.0, 2)
+
+            h.capacidad = capacidad
+            h.libres = capacidad - h.usados - h.asientos_retenidos
+            h.ocupacion_porcentaje = ocupacion
+            resultado.append(h)
+
+        if umbral_strategy is not None:
+            criticos = umbral_strategy.cumple_muchos([h.ocupacion_porcentaje for h in resultado])
+            for h, critico in zip(resultado, criticos):
+                h.estado = "CRÍTICO" if critico else "OK"
+
+        return resultado
@@ -0,0 +1,76 @@
+from django.db import transaction
+from django.db.models import Q
+
+from administracion.models import Horario
+from administracion.signals import ocupacion_cambiada
+from reservas.models import Reserva
+from core.models import ReactivacionLog
+
+
+class ReactivacionError(Exception):
+    pass
+
+
+def _alcance(incidente):
+    # Reservas cuyo horario cae dentro del incidente
+    if incidente.bus_id:
+        return Q(horario__bus_id=incidente.bus_id)
+    if incidente.ruta_id:
+        return Q(horario__ruta_id=incidente.ruta_id)
+    return Q(horario__bus__cooperativa_id=incidente.cooperativa_id)
+
+
+def seleccionar_transferidas(cooperativa, reserva_ids=None, horario_id=None, incidente=None):
+    """
+    (criterio, queryset) de las reservas transferidas de 'cooperativa' que
+    entran en la reactivación: las elegidas, las de un horario, las que
+    afecta un incidente o, sin nada de eso, todas.
+    """
+    qs = Reserva.objects.filter(
+        transferida=True,
+        horario_id__in=Horario.objects.filter(bus__cooperativa=cooperativa).values("id"),
+    )
+
+    if reserva_ids:
+        return "SELECCION", qs.filter(id__in=reserva_ids)
+    if horario_id:
+        return "HORARIO", qs.filter(horario_id=horario_id)
+    if incidente is not None:
+        if not incidente.esta_activo:
+            raise ReactivacionError("El incidente ya no está vigente.")
+        return "INCIDENTE", qs.filter(_alcance(incidente))
+    return "TODOS", qs
+
+
+def reactivar_masivo(cooperativa, usuario, reserva_ids=None, horario_id=None, incidente=None):
+    """
+    Quita la marca 'transferida' a todas las reservas elegidas con un solo
+    UPDATE y deja una entrada de auditoría (ReactivacionLog) con el resumen.
+
+    No pasa por Reserva.save(), así que avisa con ocupacion_cambiada para
+    invalidar la caché de ocupación de los horarios tocados.
+    """
+    criterio, qs = seleccionar_transferidas(cooperativa, reserva_ids, horario_id, incidente)
+
+    with transaction.atomic():
+        filas = list(qs.order_by("id").values_list("id", "horario_id"))
+        if not filas:
+            return None
+
+        ids = [reserva_id for reserva_id, _ in filas]
+        horarios = sorted({horario_id for _, horario_id in filas})
+
+        # Mismo filtro que el SELECT (sin una lista IN de miles de ids)
+        cantidad = qs.update(transferida=False)
+        log = ReactivacionLog.objects.create(
+            operador=usuario,
+            cooperativa=cooperativa,
+            incidente=incidente,
+            criterio=criterio,
+            cantidad=cantidad,
+            reservas=ids,
+            horarios=horarios,
+        )
+        ocupacion_cambiada.send(sender=Reserva, horario_ids=horarios)
+
+    return log
@@ -0,0 +1,194 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+from django.utils import timezone
+
+from administracion.models import Horario
+from reservas.models import Reserva
+
+
+class ModeloOcupacion:
+    """
+    Ocupación de muchas salidas en arreglos compactos (una columna por
+    atributo, un índice por salida). Decenas de miles de horarios ocupan
+    unos pocos MB y se recorren sin crear objetos del ORM.
+    """
+
+    def __init__(self):
+        self.ids = array("q")
+        self.rutas = array("q")
+        self.cooperativas = array("q")
+        self.salidas = array("d")      # timestamp (segundos)
+        self.capacidades = array("l")
+        self.usados = array("l")
+        self.bloqueados = array("b")   # tiene pasajeros ya transferidos
+
+    def __len__(self):
+        return len(self.ids)
+
+    def agregar(self, horario_id, ruta_id, cooperativa_id, salida, capacidad, usados, bloqueado=False):
+        self.ids.append(horario_id)
+        self.rutas.append(ruta_id)
+        self.cooperativas.append(cooperativa_id)
+        self.salidas.append(salida)
+        self.capacidades.append(capacidad)
+        self.usados.append(usados)
+        self.bloqueados.append(1 if bloqueado else 0)
+
+    def porcentajes(self):
+        return [
+            round((u / c) * 100.0, 2) if c > 0 else 0.0
+            for u, c in zip(self.usados, self.capacidades)
+        ]
+
+    @classmethod
+    def desde_bd(cls, horarios=None, desde=None):
+        """
+        Carga las salidas que aún no han salido con dos consultas:
+        columnas del horario (+ bus) y horarios con pasajeros ya transferidos
+        (esos no se pueden vaciar: ejecutar_transferencia los rechazaría).
+        """
+        desde = desde or timezone.now()
+        horarios = (horarios if horarios is not None else Horario.objects.all()).filter(
+            hora_salida__gt=desde
+        )
+
+        bloqueados = set(
+            Reserva.objects.filter(transferida=True, horario__in=horarios)
+            .values_list("horario_id", flat=True)
+            .distinct()
+        )
+
+        modelo = cls()
+        filas = horarios.values_list(
+            "id", "ruta_id", "bus__cooperativa_id", "hora_salida",
+            "bus__capacidad", "asientos_ocupados",
+        ).order_by("id")
+
+        for horario_id, ruta_id, coop_id, salida, capacidad, usados in filas.iterator(chunk_size=5000):
+            modelo.agregar(
+                horario_id, ruta_id, coop_id, salida.timestamp(),
+                capacidad, usados, horario_id in bloqueados,
+            )
+
+        return modelo
+
+
+class PlanificadorRebalanceo:
+    """
+    Busca las salidas CRÍTICAS (según la estrategia de umbral) y arma un
+    plan para vaciarlas en otras salidas de la misma ruta y cooperativa,
+    dentro de una ventana de tiempo.
+
+    Heurística greedy tipo bin packing: se vacían primero las salidas
+    con menos pasajeros y cada una va al destino donde queda más justa
+    (best fit). Una salida que recibe pasajeros ya no se vacía.
+    """
+
+    def __init__(self, umbral_strategy, ventana=None):
+        self.umbral_strategy = umbral_strategy
+        self.ventana = ventana or timezone.timedelta(hours=24)
+
+    def planificar(self, modelo):
+        n = len(modelo)
+        ventana = self.ventana.total_seconds()
+
+        libres = array("l", (c - u for c, u in zip(modelo.capacidades, modelo.usados)))
+        vaciado = array("b", bytes(n))
+        recibio = array("b", bytes(n))
+
+        # Salidas de cada ruta ordenadas por hora (para buscar por ventana)
+        por_ruta = {}
+        for i in sorted(range(n), key=modelo.salidas.__getitem__):
+            por_ruta.setdefault(modelo.rutas[i], array("l")).append(i)
+        tiempos_ruta = {
+            ruta: array("d", (modelo.salidas[i] for i in indices))
+            for ruta, indices in por_ruta.items()
+        }
+
+        porcentajes = modelo.porcentajes()
+        mascara = self.umbral_strategy.cumple_muchos(porcentajes)
+        criticos = [i for i, critico in enumerate(mascara) if critico]
+        vacios = sum(1 for i in criticos if modelo.usados[i] == 0)
+
+        movimientos = []
+        sin_destino = []
+
+        candidatos = [
+            i for i in criticos if modelo.usados[i] > 0 and not modelo.bloqueados[i]
+        ]
+        candidatos.sort(key=lambda i: (modelo.usados[i], modelo.salidas[i]))
+
+        for i in candidatos:
+            if recibio[i]:
+                continue
+
+            pasajeros = modelo.usados[i]
+            salida = modelo.salidas[i]
+            indices = por_ruta[modelo.rutas[i]]
+            tiempos = tiempos_ruta[modelo.rutas[i]]
+
+            mejor = -1
+            for pos in range(bisect_left(tiempos, salida - ventana), bisect_right(tiempos, salida + ventana)):
+                j = indices[pos]
+                if j == i or vaciado[j] or libres[j] < pasajeros:
+                    continue
+                if modelo.cooperativas[j] != modelo.cooperativas[i]:
+                    continue
+
+                if (
+                    mejor < 0
+                    or libres[j] < libres[mejor]
+                    or (
+                        libres[j] == libres[mejor]
+                        and abs(modelo.salidas[j] - salida) < abs(modelo.salidas[mejor] - salida)
+                    )
+                ):
+                    mejor = j
+
+            if mejor < 0:
+                sin_destino.append(modelo.ids[i])
+                continue
+
+            vaciado[i] = 1
+            recibio[mejor] = 1
+            libres[mejor] -= pasajeros
+            libres[i] += pasajeros
+
+            movimientos.append({
+                "origen": modelo.ids[i],
+                "destino": modelo.ids[mejor],
+                "pasajeros": pasajeros,
+            })
+
+        return {
+            "salidas": n,
+            "criticos": len(criticos),
+            "vacios": vacios,
+            "movimientos": movimientos,
+            "buses_liberados": len(movimientos),
+            "pasajeros_movidos": sum(m["pasajeros"] for m in movimientos),
+            "sin_destino": sin_destino,
+        }
+
+    def aplicar(self, plan, operador=None):
+        """
+        Ejecuta cada movimiento del plan con ejecutar_transferencia (una
+        transacción por movimiento). Devuelve [(movimiento, ok, msg), ...].
+        """
+        from core.services_old import ejecutar_transferencia
+
+        horarios = Horario.objects.select_related("bus").in_bulk(
+            [m["destino"] for m in plan["movimientos"]]
+        )
+
+        resultados = []
+        for m in plan["movimientos"]:
+            ok, msg = ejecutar_transferencia(
+                Reserva.objects.filter(horario_id=m["origen"]).order_by("asiento"),
+                horarios[m["destino"]],
+                operador=operador,
+            )
+            resultados.append((m, ok, msg))
+
+        return resultados
@@ -0,0 +1,139 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from administracion.models import Horario
+from reservas.models import Reserva, RetencionAsiento
+
+
+class RetencionError(Exception):
+    pass
+
+
+def _config():
+    return getattr(settings, "RETENCION_ASIENTOS", {})
+
+
+def ttl_retencion():
+    return timedelta(seconds=_config().get("TTL", 300))
+
+
+def _bloquear(horario_id):
+    return Horario.objects.select_for_update().select_related("bus").get(id=horario_id)
+
+
+def _purgar_vencidas(horario, ahora):
+    # Con el horario ya bloqueado: borra sus retenciones vencidas y apaga sus bits
+    vencidas = list(
+        horario.retenciones.filter(expira__lte=ahora).values_list("id", "asiento")
+    )
+    if vencidas:
+        RetencionAsiento.objects.filter(id__in=[i for i, _ in vencidas]).delete()
+        horario.liberar_retenidos([asiento for _, asiento in vencidas])
+    return len(vencidas)
+
+
+def retener_asientos(horario, cantidad=1, asientos=None, operador=None, ttl=None):
+    """
+    Aparta asientos de 'horario' hasta ahora + ttl (por defecto
+    RETENCION_ASIENTOS['TTL']). Sin 'asientos', toma los primeros
+    'cantidad' libres del mapa de bits (ocupados | retenidos), así que
+    nunca choca con otra retención ni reintenta.
+
+    Devuelve la lista de RetencionAsiento; RetencionError si no alcanzan.
+    """
+    ahora = timezone.now()
+    expira = ahora + (ttl or ttl_retencion())
+
+    with transaction.atomic():
+        bloqueado = _bloquear(horario.id)
+        _purgar_vencidas(bloqueado, ahora)
+
+        if asientos:
+            tomados = [a for a in asientos if not bloqueado.esta_disponible(a)]
+            if tomados:
+                raise RetencionError(f"Asientos no disponibles: {tomados}")
+            elegidos = list(asientos)
+        else:
+            elegidos = bloqueado.asientos_libres(cantidad)
+            if len(elegidos) < cantidad:
+                raise RetencionError(
+                    f"Solo hay {len(elegidos)} asientos libres para retener."
+                )
+
+        retenciones = RetencionAsiento.objects.bulk_create([
+            RetencionAsiento(horario=bloqueado, asiento=a, operador=operador, expira=expira)
+            for a in elegidos
+        ])
+        bloqueado.marcar_retenidos(elegidos)
+
+    # El horario en memoria queda con el mapa nuevo
+    horario.retenidos_bitmap = bloqueado.retenidos_bitmap
+    horario.asientos_retenidos = bloqueado.asientos_retenidos
+    return retenciones
+
+
+def liberar_retencion(retencion):
+    """Suelta una retención antes de que venza (venta cancelada)."""
+    with transaction.atomic():
+        bloqueado = _bloquear(retencion.horario_id)
+        borradas, _ = RetencionAsiento.objects.filter(id=retencion.id).delete()
+        if borradas:
+            bloqueado.liberar_retenidos([retencion.asiento])
+    return bool(borradas)
+
+
+def confirmar_retencion(retencion, nombre_pasajero, cedula):
+    """
+    Convierte la retención en una Reserva en ese mismo asiento. Si ya
+    venció (o la barrieron), o el asiento terminó ocupado de todos modos,
+    RetencionError: el asiento pudo pasar a otro.
+    """
+    with transaction.atomic():
+        bloqueado = _bloquear(retencion.horario_id)
+        vigente = RetencionAsiento.objects.filter(
+            id=retencion.id, expira__gt=timezone.now()
+        ).exists()
+        if not vigente:
+            raise RetencionError("La retención del asiento ya venció.")
+
+        RetencionAsiento.objects.filter(id=retencion.id).delete()
+        bloqueado.liberar_retenidos([retencion.asiento])
+        try:
+            return Reserva.objects.create(
+                horario_id=retencion.horario_id,
+                nombre_pasajero=nombre_pasajero,
+                cedula=cedula,
+                asiento=retencion.asiento,
+            )
+        except IntegrityError:
+            # Alguien ocupó el asiento por fuera de la retención; el rollback la deja como estaba
+            raise RetencionError("El asiento retenido ya está ocupado por otra reserva.")
+
+
+def barrer_retenciones(lote=None, ahora=None):
+    """
+    Libera las retenciones vencidas por lotes: toma las 'lote' más viejas
+    (índice retencion_expira_idx), y por cada horario involucrado, con el
+    horario bloqueado, borra sus vencidas y apaga los bits. Cada lote va
+    en su propia transacción. Devuelve cuántas liberó.
+    """
+    lote = lote or _config().get("LOTE_BARRIDO", 500)
+    ahora = ahora or timezone.now()
+    total = 0
+
+    while True:
+        horario_ids = sorted(set(
+            RetencionAsiento.objects.filter(expira__lte=ahora)
+            .order_by("expira")
+            .values_list("horario_id", flat=True)[:lote]
+        ))
+        if not horario_ids:
+            return total
+
+        # Todos los horarios del lote bloqueados en un SELECT, en orden de id
+        with transaction.atomic():
+            for horario in Horario.objects.select_for_update().filter(id__in=horario_ids).order_by("id"):
+                total += _purgar_vencidas(horario, ahora)
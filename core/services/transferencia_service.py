@@ -1,10 +1,21 @@
+import time
+
 from django.db import transaction
-from django.utils import timezone
+
+from core import metricas
+from core.bloqueos import bloquear_horarios
+from core.reintentos import con_reintentos
+from core.services.cache_ocupacion_service import invalidar_ocupacion
+
 
 class TransferenciaFacade:
     """
     Facade: expone un método único para la transferencia completa.
     Controller llama solo a esto.
+
+    'ocupacion_service' tiene que calcular sobre el horario que recibe
+    (OcupacionService), no leer de una caché: se le pasan las filas
+    bloqueadas y esa es la ocupación que vale dentro de la transacción.
     """
     def __init__(self, ocupacion_service, umbral_strategy, reserva_repo, log_repo):
         self.ocupacion_service = ocupacion_service
@@ -12,9 +23,33 @@ class TransferenciaFacade:
         self.reserva_repo = reserva_repo
         self.log_repo = log_repo
 
-    @transaction.atomic
     def ejecutar(self, horario_origen, horario_destino, motivo="AUTO"):
-        # 1) calcular ocupación origen
+        inicio = time.perf_counter()
+        resultado = "error"
+        movidas = 0
+
+        def transaccion(intento):
+            with transaction.atomic():
+                return self._ejecutar(horario_origen, horario_destino, motivo)
+
+        try:
+            respuesta = con_reintentos(transaccion, via="facade")
+            resultado = respuesta.get("resultado", "ok" if respuesta["ok"] else "rechazada")
+            movidas = respuesta.get("movidas", 0)
+            return respuesta
+        finally:
+            metricas.registrar_transferencia(
+                "facade", resultado, time.perf_counter() - inicio, movidas
+            )
+
+    def _ejecutar(self, horario_origen, horario_destino, motivo):
+        # 0) los dos horarios bloqueados (en orden de id) antes de leer ocupación;
+        # de aquí en adelante se trabaja con esas filas, no con las que llegaron
+        bloqueados = bloquear_horarios([horario_origen.id, horario_destino.id], via="facade")
+        horario_origen = bloqueados[horario_origen.id]
+        horario_destino = bloqueados[horario_destino.id]
+
+        # 1) calcular ocupación origen (asientos_ocupados / capacidad de la fila bloqueada)
         ocupacion, usados, capacidad = self.ocupacion_service.calcular(horario_origen)
 
         # 2) validar regla (Strategy)
@@ -28,31 +63,39 @@ class TransferenciaFacade:
             }
 
         # 3) validar cupos destino (regla simple, sin complicarte)
+        # Los asientos retenidos no están libres (misma cuenta que _transferir)
         ocup_dest, usados_dest, cap_dest = self.ocupacion_service.calcular(horario_destino)
-        libres_dest = (cap_dest - usados_dest) if cap_dest else 0
+        libres_dest = (cap_dest - usados_dest - horario_destino.asientos_retenidos) if cap_dest else 0
 
         reservas_origen = self.reserva_repo.obtener_por_horario(horario_origen)
-        total_a_mover = reservas_origen.count()
+        ids_a_mover = list(reservas_origen.values_list("id", flat=True))
+        total_a_mover = len(ids_a_mover)
 
         if total_a_mover > libres_dest:
             return {
                 "ok": False,
                 "msg": "Destino sin cupos suficientes.",
+                "resultado": "sin_capacidad",
                 "a_mover": total_a_mover,
                 "libres_dest": libres_dest,
             }
 
         # 4) mover reservas
         self.reserva_repo.mover_reservas(reservas_origen, horario_destino)
+        invalidar_ocupacion([horario_origen.id, horario_destino.id])
 
         # 5) log (SRP: log en repo)
         self.log_repo.crear_log(
-            horario_origen=horario_origen,
-            horario_destino=horario_destino,
-            cantidad=total_a_mover,
-            motivo=motivo,
-            fecha=timezone.now(),
-            ocupacion_origen=ocupacion,
+            origen=horario_origen,
+            destino=horario_destino,
+            reservas=ids_a_mover,
+            cantidad_pasajeros=total_a_mover,
+            capacidad_origen_antes=capacidad - usados,
+            capacidad_origen_despues=capacidad - usados + total_a_mover,
+            capacidad_destino_antes=libres_dest,
+            capacidad_destino_despues=libres_dest - total_a_mover,
+            estado="OK",
+            mensaje=f"Transferencia {motivo} (ocupación origen {ocupacion}%).",
         )
 
         return {
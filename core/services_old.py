@@ -1,14 +1,18 @@
+import time
 from decimal import Decimal
 
-from django.db import transaction
+from django.db import OperationalError, transaction
 from django.utils import timezone
 
 from reservas.models import Reserva
+from reservas.services import mover_a_asientos_libres
 from administracion.models import Horario
+from core import metricas
 from core.models import TransferLog
-
-from django.core.exceptions import ValidationError  # 👈 NUEVO
-
+from core.bloqueos import bloquear_horarios
+from core.reintentos import con_reintentos, es_bloqueo
+from core.repositories import HorarioRepository
+from core.services import build_ocupacion_service, invalidar_ocupacion
 
 
 # ----------------------------------------
@@ -19,14 +23,13 @@ def calcular_ocupacion(horario):
     """
     Devuelve (ocupacion_en_porcentaje, usados, capacidad_total)
     """
-    capacidad = horario.bus.capacidad
-    usados = Reserva.objects.filter(horario=horario).count()
+    # Contador desnormalizado en Horario, leído a través de la caché de ocupación
+    ocupacion, usados, capacidad = build_ocupacion_service().calcular(horario)
 
     if capacidad == 0:
         # Sin bus o sin capacidad configurada
         return 0, 0, 0
 
-    ocupacion = (usados / capacidad) * 100
     return ocupacion, usados, capacidad
 
 
@@ -52,51 +55,86 @@ def cumple_umbral(horario, umbral=30):
 # 3) Buscar rutas alternativas (transferencias)
 # ---------------------------------------------------
 
-def buscar_opciones_transferencia(horario_actual, cantidad_pasajeros):
+def buscar_opciones_transferencia(horario_actual, cantidad_pasajeros, ventana=None):
     """
-    Busca horarios de la misma ruta donde sí haya espacio suficiente
-    para transferir 'cantidad_pasajeros'.
+    Busca horarios de la misma ruta (que no hayan salido y dentro de la
+    ventana de tiempo) donde sí haya espacio suficiente para transferir
+    'cantidad_pasajeros'.
     """
 
-    # Todos los horarios de la misma ruta excepto el actual
-    opciones = Horario.objects.filter(
-        ruta=horario_actual.ruta
-    ).exclude(id=horario_actual.id)
-
-    opciones_filtradas = []
-
-    for h in opciones:
-        ocupacion, usados, capacidad = calcular_ocupacion(h)
-        libres = capacidad - usados
-
-        # Mostrar solo buses donde sí caben los pasajeros
-        if libres >= cantidad_pasajeros:
-            # Atributos auxiliares para la plantilla
-            h.ocupacion_porcentaje = round(ocupacion, 2)
-            h.usados = usados
-            h.capacidad = capacidad
-            h.libres = libres
-            opciones_filtradas.append(h)
+    # Filtro por ruta + ventana + asientos libres, resuelto en la BD
+    opciones = HorarioRepository().buscar_opciones_transferencia(
+        horario_actual,
+        cantidad_minima=cantidad_pasajeros,
+        ventana=ventana,
+    )
 
-    return opciones_filtradas
+    # Deja en cada horario: usados, capacidad, libres, ocupacion_porcentaje
+    # (misma consulta, sin conteos por fila)
+    return build_ocupacion_service().calcular_muchos(opciones)
 
 
 # ---------------------------------------------------
 # 4) Ejecutar transferencia de reservas (CORE mejorado)
 # ---------------------------------------------------
 
-@transaction.atomic
-def ejecutar_transferencia(reservas, horario_destino, operador=None):
+def ejecutar_transferencia(reservas, horario_destino, operador=None, reintentar=True):
     """
     Transfiere una lista de reservas hacia 'horario_destino',
     reasignando asientos sin duplicados y con validaciones extra.
+
+    Con reintentar=False corre una sola vez, dentro de la transacción de
+    quien llama (idempotencia_service.ejecutar_una_vez), que es la que se
+    reintenta entera si choca con un bloqueo; ese choque no se registra
+    aquí como transferencia con error.
     """
+    inicio = time.perf_counter()
+    resultado = "error"
+    cantidad = 0
+
+    def transaccion(intento):
+        nonlocal reservas, cantidad
+        with transaction.atomic():
+            if intento > 1:
+                # El intento que chocó con el bloqueo pudo dejarlas modificadas en memoria
+                reservas = Reserva.objects.filter(id__in=[r.id for r in reservas]).order_by("id")
+            # Se evalúa una sola vez (si llega un queryset) y se trabaja en memoria
+            reservas = list(reservas)
+            cantidad = len(reservas)
+            return _transferir(reservas, horario_destino, operador)
+
+    try:
+        if reintentar:
+            ok, msg, estado = con_reintentos(transaccion, via="ejecutar_transferencia")
+        else:
+            ok, msg, estado = transaccion(1)
+        resultado = estado  # recién después del commit (o de la transacción de afuera)
+        return ok, msg
+    except OperationalError as error:
+        if not reintentar and es_bloqueo(error):
+            resultado = None
+        raise
+    finally:
+        if resultado is not None:
+            metricas.registrar_transferencia(
+                "ejecutar_transferencia", resultado, time.perf_counter() - inicio, cantidad
+            )
+
+
+def _transferir(reservas, horario_destino, operador):
+    # Devuelve (ok, mensaje, resultado para las métricas)
 
     if not reservas:
-        return False, "No se enviaron reservas para transferir."
+        return False, "No se enviaron reservas para transferir.", "rechazada"
 
-    # Tomamos el horario origen de la primera reserva
-    horario_origen = reservas[0].horario
+    # Origen (el de la primera reserva) y destino bloqueados hasta el commit,
+    # en orden de id y antes de leer capacidad: dos transferencias A→B y
+    # B→A al mismo tiempo se esperan en vez de cruzarse (deadlock).
+    bloqueados = bloquear_horarios(
+        [reservas[0].horario_id, horario_destino.id], via="ejecutar_transferencia"
+    )
+    horario_origen = bloqueados[reservas[0].horario_id]
+    destino_bloqueado = bloqueados[horario_destino.id]
 
     # ==================================================================
     # 🔥 VALIDACIÓN GLOBAL: evitar transferencias mixtas o inconsistentes
@@ -110,7 +148,7 @@ def ejecutar_transferencia(reservas, horario_destino, operador=None):
         return False, (
             "Todas las reservas deben tener el mismo horario de origen. "
             f"Reservas inválidas: {horarios_distintos}"
-        )
+        ), "rechazada"
 
     # 2. Validar si alguna reserva YA fue transferida
     reservas_transferidas = [
@@ -125,85 +163,73 @@ def ejecutar_transferencia(reservas, horario_destino, operador=None):
             "No se puede realizar la transferencia. "
             "Las siguientes reservas ya fueron transferidas previamente: "
             + detalle
-        )
+        ), "rechazada"
+
+    # 3. Releídas bajo el bloqueo: otra transferencia pudo moverlas mientras esperábamos
+    vigentes = Reserva.objects.filter(
+        id__in=[r.id for r in reservas], horario_id=horario_origen.id, transferida=False
+    ).count()
+    if vigentes != len(reservas):
+        return False, (
+            "Las reservas cambiaron mientras se procesaba otra transferencia. "
+            "Vuelve a cargar la página."
+        ), "rechazada"
 
     # ==================================================================
     # 🔥 VALIDACIÓN DE HORARIO DESTINO (no transferir a buses ya salidos)
     # ==================================================================
 
     now = timezone.now()
-    if hasattr(horario_destino, "fecha_salida"):
-        if horario_destino.fecha_salida <= now:
-            return False, "No se puede transferir a un bus que ya salió."
+    if destino_bloqueado.hora_salida <= now:
+        return False, "No se puede transferir a un bus que ya salió.", "rechazada"
 
     # ==================================================================
     # 🔥 VALIDACIÓN DE CAPACIDAD ANTES DE TRANSFERIR
     # ==================================================================
 
-    ocup_origen_antes, usados_origen_antes, cap_origen = calcular_ocupacion(horario_origen)
-    ocup_destino_antes, usados_destino_antes, cap_destino = calcular_ocupacion(horario_destino)
+    cap_origen = horario_origen.bus.capacidad
+    cap_destino = destino_bloqueado.bus.capacidad
+    usados_origen_antes = horario_origen.asientos_ocupados
+    usados_destino_antes = destino_bloqueado.asientos_ocupados
 
     cantidad = len(reservas)
-    libres_destino_antes = cap_destino - usados_destino_antes
+    # Los asientos retenidos (venta en curso) tampoco están disponibles
+    libres_destino_antes = cap_destino - usados_destino_antes - destino_bloqueado.asientos_retenidos
 
     if libres_destino_antes < cantidad:
         return False, (
             f"No se pueden transferir {cantidad} pasajeros. "
             f"Solo hay {libres_destino_antes} asientos libres."
-        )
-
-    # ==================================================================
-    # 🔥 ASIGNACIÓN DE ASIENTOS EN DESTINO
-    # ==================================================================
-
-    # Asientos ya ocupados en el horario destino
-    asientos_ocupados = set(
-        Reserva.objects.select_for_update()
-        .filter(horario=horario_destino)
-        .values_list("asiento", flat=True)
-    )
-
-    def siguiente_asiento_libre():
-        for i in range(1, cap_destino + 1):
-            if i not in asientos_ocupados:
-                asientos_ocupados.add(i)
-                return i
-        return None
+        ), "sin_capacidad"
 
     # ==================================================================
-    # 🔥 TRANSFERENCIA REAL (cambia asiento + horario)
+    # 🔥 TRANSFERENCIA REAL (cambia asiento + horario) en un solo UPDATE
     # ==================================================================
 
     coop_origen = horario_origen.bus.cooperativa_id
-    coop_destino = horario_destino.bus.cooperativa_id
+    coop_destino = destino_bloqueado.bus.cooperativa_id
     es_cross_coop = (coop_origen != coop_destino)
 
-    
     for r in reservas:
-        nuevo_asiento = siguiente_asiento_libre()
-        if nuevo_asiento is None:
-            raise ValueError("Error inesperado: no se encontró asiento libre en el bus destino.")
-
-        # 🚨 Validación extra por seguridad (antes de guardar)
-        if Reserva.objects.filter(horario=horario_destino, asiento=nuevo_asiento).exists():
-            raise ValidationError(f"El asiento {nuevo_asiento} ya está ocupado en el horario destino.")
-
-        # ✅ Guardar dentro del loop (esto era tu error)
-        r.asiento = nuevo_asiento
-        r.horario = horario_destino
         r.transferida = True
         r.restringida = es_cross_coop
-        r.save()
 
+    # Primeros 'cantidad' asientos libres del mapa de bits; el índice único
+    # (horario, asiento) rechaza el UPDATE si el mapa estaba atrasado
+    mover_a_asientos_libres(reservas, destino_bloqueado, campos=["transferida", "restringida"])
 
+    # bulk_update no pasa por Reserva.save(): reconstruir ambos mapas
+    Horario.recalcular_asientos([horario_origen.id, horario_destino.id])
+    invalidar_ocupacion([horario_origen.id, horario_destino.id])
 
     # ==================================================================
     # 🔥 VALIDACIÓN DE CAPACIDAD DESPUÉS DE TRANSFERIR
     # ==================================================================
 
-    ocup_origen_despues, usados_origen_despues, _ = calcular_ocupacion(horario_origen)
-    ocup_destino_despues, usados_destino_despues, _ = calcular_ocupacion(horario_destino)
-    libres_destino_despues = cap_destino - usados_destino_despues
+    # El destino sigue bloqueado: los conteos salen por aritmética
+    usados_origen_despues = usados_origen_antes - cantidad
+    usados_destino_despues = usados_destino_antes + cantidad
+    libres_destino_despues = cap_destino - usados_destino_despues - destino_bloqueado.asientos_retenidos
 
     if libres_destino_despues < 0:
         raise ValueError("La transferencia provocó sobrecapacidad en el bus destino.")
@@ -212,7 +238,7 @@ def ejecutar_transferencia(reservas, horario_destino, operador=None):
     # 🔥 REGISTRO EN LOG DE AUDITORÍA
     # ==================================================================
 
-    TransferLog.objects.create(
+    log = TransferLog.objects.create(
         operador=operador,
         origen=horario_origen,
         destino=horario_destino,
@@ -225,8 +251,9 @@ def ejecutar_transferencia(reservas, horario_destino, operador=None):
         estado="OK",
         mensaje="Transferencia realizada correctamente."
     )
+    log.indexar_reservas()
 
-    return True, "Transferencia realizada correctamente."
+    return True, "Transferencia realizada correctamente.", "ok"
 
 
 def obtener_tarifa_ruta(ruta):
@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from administracion.models import Bus, Horario
+from administracion.signals import ocupacion_cambiada
+from reservas.models import Reserva
+from core.services.cache_ocupacion_service import invalidar_ocupacion
+
+
+@receiver(ocupacion_cambiada)
+def invalidar_por_cambio_masivo(sender, horario_ids, **kwargs):
+    invalidar_ocupacion(horario_ids)
+
+
+@receiver(post_save, sender=Horario)
+def invalidar_horario(sender, instance, **kwargs):
+    # Incluye ocupar_asiento / liberar_asiento (guardan con update_fields)
+    invalidar_ocupacion([instance.id])
+
+
+@receiver(post_save, sender=Bus)
+def invalidar_horarios_del_bus(sender, instance, created, **kwargs):
+    # La capacidad sale del bus
+    if not created:
+        invalidar_ocupacion(instance.horario_set.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Reserva)
+@receiver(post_delete, sender=Reserva)
+def invalidar_reserva(sender, instance, **kwargs):
+    invalidar_ocupacion([instance.horario_id])
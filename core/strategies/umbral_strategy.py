@@ -1,11 +1,25 @@
 from abc import ABC, abstractmethod
 
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él se usa la versión en Python puro
+    np = None
+
+
 class UmbralStrategy(ABC):
     @abstractmethod
     def cumple(self, ocupacion_porcentaje: float) -> bool:
         """Retorna True si se debe ejecutar acción según la ocupación."""
         raise NotImplementedError
 
+    def cumple_muchos(self, ocupaciones):
+        """
+        Versión por lotes de cumple(): recibe una secuencia de porcentajes
+        y devuelve una lista de booleanos, uno por porcentaje. Las
+        subclases pueden sobreescribirla con una versión vectorizada.
+        """
+        return [self.cumple(x) for x in ocupaciones]
+
 
 class UmbralPorcentajeStrategy(UmbralStrategy):
     def __init__(self, umbral_minimo: float):
@@ -15,6 +29,14 @@ class UmbralPorcentajeStrategy(UmbralStrategy):
         # Ej: si ocupación es menor al umbral -> CRÍTICO
         return float(ocupacion_porcentaje) < self.umbral_minimo
 
+    def cumple_muchos(self, ocupaciones):
+        # Con NumPy, máscara booleana (ndarray); sin él, lista
+        if np is not None:
+            return np.asarray(ocupaciones, dtype=np.float64) < self.umbral_minimo
+
+        umbral = self.umbral_minimo
+        return [float(x) < umbral for x in ocupaciones]
+
 
 class UmbralRangoStrategy(UmbralStrategy):
     """Ejemplo extra para demostrar OCP sin complicarte."""
@@ -25,3 +47,12 @@ class UmbralRangoStrategy(UmbralStrategy):
     def cumple(self, ocupacion_porcentaje: float) -> bool:
         x = float(ocupacion_porcentaje)
         return self.minimo <= x <= self.maximo
+
+    def cumple_muchos(self, ocupaciones):
+        # Con NumPy, máscara booleana (ndarray); sin él, lista
+        if np is not None:
+            x = np.asarray(ocupaciones, dtype=np.float64)
+            return (self.minimo <= x) & (x <= self.maximo)
+
+        minimo, maximo = self.minimo, self.maximo
+        return [minimo <= float(x) <= maximo for x in ocupaciones]
@@ -0,0 +1,239 @@
+import io
+import itertools
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from administracion.models import Bus, Cooperativa, Horario, Operador, Ruta
+from reservas.models import Negociacion, Reserva
+from core.middleware import normalizar_sql
+from core.models import TransferLog
+from core.services.indice_reservas_service import indexar_reservas
+
+
+# ---------------------------------------------------
+# Presupuesto de consultas por vista
+# ---------------------------------------------------
+
+def reporte_consultas(consultas, maximo, etiqueta=""):
+    """
+    Texto para el fallo: total contra presupuesto y las consultas que
+    se repiten (misma forma, distintos parámetros), de más a menos.
+    """
+    repetidas = Counter(normalizar_sql(q["sql"]) for q in consultas)
+    lineas = [f"{etiqueta or 'vista'}: {len(consultas)} consultas (presupuesto {maximo})"]
+
+    duplicadas = [(sql, n) for sql, n in repetidas.most_common() if n > 1]
+    if duplicadas:
+        lineas.append("Consultas repetidas:")
+        lineas.extend(f"  {n}x {sql}" for sql, n in duplicadas)
+    else:
+        lineas.append("Sin consultas repetidas. Todas las consultas:")
+        lineas.extend(f"  {q['sql']}" for q in consultas)
+
+    return "\n".join(lineas)
+
+
+class PresupuestoConsultasMixin:
+    """
+    Para TestCase: falla si el bloque hace más de 'maximo' consultas y
+    lista las repetidas para que el N+1 se vea de inmediato.
+
+    Con URLS (el módulo urls de una app) recorre además todas sus vistas
+    con los datos de sembrar_datos_vistas en cada uno de TAMANOS: la
+    subclase solo declara
+
+        PRESUPUESTOS  url name -> (máximo de consultas, args según los datos)
+        PARAMETROS    url name -> querystring según los datos (opcional)
+        POST          url name -> formulario según los datos; esas se
+                      envían por POST (opcional)
+        EXCLUIDAS     url name -> por qué no se recorre (opcional)
+        USUARIO       clave de los datos con el usuario que navega
+    """
+
+    URLS = None
+    PRESUPUESTOS = {}
+    PARAMETROS = {}
+    POST = {}
+    EXCLUIDAS = {}
+    USUARIO = "staff"
+    TAMANOS = (
+        {"cooperativas": 2, "buses": 2},
+        {"cooperativas": 5, "buses": 4, "dias": 3},
+    )
+
+    @contextmanager
+    def assertPresupuestoConsultas(self, maximo, etiqueta=""):
+        with CaptureQueriesContext(connection) as ctx:
+            yield ctx
+
+        if len(ctx) > maximo:
+            self.fail(reporte_consultas(ctx.captured_queries, maximo, etiqueta))
+
+    def test_todas_las_urls_tienen_presupuesto(self):
+        if self.URLS is None:
+            self.skipTest("sin URLS que recorrer")
+        nombres = {p.name for p in self.URLS.urlpatterns}
+        self.assertEqual(nombres, set(self.PRESUPUESTOS) | set(self.EXCLUIDAS))
+
+    def test_presupuesto_no_depende_del_tamano(self):
+        if self.URLS is None:
+            self.skipTest("sin URLS que recorrer")
+        for tamano in self.TAMANOS:
+            datos = sembrar_datos_vistas(**tamano)
+
+            for nombre, (maximo, argumentos) in self.PRESUPUESTOS.items():
+                self.client.force_login(datos[self.USUARIO])
+                url = reverse(nombre, args=argumentos(datos))
+                parametros = self.PARAMETROS.get(nombre, lambda d: {})(datos)
+
+                with self.subTest(vista=nombre, **tamano):
+                    with self.assertPresupuestoConsultas(maximo, etiqueta=nombre):
+                        if nombre in self.POST:
+                            response = self.client.post(url, self.POST[nombre](datos))
+                        else:
+                            response = self.client.get(url, parametros)
+                        if response.streaming:
+                            b"".join(response.streaming_content)
+
+
+# ---------------------------------------------------
+# Cooperativa → ruta → bus → horario para un test
+# ---------------------------------------------------
+
+_serie = itertools.count(1)
+
+
+def crear_cooperativa(**campos):
+    """Cooperativa con nombre y RUC correlativos (no chocan entre tests)."""
+    n = next(_serie)
+    campos.setdefault("nombre", f"Coop Test {n}")
+    campos.setdefault("ruc", f"1790{n:09d}")
+    return Cooperativa.objects.create(**campos)
+
+
+def crear_horario(cooperativa=None, ruta=None, capacidad=40, salida=None, placa=None, bus=None):
+    """
+    Horario que sale en 'salida' (por defecto, dentro de una hora). Sin
+    'bus' crea uno de 'capacidad' asientos; sin cooperativa o ruta, crea
+    unas nuevas (Quito → Tena).
+    """
+    n = next(_serie)
+    if bus is None:
+        bus = Bus.objects.create(
+            cooperativa=cooperativa or crear_cooperativa(),
+            placa=placa or f"TST-{n}",
+            capacidad=capacidad,
+        )
+    return Horario.objects.create(
+        bus=bus,
+        ruta=ruta or Ruta.objects.create(origen="Quito", destino="Tena"),
+        hora_salida=salida or timezone.now() + timezone.timedelta(hours=1),
+    )
+
+
+# ---------------------------------------------------
+# Datos sembrados para recorrer las vistas
+# ---------------------------------------------------
+
+def sembrar_datos_vistas(cooperativas=2, buses=2, dias=2, seed=7):
+    """
+    Red sintética (generar_red_sintetica) más lo que las vistas muestran
+    aparte: pasajeros transferidos (con sus logs) y negociaciones
+    pendientes para la cooperativa del primer operador, en cantidad
+    proporcional a la red.
+
+    Borra antes la red sintética anterior, así se puede llamar varias
+    veces en un mismo test con tamaños distintos.
+    """
+    call_command(
+        "generar_red_sintetica",
+        limpiar=True,
+        cooperativas=cooperativas,
+        buses=buses,
+        dias=dias,
+        rutas=10,
+        rutas_por_cooperativa=2,
+        seed=seed,
+        stdout=io.StringIO(),
+    )
+
+    operador = Operador.objects.select_related("user", "cooperativa").order_by("id").first()
+    coop = operador.cooperativa
+    ahora = timezone.now()
+
+    propios = list(
+        Horario.objects.filter(bus__cooperativa=coop, hora_salida__gt=ahora, asientos_ocupados__gt=0)
+        .order_by("hora_salida")
+    )
+    ajenos = list(
+        Horario.objects.exclude(bus__cooperativa=coop)
+        .filter(hora_salida__gt=ahora, asientos_ocupados__gt=0)
+        .order_by("hora_salida")
+    )
+
+    # Un pasajero transferido por cada horario propio salvo el primero,
+    # con un log por horario (el historial crece con la red)
+    transferidas = [ids[0] for ids in _ids_por_horario(propios[1:]).values()]
+    Reserva.objects.filter(id__in=transferidas).update(transferida=True)
+    TransferLog.objects.bulk_create([
+        TransferLog(
+            origen=horario,
+            destino=horario,
+            reservas=transferidas,
+            cantidad_pasajeros=len(transferidas),
+            estado="OK",
+        )
+        for horario in propios[1:]
+    ])
+    indexar_reservas("transferencias")
+
+    # Negociaciones pendientes hacia la cooperativa del operador
+    por_horario = _ids_por_horario(ajenos)
+    Negociacion.objects.bulk_create([
+        Negociacion(
+            origen=origen,
+            destino=destino,
+            cooperativa_destino=coop,
+            reservas=por_horario[origen.id][:2],
+            cantidad_pasajeros=len(por_horario[origen.id][:2]),
+            costo_por_pasajero=4.0,
+            estado="PENDIENTE",
+        )
+        for origen, destino in zip(ajenos, propios)
+    ])
+    indexar_reservas("negociaciones")
+
+    staff, _ = User.objects.get_or_create(
+        username="staff_vistas", defaults={"is_staff": True}
+    )
+
+    return {
+        "operador": operador,
+        "usuario_operador": operador.user,
+        "staff": staff,
+        "horario": propios[0],
+        "negociacion": Negociacion.objects.filter(destino__bus__cooperativa=coop).order_by("id").first(),
+        # Otra pendiente, para rechazar después de aceptar la primera
+        "otra_negociacion": Negociacion.objects.filter(destino__bus__cooperativa=coop)
+        .order_by("-id").first(),
+        "transferida": Reserva.objects.filter(transferida=True, horario__bus__cooperativa=coop)
+        .order_by("id").first(),
+    }
+
+
+def _ids_por_horario(horarios):
+    ids = {}
+    for horario_id, reserva_id in (
+        Reserva.objects.filter(horario__in=horarios)
+        .order_by("horario_id", "asiento")
+        .values_list("horario_id", "id")
+    ):
+        ids.setdefault(horario_id, []).append(reserva_id)
+    return ids
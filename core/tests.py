@@ -1,22 +1,70 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock, skipIf
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from django.utils import timezone
 
-from administracion.models import Horario
-from reservas.models import Reserva
-from core.services import ejecutar_transferencia, calcular_ocupacion
+from administracion.models import Bus, Ruta, Horario, Operador
+from reservas import fts
+from reservas.models import Reserva, RetencionAsiento
+from core import metricas
+from core.paginacion import CursorInvalido, paginar_keyset
+from core.reintentos import con_reintentos
+from core.services.busqueda_pasajeros_service import buscar_pasajeros
+from core.services.incidente_service import IncidenteService
+from core.services.exportacion_service import EXPORTABLES, exportar
+from core.services.idempotencia_service import ejecutar_una_vez
+from core.services.retencion_service import (
+    RetencionError,
+    barrer_retenciones,
+    confirmar_retencion,
+    retener_asientos,
+)
+from core.services import cache_ocupacion_service
+from reservas.services import asientos_duplicados, sembrar_reservas
+from core.models import IncidenteCooperativa, ReactivacionLog, SolicitudIdempotente, TransferLog
+from core.services import (
+    estadisticas_cache,
+    ModeloOcupacion,
+    build_ocupacion_service,
+    build_planificador_rebalanceo,
+    build_transferencia_facade,
+)
+from core.services_old import (
+    buscar_opciones_transferencia,
+    ejecutar_transferencia,
+    calcular_ocupacion,
+)
+from core.strategies import UmbralPorcentajeStrategy, UmbralRangoStrategy
+from core.strategies import umbral_strategy
+from core.testing import crear_cooperativa, crear_horario
+
 
 class TransferenciaCoreTests(TestCase):
     def setUp(self):
-        # TODO: ajusta estos campos a los que realmente tenga tu modelo Horario
         now = timezone.now()
-        self.horario_origen = Horario.objects.create(
-            fecha_salida=now + timezone.timedelta(hours=1),
-            # aquí debes poner los campos obligatorios de tu modelo Horario:
-            # ejemplo: ruta=..., bus=...
+        cooperativa = crear_cooperativa()
+        ruta = Ruta.objects.create(origen="Quito", destino="Guayaquil")
+
+        self.horario_origen = crear_horario(
+            cooperativa, ruta, salida=now + timezone.timedelta(hours=1)
         )
-        self.horario_destino = Horario.objects.create(
-            fecha_salida=now + timezone.timedelta(hours=2),
-            # mismos campos obligatorios que arriba
+        self.horario_destino = crear_horario(
+            cooperativa, ruta, salida=now + timezone.timedelta(hours=2)
         )
 
         self.reserva = Reserva.objects.create(
@@ -28,8 +76,44 @@ class TransferenciaCoreTests(TestCase):
 
     def test_calcular_ocupacion_basico(self):
         ocup, usados, cap = calcular_ocupacion(self.horario_origen)
-        # Simplemente comprobamos que se ejecuta sin error
-        self.assertGreaterEqual(ocup, 0)
+        self.assertEqual((usados, cap), (1, 40))
+        self.assertAlmostEqual(ocup, 2.5)
+
+    def test_no_transfiere_a_bus_que_ya_salio(self):
+        self.horario_destino.hora_salida = timezone.now() - timezone.timedelta(minutes=5)
+        self.horario_destino.save()
+
+        ok, msg = ejecutar_transferencia([self.reserva], self.horario_destino)
+        self.assertFalse(ok, msg)
+
+    def test_facade_transfiere_y_registra_log(self):
+        facade = build_transferencia_facade()
+        resultado = facade.ejecutar(self.horario_origen, self.horario_destino)
+        self.assertTrue(resultado["ok"], resultado)
+
+        log = TransferLog.objects.get(origen=self.horario_origen)
+        self.assertEqual(log.reservas, [self.reserva.id])
+        self.assertEqual(log.cantidad_pasajeros, 1)
+        self.assertEqual(log.capacidad_destino_despues, 39)
+
+    def test_retenidos_no_cuentan_como_libres(self):
+        retener_asientos(self.horario_destino, cantidad=40)
+        self.assertEqual(Horario.objects.get(id=self.horario_destino.id).asientos_retenidos, 40)
+        self.assertNotIn(
+            self.horario_destino.id, [h.id for h in buscar_opciones_transferencia(self.horario_origen, 1)]
+        )
+
+        resultado = build_transferencia_facade().ejecutar(self.horario_origen, self.horario_destino)
+        self.assertEqual(resultado.get("resultado"), "sin_capacidad", resultado)
+        self.assertEqual(resultado["libres_dest"], 0)
+
+    def test_facade_lee_la_ocupacion_de_la_fila_bloqueada(self):
+        # Caché con el destino vacío; otro proceso lo llena sin que esta caché se entere
+        build_ocupacion_service().calcular(self.horario_destino)
+        Horario.objects.filter(id=self.horario_destino.id).update(asientos_ocupados=40)
+
+        resultado = build_transferencia_facade().ejecutar(self.horario_origen, self.horario_destino)
+        self.assertEqual(resultado.get("resultado"), "sin_capacidad", resultado)
 
     def test_transferencia_valida(self):
         ok, msg = ejecutar_transferencia([self.reserva], self.horario_destino)
@@ -38,3 +122,997 @@ class TransferenciaCoreTests(TestCase):
         self.reserva.refresh_from_db()
         self.assertEqual(self.reserva.horario, self.horario_destino)
         self.assertTrue(self.reserva.transferida)
+
+
+class TransferenciaMasivaTests(TestCase):
+    def setUp(self):
+        self.cooperativa = crear_cooperativa()
+        self.ruta = Ruta.objects.create(origen="Quito", destino="Ambato")
+        self.salida = timezone.now() + timezone.timedelta(hours=3)
+
+    def _horario(self, placa, capacidad, asientos):
+        h = crear_horario(self.cooperativa, self.ruta, capacidad, self.salida, placa=placa)
+        Reserva.objects.bulk_create([
+            Reserva(horario=h, nombre_pasajero=f"P{a}", cedula="0102030405", asiento=a)
+            for a in asientos
+        ])
+        Horario.recalcular_asientos([h.id])
+        h.refresh_from_db()
+        return h
+
+    def _consultas_transferencia(self, cantidad):
+        origen = self._horario(f"ORI-{cantidad}", 50, range(1, cantidad + 1))
+        destino = self._horario(f"DES-{cantidad}", 50, [1, 3, 5])
+
+        with CaptureQueriesContext(connection) as ctx:
+            ok, msg = ejecutar_transferencia(
+                Reserva.objects.filter(horario=origen), destino
+            )
+        self.assertTrue(ok, msg)
+        return origen, destino, len(ctx)
+
+    def test_consultas_constantes(self):
+        _, _, consultas_5 = self._consultas_transferencia(5)
+        _, _, consultas_40 = self._consultas_transferencia(40)
+        self.assertEqual(consultas_5, consultas_40)
+
+    def test_asientos_unicos_y_log(self):
+        origen, destino, _ = self._consultas_transferencia(40)
+
+        asientos = list(Reserva.objects.filter(horario=destino).values_list("asiento", flat=True))
+        self.assertEqual(len(asientos), 43)
+        self.assertEqual(len(set(asientos)), 43)
+        self.assertTrue(all(1 <= a <= 50 for a in asientos))
+        self.assertFalse(Reserva.objects.filter(horario=origen).exists())
+
+        log = TransferLog.objects.get(origen=origen, destino=destino)
+        self.assertEqual(log.cantidad_pasajeros, 40)
+        self.assertEqual(log.capacidad_origen_antes, 10)
+        self.assertEqual(log.capacidad_origen_despues, 50)
+        self.assertEqual(log.capacidad_destino_antes, 47)
+        self.assertEqual(log.capacidad_destino_despues, 7)
+
+    def test_sin_cupo_no_mueve(self):
+        origen = self._horario("ORI-X", 50, range(1, 11))
+        destino = self._horario("DES-X", 12, range(1, 6))
+
+        ok, _ = ejecutar_transferencia(Reserva.objects.filter(horario=origen), destino)
+        self.assertFalse(ok)
+        self.assertEqual(Reserva.objects.filter(horario=origen).count(), 10)
+
+
+class MapaAsientosTests(TestCase):
+    def setUp(self):
+        self.horario = crear_horario(capacidad=10)
+        self.otro = crear_horario(
+            bus=self.horario.bus, ruta=self.horario.ruta,
+            salida=timezone.now() + timezone.timedelta(hours=2),
+        )
+
+    def _reservar(self, horario, asiento):
+        return Reserva.objects.create(
+            horario=horario, nombre_pasajero=f"P{asiento}", cedula="0102030405", asiento=asiento
+        )
+
+    def test_crear_mover_y_borrar_actualizan_mapa(self):
+        r1 = self._reservar(self.horario, 1)
+        self._reservar(self.horario, 3)
+
+        self.horario.refresh_from_db()
+        self.assertEqual(self.horario.asientos_ocupados, 2)
+        self.assertEqual(self.horario.primer_asiento_libre(), 2)
+
+        r1 = Reserva.objects.get(id=r1.id)
+        r1.horario = self.otro
+        r1.asiento = 5
+        r1.save()
+
+        self.horario.refresh_from_db()
+        self.otro.refresh_from_db()
+        self.assertEqual(self.horario.asientos_ocupados, 1)
+        self.assertEqual(self.horario.primer_asiento_libre(), 1)
+        self.assertEqual(self.otro.asientos_libres(5), [1, 2, 3, 4, 6])
+
+        Reserva.objects.filter(horario=self.otro).delete()
+        self.otro.refresh_from_db()
+        self.assertEqual(self.otro.asientos_ocupados, 0)
+        self.assertEqual(self.otro.primer_asiento_libre(), 1)
+
+        self.assertEqual(Horario.recalcular_asientos(guardar=False), [])
+
+    def test_carga_parcial_no_vuelve_a_ocupar(self):
+        r1 = self._reservar(self.horario, 1)
+
+        Reserva.objects.only("id", "nombre_pasajero").get(id=r1.id).save()
+        r = Reserva.objects.get(id=r1.id)
+        r.nombre_pasajero = "Otro"
+        r.save(update_fields=["nombre_pasajero"])
+
+        self.horario.refresh_from_db()
+        self.assertEqual(self.horario.asientos_ocupados, 1)
+
+        # Asiento asignado sin haberlo cargado: se mueve igual
+        r = Reserva.objects.only("id").get(id=r1.id)
+        r.asiento = 4
+        r.save()
+
+        self.horario.refresh_from_db()
+        self.assertEqual(self.horario.asientos_ocupados, 1)
+        self.assertEqual(self.horario.primer_asiento_libre(), 1)
+        self.assertEqual(Horario.recalcular_asientos(guardar=False), [])
+
+    def test_asiento_cero_se_rechaza(self):
+        with self.assertRaises(ValueError):
+            self._reservar(self.horario, 0)
+
+        self.assertFalse(Reserva.objects.filter(horario=self.horario).exists())
+        self.horario.refresh_from_db()
+        self.assertEqual(self.horario.asientos_ocupados, 0)
+        self.assertFalse(self.horario.esta_disponible(0))
+
+    def test_recalcular_detecta_desfase(self):
+        Reserva.objects.bulk_create([
+            Reserva(horario=self.horario, nombre_pasajero="X", cedula="1", asiento=a)
+            for a in range(1, 11)
+        ])
+        distintos = Horario.recalcular_asientos()
+        self.assertEqual([h.id for h in distintos], [self.horario.id])
+
+        self.horario.refresh_from_db()
+        self.assertEqual(self.horario.asientos_ocupados, 10)
+        self.assertIsNone(self.horario.primer_asiento_libre())
+
+
+class BusquedaOpcionesTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        cooperativa = crear_cooperativa()
+        self.ruta = Ruta.objects.create(origen="Quito", destino="Loja")
+        otra_ruta = Ruta.objects.create(origen="Quito", destino="Tena")
+
+        def horario(placa, capacidad, horas, ocupados=0, ruta=None):
+            h = crear_horario(
+                cooperativa, ruta or self.ruta, capacidad, now + timezone.timedelta(hours=horas), placa
+            )
+            for asiento in range(1, ocupados + 1):
+                Reserva.objects.create(
+                    horario=h, nombre_pasajero="P", cedula="0102030405", asiento=asiento
+                )
+            return h
+
+        self.origen = horario("ORI", 40, 5, ocupados=3)
+        self.salido = horario("SAL", 40, -1)
+        self.lejano = horario("LEJ", 40, 24 * 10)
+        self.lleno = horario("LLE", 4, 6, ocupados=3)
+        self.otra_ruta = horario("OTR", 40, 6, ruta=otra_ruta)
+        self.tarde_justo = horario("TJU", 10, 8, ocupados=5)
+        self.tarde_holgado = horario("THO", 40, 8)
+        self.pronto = horario("PRO", 40, 7)
+        self.antes = horario("ANT", 40, 4)
+
+    def test_filtra_ventana_salidos_y_cupo(self):
+        with self.assertNumQueries(1):
+            opciones = buscar_opciones_transferencia(self.origen, 3)
+
+        # Más cerca de la salida del origen (antes o después) primero; a igual distancia, más libres
+        self.assertEqual(
+            [h.bus.placa for h in opciones],
+            ["ANT", "PRO", "THO", "TJU"],
+        )
+        self.assertEqual(opciones[3].libres, 5)
+        self.assertEqual(opciones[3].ocupacion_porcentaje, 50.0)
+
+
+class PlanificadorRebalanceoTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        coop, otra = crear_cooperativa(), crear_cooperativa()
+        ruta = Ruta.objects.create(origen="Quito", destino="Riobamba")
+
+        def horario(cooperativa, horas, ocupados):
+            h = crear_horario(cooperativa, ruta, salida=now + timezone.timedelta(hours=horas))
+            for asiento in range(1, ocupados + 1):
+                Reserva.objects.create(
+                    horario=h, nombre_pasajero="P", cedula="0102030405", asiento=asiento
+                )
+            return h
+
+        self.critico_chico = horario(coop, 2, 3)
+        self.critico_grande = horario(coop, 3, 10)
+        self.lleno = horario(coop, 4, 35)
+        self.otra_coop = horario(otra, 2, 0)
+
+    def test_plan_y_aplicar(self):
+        planificador = build_planificador_rebalanceo(umbral=30)
+        plan = planificador.planificar(ModeloOcupacion.desde_bd())
+
+        # El crítico chico va al casi lleno (best fit); después ya no queda
+        # sitio para el grande en su cooperativa. El de la otra está vacío.
+        self.assertEqual(
+            plan["movimientos"],
+            [{"origen": self.critico_chico.id, "destino": self.lleno.id, "pasajeros": 3}],
+        )
+        self.assertEqual(plan["sin_destino"], [self.critico_grande.id])
+        self.assertEqual(plan["vacios"], 1)
+        self.assertEqual(Reserva.objects.filter(horario=self.lleno).count(), 35)
+
+        resultados = planificador.aplicar(plan)
+        self.assertTrue(all(ok for _, ok, _ in resultados))
+        self.assertEqual(Reserva.objects.filter(horario=self.lleno).count(), 38)
+        self.assertFalse(Reserva.objects.filter(horario=self.critico_chico).exists())
+
+
+class OcupacionPorLotesTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        cooperativa = crear_cooperativa()
+        ruta = Ruta.objects.create(origen="Quito", destino="Cuenca")
+
+        self.horarios = []
+        for i, (capacidad, pasajeros) in enumerate([(40, 20), (40, 4), (30, 0), (0, 0)]):
+            h = crear_horario(cooperativa, ruta, capacidad, now + timezone.timedelta(hours=i + 1))
+            for asiento in range(1, pasajeros + 1):
+                Reserva.objects.create(
+                    horario=h, nombre_pasajero=f"P{asiento}", cedula="0102030405", asiento=asiento
+                )
+            self.horarios.append(h)
+
+    def test_calcular_muchos_coincide_con_calcular(self):
+        service = build_ocupacion_service()
+        resultado = service.calcular_muchos(
+            Horario.objects.order_by("id"),
+            umbral_strategy=UmbralPorcentajeStrategy(umbral_minimo=30),
+        )
+
+        self.assertEqual(len(resultado), len(self.horarios))
+        for h in resultado:
+            ocupacion, usados, capacidad = service.calcular(h)
+            self.assertEqual(h.ocupacion_porcentaje, ocupacion)
+            self.assertEqual(h.usados, usados)
+            self.assertEqual(h.capacidad, capacidad)
+            self.assertEqual(h.libres, capacidad - usados)
+
+        estados = [h.estado for h in resultado]
+        self.assertEqual(estados, ["OK", "CRÍTICO", "CRÍTICO", "CRÍTICO"])
+
+    def test_calcular_muchos_una_sola_consulta(self):
+        service = build_ocupacion_service()
+        with self.assertNumQueries(1):
+            resultado = service.calcular_muchos(Horario.objects.all())
+            for h in resultado:
+                str(h)  # ruta + bus ya vienen en el JOIN
+
+
+class UmbralPorLotesTests(SimpleTestCase):
+    VALORES = [0, 0.0, 19.99, 20, 29.99, 30, 30.0, 30.01, 60, 60.01, 100, -1, float("nan"), float("inf")]
+    STRATEGIES = [UmbralPorcentajeStrategy(30), UmbralRangoStrategy(20, 60)]
+
+    def _comparar(self):
+        for strategy in self.STRATEGIES:
+            lote = strategy.cumple_muchos(self.VALORES)
+            self.assertEqual(
+                [bool(x) for x in lote],
+                [strategy.cumple(x) for x in self.VALORES],
+            )
+
+    def test_python_puro_igual_a_escalar(self):
+        with mock.patch.object(umbral_strategy, "np", None):
+            self._comparar()
+
+    @skipIf(umbral_strategy.np is None, "NumPy no está instalado")
+    def test_numpy_igual_a_escalar(self):
+        self._comparar()
+
+
+class PerfilamientoMiddlewareTests(TestCase):
+    def setUp(self):
+        cooperativa = crear_cooperativa()
+        ruta = Ruta.objects.create(origen="Quito", destino="Tena")
+        for i in range(3):
+            crear_horario(cooperativa, ruta, salida=timezone.now() + timezone.timedelta(hours=i + 1))
+        user = User.objects.create_user("op_perfil", password="x")
+        Operador.objects.create(user=user, cooperativa=cooperativa)
+        self.client.force_login(user)
+
+    def _config(self, **extra):
+        return dict({"ACTIVO": True, "MUESTREO": 1.0, "LOG": None, "TOP": 3}, **extra)
+
+    def test_server_timing_y_registro(self):
+        with override_settings(PERFILAMIENTO=self._config()):
+            with self.assertLogs("smartbus.perfilamiento", level="INFO") as logs:
+                response = self.client.get(reverse("panel_operador"))
+
+        timing = response["Server-Timing"]
+        for metrica in ("total;dur=", "vista;dur=", "plantillas;dur=", "sql;dur="):
+            self.assertIn(metrica, timing)
+
+        registro = json.loads(logs.records[0].getMessage())
+        self.assertEqual(registro["vista"], "panel_operador")
+        self.assertGreater(registro["consultas"], 0)
+        self.assertGreater(registro["plantillas_ms"], 0)
+        self.assertLessEqual(len(registro["mas_lentas"]), 3)
+        # "total" abarca la pila entera; "vista", solo lo de adentro
+        self.assertGreater(registro["vista_ms"], 0)
+        self.assertGreaterEqual(registro["total_ms"], registro["vista_ms"] + registro["plantillas_ms"])
+
+    def test_muestreo_cero_no_perfila(self):
+        with override_settings(PERFILAMIENTO=self._config(MUESTREO=0.0)):
+            response = self.client.get(reverse("panel_operador"))
+        self.assertNotIn("Server-Timing", response)
+
+    def test_desactivado_por_defecto(self):
+        response = self.client.get(reverse("panel_operador"))
+        self.assertNotIn("Server-Timing", response)
+
+    def test_log_rotativo_en_archivo(self):
+        logger = logging.getLogger("smartbus.perfilamiento")
+        self.addCleanup(setattr, logger, "handlers", list(logger.handlers))
+        logger.handlers = []
+
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = Path(tmp) / "logs" / "perfilamiento.log"
+            with override_settings(PERFILAMIENTO=self._config(LOG=ruta)):
+                self.client.get(reverse("panel_operador"))
+            for handler in logger.handlers:
+                handler.close()
+
+            lineas = ruta.read_text(encoding="utf-8").splitlines()
+            self.assertEqual(json.loads(lineas[-1])["status"], 200)
+
+
+class MetricasTests(TestCase):
+    def setUp(self):
+        metricas.REGISTRO.reiniciar()
+        self.addCleanup(metricas.REGISTRO.reiniciar)
+
+        cooperativa = crear_cooperativa()
+        ruta = Ruta.objects.create(origen="Quito", destino="Ibarra")
+        salida = timezone.now() + timezone.timedelta(hours=2)
+
+        self.origen = crear_horario(cooperativa, ruta, 40, salida)
+        self.destino_chico = crear_horario(cooperativa, ruta, 2, salida)
+        self.reservas = [
+            Reserva.objects.create(horario=self.origen, nombre_pasajero=f"P{i}", cedula="1", asiento=i)
+            for i in range(1, 4)
+        ]
+
+    def _valor(self, muestra, **etiquetas):
+        return metricas.REGISTRO.valores().get(metricas._clave(muestra, etiquetas), 0)
+
+    def test_cuenta_resultados_y_pasajeros(self):
+        ok, _ = ejecutar_transferencia(self.reservas, self.destino_chico)
+        self.assertFalse(ok)
+        ok, _ = ejecutar_transferencia(self.reservas[:2], self.destino_chico)
+        self.assertTrue(ok)
+
+        via = "ejecutar_transferencia"
+        self.assertEqual(self._valor("smartbus_transferencias_total", via=via, resultado="sin_capacidad"), 1)
+        self.assertEqual(self._valor("smartbus_transferencias_total", via=via, resultado="ok"), 1)
+        self.assertEqual(self._valor("smartbus_transferencia_pasajeros_sum", via=via), 2)
+        self.assertEqual(self._valor("smartbus_transferencia_segundos_count", via=via), 2)
+        self.assertEqual(self._valor("smartbus_espera_bloqueo_segundos_count", via=via), 2)
+
+    def test_endpoint_formato_prometheus(self):
+        ejecutar_transferencia(self.reservas[:1], self.destino_chico)
+
+        response = self.client.get(reverse("metricas"))
+        texto = response.content.decode()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("# TYPE smartbus_transferencia_segundos histogram", texto)
+        self.assertIn(
+            'smartbus_transferencias_total{resultado="ok",via="ejecutar_transferencia"} 1', texto
+        )
+        self.assertIn(
+            'smartbus_transferencia_pasajeros_bucket{le="+Inf",via="ejecutar_transferencia"} 1', texto
+        )
+
+    @override_settings(METRICAS={"DIRECTORIO": None, "TOKEN": "secreto"})
+    def test_endpoint_con_token(self):
+        self.assertEqual(self.client.get(reverse("metricas")).status_code, 403)
+        response = self.client.get(reverse("metricas"), HTTP_AUTHORIZATION="Bearer secreto")
+        self.assertEqual(response.status_code, 200)
+
+    @skipIf(not hasattr(os, "fork"), "requiere fork (workers tipo gunicorn)")
+    def test_suma_entre_procesos(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(METRICAS={"DIRECTORIO": tmp}):
+            metricas.REGISTRO.reiniciar()
+            metricas.TRANSFERENCIAS.inc(via="facade", resultado="ok")
+
+            pid = os.fork()
+            if pid == 0:  # "otro worker": abre su propio archivo
+                metricas.TRANSFERENCIAS.inc(2, via="facade", resultado="ok")
+                os._exit(0)
+            os.waitpid(pid, 0)
+
+            self.assertEqual(len(list(Path(tmp).glob("*.db"))), 2)
+            self.assertEqual(self._valor("smartbus_transferencias_total", via="facade", resultado="ok"), 3)
+            metricas.REGISTRO.reiniciar()
+
+
+class CacheOcupacionTests(TestCase):
+    def setUp(self):
+        cache_ocupacion_service._cache().clear()
+        cache_ocupacion_service.reiniciar_estadisticas()
+
+        cooperativa = crear_cooperativa()
+        ruta = Ruta.objects.create(origen="Quito", destino="Riobamba")
+        salida = timezone.now() + timezone.timedelta(hours=3)
+        self.origen = crear_horario(cooperativa, ruta, 10, salida)
+        self.destino = crear_horario(cooperativa, ruta, 20, salida)
+        self.reservas = [
+            Reserva.objects.create(horario=self.origen, nombre_pasajero=f"P{i}", cedula="1", asiento=i)
+            for i in range(1, 3)
+        ]
+        self.servicio = build_ocupacion_service()
+
+    def test_segunda_lectura_sin_consultas(self):
+        self.assertEqual(self.servicio.calcular(self.origen), (20.0, 2, 10))
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.servicio.calcular(self.origen), (20.0, 2, 10))
+        self.assertEqual(len(ctx), 0)
+        self.assertEqual(estadisticas_cache(), {"hits": 1, "misses": 1, "ratio": 0.5})
+
+    def test_transferencia_invalida_origen_y_destino(self):
+        self.servicio.calcular(self.origen)
+        self.servicio.calcular(self.destino)
+
+        ok, msg = ejecutar_transferencia(self.reservas, self.destino)
+        self.assertTrue(ok, msg)
+
+        self.assertEqual(self.servicio.calcular(self.origen), (0.0, 0, 10))
+        self.assertEqual(self.servicio.calcular(self.destino), (10.0, 2, 20))
+
+    def test_carga_masiva_y_borrado_invalidan(self):
+        self.servicio.calcular(self.destino)
+        sembrar_reservas(Horario.objects.filter(id=self.destino.id), 5)
+        self.assertEqual(self.servicio.calcular(self.destino)[1], 5)
+
+        Reserva.objects.filter(horario=self.destino).first().delete()
+        self.assertEqual(self.servicio.calcular(self.destino)[1], 4)
+
+    def test_capacidad_del_bus_invalida(self):
+        self.servicio.calcular(self.origen)
+        bus = self.origen.bus
+        bus.capacidad = 4
+        bus.save()
+        self.assertEqual(self.servicio.calcular(self.origen), (50.0, 2, 4))
+
+    def test_con_cache_en_archivos(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": tmp,
+            }
+        }):
+            self.assertEqual(self.servicio.calcular(self.origen)[1], 2)
+            self.reservas[0].delete()
+            self.assertEqual(self.servicio.calcular(self.origen)[1], 1)
+            self.assertEqual(self.servicio.calcular(self.origen)[1], 1)
+            self.assertEqual(estadisticas_cache()["hits"], 1)
+
+
+class PaginacionKeysetTests(TestCase):
+    def setUp(self):
+        ruta = Ruta.objects.create(origen="Quito", destino="Macas")
+        bus = Bus.objects.create(cooperativa=crear_cooperativa(), placa="PAG-1", capacidad=40)
+        base = timezone.now() + timezone.timedelta(days=1)
+        # Salidas repetidas: el desempate por id tiene que mantener el orden estable
+        Horario.objects.bulk_create([
+            Horario(bus=bus, ruta=ruta, hora_salida=base + timezone.timedelta(hours=i // 3))
+            for i in range(23)
+        ])
+        self.orden = list(Horario.objects.order_by("hora_salida", "id").values_list("id", flat=True))
+
+    def _recorrer(self, tamano):
+        vistos, cursor = [], None
+        while True:
+            pagina = paginar_keyset(Horario.objects.all(), ("hora_salida", "id"), cursor, tamano)
+            vistos.extend(h.id for h in pagina)
+            if not pagina.tiene_siguiente:
+                return vistos, pagina
+            cursor = pagina.siguiente
+
+    def test_recorre_todo_sin_repetir(self):
+        vistos, ultima = self._recorrer(5)
+        self.assertEqual(vistos, self.orden)
+
+        # Y de vuelta desde la última página
+        previa = paginar_keyset(Horario.objects.all(), ("hora_salida", "id"), ultima.anterior, 5)
+        self.assertEqual([h.id for h in previa], self.orden[15:20])
+        self.assertTrue(previa.tiene_siguiente)
+
+    def test_descendente(self):
+        pagina = paginar_keyset(Horario.objects.all(), ("-hora_salida", "-id"), None, 4)
+        pagina = paginar_keyset(Horario.objects.all(), ("-hora_salida", "-id"), pagina.siguiente, 4)
+        self.assertEqual([h.id for h in pagina], self.orden[::-1][4:8])
+
+    def test_pagina_n_no_usa_offset(self):
+        _, ultima = self._recorrer(5)
+        with CaptureQueriesContext(connection) as ctx:
+            paginar_keyset(Horario.objects.all(), ("hora_salida", "id"), ultima.anterior, 5)
+        self.assertEqual(len(ctx), 1)
+        self.assertNotIn("OFFSET", ctx.captured_queries[0]["sql"])
+
+    def test_cursor_invalido(self):
+        with self.assertRaises(CursorInvalido):
+            paginar_keyset(Horario.objects.all(), ("hora_salida", "id"), "no-es-un-cursor", 5)
+
+
+class ExportacionTests(TestCase):
+    def setUp(self):
+        self.coop, otra = crear_cooperativa(), crear_cooperativa()
+        ruta = Ruta.objects.create(origen="Quito", destino="Puyo")
+        self.manana = timezone.now() + timezone.timedelta(days=1)
+
+        for i, coop in enumerate((self.coop, self.coop, otra)):
+            crear_horario(coop, ruta, salida=self.manana + timezone.timedelta(days=i * 10))
+        sembrar_reservas(Horario.objects.all(), 30)
+
+    def _csv(self, **kwargs):
+        texto = b"".join(exportar("reservas", "csv", **kwargs)).decode("utf-8")
+        return list(csv.reader(io.StringIO(texto)))
+
+    def test_csv_por_cooperativa_y_rango(self):
+        filas = self._csv(cooperativa_id=self.coop.id)
+        self.assertEqual(filas[0][:3], ["id", "horario_id", "horario_hora_salida"])
+        self.assertEqual(len(filas) - 1, 60)
+
+        filas = self._csv(
+            cooperativa_id=self.coop.id, hasta=self.manana + timezone.timedelta(days=5)
+        )
+        self.assertEqual(len(filas) - 1, 30)
+
+    def test_ndjson_gzip_en_bloques(self):
+        with CaptureQueriesContext(connection) as ctx:
+            bloques = list(exportar("reservas", "ndjson", comprimir=True, chunk_size=25, bloque=1024))
+
+        self.assertGreater(len(bloques), 1)
+        self.assertEqual(len(ctx), 1)  # un solo SELECT, leído por tramos
+
+        lineas = gzip.decompress(b"".join(bloques)).decode("utf-8").splitlines()
+        self.assertEqual(len(lineas), 90)
+        self.assertEqual(
+            list(json.loads(lineas[0])),
+            [c.replace("__", "_") for c in EXPORTABLES["reservas"].columnas],
+        )
+
+    def test_comando_y_endpoint(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = Path(tmp) / "reservas.csv"
+            err = io.StringIO()
+            call_command("exportar", "reservas", salida=str(ruta), cooperativa=self.coop.id, stderr=err)
+            self.assertEqual(len(ruta.read_text(encoding="utf-8").splitlines()), 61)
+            self.assertIn("filas/s", err.getvalue())
+
+        staff = User.objects.create_user("finanzas", password="x", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(
+            reverse("exportar_datos", args=["transferencias"]), {"formato": "ndjson", "gzip": "1"}
+        )
+        self.assertTrue(response.streaming)
+        self.assertIn("transferencias.ndjson.gz", response["Content-Disposition"])
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), b"")
+
+        self.assertEqual(
+            self.client.get(reverse("exportar_datos", args=["reservas"]), {"desde": "ayer"}).status_code,
+            400,
+        )
+
+
+class IndiceReservasTests(TestCase):
+    def setUp(self):
+        self.coop, self.ajena = crear_cooperativa(), crear_cooperativa()
+        ruta = Ruta.objects.create(origen="Quito", destino="Tena")
+        manana = timezone.now() + timezone.timedelta(days=1)
+
+        self.origen, self.destino, self.otro = [
+            crear_horario(coop, ruta, salida=manana + timezone.timedelta(hours=i))
+            for i, coop in enumerate((self.coop, self.coop, self.ajena))
+        ]
+        sembrar_reservas(Horario.objects.filter(id=self.origen.id), 3)
+        self.reservas = list(Reserva.objects.filter(horario=self.origen).order_by("id"))
+
+        user = User.objects.create_user("op_indice", password="x")
+        Operador.objects.create(user=user, cooperativa=self.coop)
+        self.client.force_login(user)
+
+    def test_transferencia_enlaza_y_historial(self):
+        ok, msg = ejecutar_transferencia(self.reservas[:2], self.destino)
+        self.assertTrue(ok, msg)
+
+        log = TransferLog.objects.get(destino=self.destino)
+        self.assertEqual(
+            sorted(log.enlaces.values_list("reserva_id", flat=True)),
+            [r.id for r in self.reservas[:2]],
+        )
+        self.assertFalse(TransferLog.objects.filter(enlaces__reserva=self.reservas[2]).exists())
+
+        response = self.client.get(reverse("historial_pasajero", args=[self.reservas[0].id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["logs"], [log])
+
+        # Reserva de otra cooperativa que nunca pasó por la nuestra
+        ajena = Reserva.objects.create(horario=self.otro, nombre_pasajero="X", cedula="1", asiento=1)
+        response = self.client.get(reverse("historial_pasajero", args=[ajena.id]))
+        self.assertEqual(response.status_code, 404)
+
+        # Usuario sin operador: al login, no un 500
+        self.client.force_login(User.objects.create_user("sin_operador", password="x"))
+        response = self.client.get(reverse("historial_pasajero", args=[self.reservas[0].id]))
+        self.assertRedirects(response, reverse("login"), fetch_redirect_response=False)
+
+    def test_backfill_idempotente(self):
+        # Filas anteriores al índice: solo la lista JSON
+        TransferLog.objects.create(
+            origen=self.origen, destino=self.destino, reservas=[r.id for r in self.reservas],
+            cantidad_pasajeros=3, estado="OK",
+        )
+        with self.assertRaises(CommandError):
+            call_command("indexar_reservas", verificar=True, stdout=io.StringIO())
+
+        out = io.StringIO()
+        call_command("indexar_reservas", stdout=out)
+        self.assertIn("transferencias: 1 filas recorridas, 3 enlaces nuevos", out.getvalue())
+
+        out = io.StringIO()
+        call_command("indexar_reservas", stdout=out)
+        self.assertIn("0 enlaces nuevos", out.getvalue())
+        call_command("indexar_reservas", verificar=True, stdout=io.StringIO())
+
+    def test_busqueda_admin_por_reserva(self):
+        ejecutar_transferencia(self.reservas[:1], self.destino)
+        TransferLog.objects.create(
+            origen=self.origen, destino=self.destino, reservas=[], cantidad_pasajeros=0, estado="ERROR",
+        )
+
+        admin = User.objects.create_superuser("admin_indice", password="x")
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse("admin:core_transferlog_changelist"), {"q": str(self.reservas[0].id)}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["cl"].result_count, 1)
+
+        response = self.client.get(reverse("admin:core_transferlog_changelist"), {"q": "abc"})
+        self.assertEqual(response.context["cl"].result_count, 0)
+
+
+class BusquedaPasajerosTests(TestCase):
+    def setUp(self):
+        coop = crear_cooperativa()
+        ruta = Ruta.objects.create(origen="Quito", destino="Loja")
+        manana = timezone.now() + timezone.timedelta(days=1)
+        self.h1, self.h2, self.h3 = [
+            crear_horario(coop, ruta, salida=manana + timezone.timedelta(hours=i))
+            for i in range(3)
+        ]
+        self.jose = Reserva.objects.create(
+            horario=self.h1, nombre_pasajero="José Pérez", cedula="1712345678", asiento=1
+        )
+        Reserva.objects.create(horario=self.h1, nombre_pasajero="Josefina Ruiz", cedula="0911111111", asiento=2)
+        Reserva.objects.create(horario=self.h1, nombre_pasajero="Juan Páez", cedula="0922222222", asiento=3)
+
+    def _nombres(self, texto):
+        return sorted(h.reserva.nombre_pasajero for h in buscar_pasajeros(texto))
+
+    def test_cedula_con_cadena_de_transferencias(self):
+        ejecutar_transferencia([self.jose], self.h2)
+        self.jose.refresh_from_db()
+        self.jose.transferida = False
+        self.jose.save()
+        ejecutar_transferencia([self.jose], self.h3)
+
+        with CaptureQueriesContext(connection) as ctx:
+            (historial,) = buscar_pasajeros("1712345678")
+        self.assertEqual(len(ctx), 2)  # reservas + cadenas, sin importar el largo
+
+        self.assertEqual((historial.horario, historial.asiento), (self.h3, 1))
+        self.assertEqual(historial.veces, 2)
+        self.assertEqual([log.destino for log in historial.transferencias], [self.h2, self.h3])
+
+    @skipIf(connection.vendor != "sqlite", "índice FTS5 solo en SQLite")
+    def test_prefijo_de_nombre_por_fts(self):
+        self.assertTrue(fts.disponible(connection))
+        self.assertEqual(self._nombres("jose"), ["Josefina Ruiz", "José Pérez"])
+        self.assertEqual(self._nombres("jose pe"), ["José Pérez"])
+        self.assertEqual(self._nombres("j"), [])  # prefijo demasiado corto
+
+        # Los triggers siguen los cambios de nombre y los borrados
+        self.jose.nombre_pasajero = "Pedro Pérez"
+        self.jose.save()
+        self.assertEqual(self._nombres("jose"), ["Josefina Ruiz"])
+        Reserva.objects.filter(nombre_pasajero="Josefina Ruiz").delete()
+        self.assertEqual(self._nombres("jose"), [])
+
+        # Si se pierden los triggers (tabla reconstruida), instalar() reindexa
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TRIGGER {fts.TABLA}_ai")
+        Reserva.objects.create(horario=self.h2, nombre_pasajero="Josué Vega", cedula="1", asiento=1)
+        self.assertEqual(self._nombres("josue"), [])
+        self.assertTrue(fts.instalar(connection))
+        self.assertEqual(self._nombres("josue"), ["Josué Vega"])
+
+
+class IncidenteServiceTests(TestCase):
+    def setUp(self):
+        self.horario = crear_horario(salida=timezone.now() + timezone.timedelta(hours=3))
+        self.bus = self.horario.bus
+        self.ruta = self.horario.ruta
+        self.coop = self.bus.cooperativa
+        # Ruido: muchos incidentes viejos/inactivos de la misma cooperativa
+        IncidenteCooperativa.objects.bulk_create([
+            IncidenteCooperativa(cooperativa=self.coop, bus=self.bus, descripcion="viejo", activo=False)
+            for _ in range(200)
+        ])
+
+    def _buscar(self):
+        return IncidenteService().incidente_para(self.bus.id, self.ruta.id, self.coop.id)
+
+    def test_mas_especifico_y_vigente(self):
+        self.assertIsNone(self._buscar())
+
+        coop = IncidenteCooperativa.objects.create(cooperativa=self.coop, descripcion="paro")
+        self.assertEqual(self._buscar(), coop)
+        self.assertAlmostEqual(
+            coop.expira, coop.fecha + IncidenteCooperativa.VIGENCIA, delta=timezone.timedelta(seconds=1)
+        )
+
+        ruta = IncidenteCooperativa.objects.create(ruta=self.ruta, descripcion="derrumbe")
+        self.assertEqual(self._buscar(), ruta)
+        self.assertEqual(ruta.tipo, "ruta")
+
+        # Un incidente de bus ya vencido no cuenta
+        bus = IncidenteCooperativa.objects.create(
+            bus=self.bus, descripcion="llanta", expira=timezone.now() - timezone.timedelta(minutes=1)
+        )
+        self.assertFalse(bus.esta_activo)
+        self.assertEqual(self._buscar(), ruta)
+
+    def test_una_consulta_y_cache_por_request(self):
+        IncidenteCooperativa.objects.create(bus=self.bus, descripcion="motor")
+        servicio = IncidenteService()
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(5):
+                self.assertEqual(servicio.incidente_para(self.bus.id, self.ruta.id, self.coop.id).tipo, "bus")
+        self.assertEqual(len(ctx), 1)
+
+    def test_reactivar_muestra_incidente(self):
+        IncidenteCooperativa.objects.create(ruta=self.ruta, descripcion="derrumbe")
+        reserva = Reserva.objects.create(
+            horario=self.horario, nombre_pasajero="Ana", cedula="1", asiento=1, transferida=True
+        )
+        user = User.objects.create_superuser("jefe_incidentes", password="x")
+        Operador.objects.create(user=user, cooperativa=self.coop)
+        self.client.force_login(user)
+
+        response = self.client.get(reverse("reactivar_pasajero", args=[reserva.id]), follow=True)
+        self.assertContains(response, "incidente de ruta: derrumbe")
+        reserva.refresh_from_db()
+        self.assertFalse(reserva.transferida)
+
+
+class ReactivacionMasivaTests(TestCase):
+    def setUp(self):
+        self.coop, ajena = crear_cooperativa(), crear_cooperativa()
+        self.ruta = Ruta.objects.create(origen="Quito", destino="Ibarra")
+        manana = timezone.now() + timezone.timedelta(days=1)
+        self.h1, self.h2 = [
+            crear_horario(self.coop, self.ruta, salida=manana + timezone.timedelta(hours=i))
+            for i in range(2)
+        ]
+        # Otra cooperativa, otra ruta
+        self.h_ajeno = crear_horario(ajena, salida=manana + timezone.timedelta(hours=2))
+        sembrar_reservas(Horario.objects.all(), 10)
+        Reserva.objects.update(transferida=True)
+
+        self.user = User.objects.create_superuser("jefe_reactiva", password="x")
+        Operador.objects.create(user=self.user, cooperativa=self.coop)
+        self.client.force_login(self.user)
+
+    def _post(self, **datos):
+        return self.client.post(reverse("reactivar_masivo"), datos)
+
+    def _transferidas(self, horario):
+        return Reserva.objects.filter(horario=horario, transferida=True).count()
+
+    def test_por_horario_un_update_y_auditoria(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self._post(horario=self.h1.id)
+        self.assertEqual(sum(q["sql"].startswith("UPDATE") for q in ctx.captured_queries), 1)
+
+        self.assertEqual((self._transferidas(self.h1), self._transferidas(self.h2)), (0, 10))
+        log = ReactivacionLog.objects.get()
+        self.assertEqual((log.criterio, log.cantidad, log.horarios), ("HORARIO", 10, [self.h1.id]))
+
+    def test_sin_operador_redirige_sin_tocar_nada(self):
+        self.client.force_login(User.objects.create_superuser("jefe_suelto", password="x"))
+        self.assertRedirects(self._post(todos=1), reverse("login"), fetch_redirect_response=False)
+        self.assertEqual(Reserva.objects.filter(transferida=False).count(), 0)
+
+    def test_por_incidente_y_todos_no_tocan_otra_cooperativa(self):
+        incidente = IncidenteCooperativa.objects.create(ruta=self.ruta, descripcion="deslave")
+        self._post(incidente=incidente.id)
+        self.assertEqual((self._transferidas(self.h1), self._transferidas(self.h2)), (0, 0))
+        self.assertEqual(ReactivacionLog.objects.get().incidente, incidente)
+
+        self._post(todos=1)
+        self.assertEqual(self._transferidas(self.h_ajeno), 10)
+        self.assertEqual(ReactivacionLog.objects.count(), 1)  # no quedaba nada: sin entrada
+
+        vencido = IncidenteCooperativa.objects.create(
+            cooperativa=self.coop, descripcion="viejo", expira=timezone.now() - timezone.timedelta(hours=1)
+        )
+        response = self._post(incidente=vencido.id)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ReactivacionLog.objects.count(), 1)
+
+    def test_seleccion_y_permiso(self):
+        ids = list(Reserva.objects.filter(horario=self.h2).values_list("id", flat=True)[:3])
+        ajena = Reserva.objects.filter(horario=self.h_ajeno).first()
+        self._post(reservas=ids + [ajena.id])
+        self.assertEqual(self._transferidas(self.h2), 7)
+        self.assertEqual(ReactivacionLog.objects.get().reservas, sorted(ids))
+
+        sin_permiso = User.objects.create_user("op_sin_permiso", password="x")
+        Operador.objects.create(user=sin_permiso, cooperativa=self.coop)
+        self.client.force_login(sin_permiso)
+        self._post(todos=1)
+        self.assertEqual(self._transferidas(self.h2), 7)
+
+
+class RetencionAsientosTests(TestCase):
+    def setUp(self):
+        self.horario = crear_horario(capacidad=4, salida=timezone.now() + timezone.timedelta(days=1))
+        Reserva.objects.create(horario=self.horario, nombre_pasajero="Uno", cedula="0100000001", asiento=1)
+
+    def test_asignacion_salta_retenidos(self):
+        retenciones = retener_asientos(self.horario, cantidad=2)
+        self.assertEqual([r.asiento for r in retenciones], [2, 3])
+
+        horario = Horario.objects.select_related("bus").get(id=self.horario.id)
+        self.assertEqual(horario.asientos_retenidos, 2)
+        self.assertEqual(horario.primer_asiento_libre(), 4)
+
+        with self.assertRaises(RetencionError):
+            retener_asientos(horario, cantidad=2)
+        with self.assertRaises(RetencionError):
+            retener_asientos(horario, asientos=[3])
+
+    def test_confirmar_y_vencer(self):
+        confirmada, vencida = retener_asientos(self.horario, cantidad=2)
+        reserva = confirmar_retencion(confirmada, "Dos", "0100000002")
+        self.assertEqual(reserva.asiento, 2)
+
+        RetencionAsiento.objects.filter(id=vencida.id).update(
+            expira=timezone.now() - timezone.timedelta(seconds=1)
+        )
+        with self.assertRaises(RetencionError):
+            confirmar_retencion(vencida, "Tres", "0100000003")
+
+        self.assertEqual(barrer_retenciones(lote=1), 1)
+        self.assertFalse(RetencionAsiento.objects.exists())
+
+        horario = Horario.objects.select_related("bus").get(id=self.horario.id)
+        self.assertEqual(horario.asientos_retenidos, 0)
+        self.assertEqual(horario.asientos_libres(), [3, 4])
+        self.assertEqual(Horario.recalcular_asientos(guardar=False), [])
+
+
+class ReintentosBloqueoTests(TransactionTestCase):
+    # Sin la transacción que TestCase abre alrededor de cada test
+    def _falla(self, veces, mensaje="database is locked"):
+        llamadas = []
+
+        def funcion(intento):
+            llamadas.append(intento)
+            if intento <= veces:
+                raise OperationalError(mensaje)
+            return "ok"
+        return funcion, llamadas
+
+    def test_reintenta_bloqueos_y_los_cuenta(self):
+        antes = metricas.REINTENTOS_BLOQUEO.valor(via="prueba")
+        funcion, llamadas = self._falla(2)
+        self.assertEqual(con_reintentos(funcion, via="prueba", espera=0), "ok")
+        self.assertEqual(llamadas, [1, 2, 3])
+        self.assertEqual(metricas.REINTENTOS_BLOQUEO.valor(via="prueba") - antes, 2)
+
+        funcion, _ = self._falla(5)
+        with self.assertRaises(OperationalError):
+            con_reintentos(funcion, via="prueba", intentos=3, espera=0)
+
+    def test_no_reintenta_otros_errores_ni_dentro_de_una_transaccion(self):
+        funcion, llamadas = self._falla(1, "no such table: x")
+        with self.assertRaises(OperationalError):
+            con_reintentos(funcion, via="prueba", espera=0)
+        self.assertEqual(llamadas, [1])
+
+        funcion, llamadas = self._falla(1)
+        with transaction.atomic(), self.assertRaises(OperationalError):
+            con_reintentos(funcion, via="prueba", espera=0)
+        self.assertEqual(llamadas, [1])
+
+    @override_settings(REINTENTOS_BLOQUEO={"ESPERA": 0})
+    def test_envio_idempotente_reintenta_una_sola_transaccion(self):
+        usuario = User.objects.create_user("reintentos", password="x")
+        reintentos = metricas.REINTENTOS_BLOQUEO.valor
+        errores = metricas.TRANSFERENCIAS.valor
+        antes = (
+            reintentos(via="prueba"), reintentos(via="ejecutar_transferencia"),
+            errores(via="ejecutar_transferencia", resultado="error"),
+        )
+
+        with mock.patch(
+            "core.services_old._transferir",
+            side_effect=[OperationalError("database is locked"), (True, "Listo.", "ok")],
+        ):
+            resultado = ejecutar_una_vez(
+                usuario, "prueba:1", "clave-1",
+                lambda: ejecutar_transferencia([], None, reintentar=False),
+            )
+
+        self.assertEqual(resultado, (True, "Listo."))
+        # Se reintentó la transacción de afuera, una vez; el choque no cuenta como error
+        self.assertEqual(
+            (
+                reintentos(via="prueba"), reintentos(via="ejecutar_transferencia"),
+                errores(via="ejecutar_transferencia", resultado="error"),
+            ),
+            (antes[0] + 1, antes[1], antes[2]),
+        )
+        self.assertEqual(SolicitudIdempotente.objects.get().mensaje, "Listo.")
+
+
+class TransferenciasCruzadasTests(TransactionTestCase):
+    """A→B y B→A desde varios hilos: sin deadlocks ni sobreventa."""
+
+    HILOS_POR_SENTIDO = 4
+
+    def setUp(self):
+        coop = crear_cooperativa()
+        ruta = Ruta.objects.create(origen="Quito", destino="Riobamba")
+        salida = timezone.now() + timezone.timedelta(hours=5)
+        self.a, self.b = [crear_horario(coop, ruta, 20, salida) for _ in range(2)]
+        # 16 + 16 en buses de 20: no caben todas las transferencias de un lado
+        sembrar_reservas(Horario.objects.all(), 16)
+
+    @override_settings(REINTENTOS_BLOQUEO={"INTENTOS": 200, "ESPERA": 0.001})
+    def test_sin_deadlock_ni_sobreventa(self):
+        resultados = []
+        errores = []
+
+        def transferir(ids, destino):
+            try:
+                for reserva_id in ids:
+                    ok, _ = ejecutar_transferencia(Reserva.objects.filter(id=reserva_id), destino)
+                    resultados.append(ok)
+            except Exception as e:  # noqa: BLE001 - se reporta en el hilo principal
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        hilos = []
+        for origen, destino in ((self.a, self.b), (self.b, self.a)):
+            ids = list(Reserva.objects.filter(horario=origen).values_list("id", flat=True))
+            n = self.HILOS_POR_SENTIDO
+            hilos += [
+                threading.Thread(target=transferir, args=(ids[i::n], destino)) for i in range(n)
+            ]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join(timeout=60)
+
+        self.assertFalse([h for h in hilos if h.is_alive()], "hilos trabados (¿deadlock?)")
+        self.assertEqual(errores, [])
+        self.assertEqual(len(resultados), 32)
+
+        for horario in Horario.objects.select_related("bus"):
+            self.assertLessEqual(horario.asientos_ocupados, horario.bus.capacidad)
+        self.assertEqual(Reserva.objects.count(), 32)
+        self.assertEqual(asientos_duplicados(), [])
+        self.assertEqual(Horario.recalcular_asientos(guardar=False), [])
+        # Las que pasaron son exactamente las marcadas
+        self.assertEqual(resultados.count(True), Reserva.objects.filter(transferida=True).count())
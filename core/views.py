@@ -1,3 +1,21 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
 
-# Create your views here.
+from core.metricas import REGISTRO
+
+
+@require_GET
+def metricas_prometheus(request):
+    """Métricas en formato de texto de Prometheus (sumadas entre workers)."""
+    token = getattr(settings, "METRICAS", {}).get("TOKEN")
+    if token:
+        enviado = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not constant_time_compare(enviado, token):
+            return HttpResponseForbidden("Token inválido.")
+
+    return HttpResponse(
+        REGISTRO.exponer(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
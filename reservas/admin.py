@@ -1,3 +1,26 @@
 from django.contrib import admin
+from .models import Negociacion, RetencionAsiento
 
-# Register your models here.
+
+@admin.register(Negociacion)
+class NegociacionAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'fecha',
+        'origen',
+        'destino',
+        'costo_por_pasajero',
+        'precio_final',
+        'estado',
+    )
+    list_filter = ('estado', 'fecha')
+    list_select_related = ('origen__ruta', 'origen__bus', 'destino__ruta', 'destino__bus')
+    # Por id o cédula de la reserva, vía el índice NegociacionReserva (no el JSON)
+    search_fields = ('=enlaces__reserva__id', '=enlaces__reserva__cedula')
+
+
+@admin.register(RetencionAsiento)
+class RetencionAsientoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'horario', 'asiento', 'operador', 'creada', 'expira')
+    list_select_related = ('horario__ruta', 'horario__bus__cooperativa', 'operador')
+    raw_id_fields = ('horario',)
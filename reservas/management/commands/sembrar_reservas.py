@@ -0,0 +1,84 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from administracion.models import Horario
+from core.seed_real import pasajero_real
+from reservas.services import borrar_reservas, sembrar_reservas
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga reservas de prueba con bulk_create por lotes. "
+        "Con --scale K replica los horarios existentes K veces para pruebas de carga."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--modo",
+            choices=["dummy", "real", "reset"],
+            default="dummy",
+            help="dummy: completa lo que falta | real: borra y usa nombres reales | reset: borra y asientos 1..N",
+        )
+        parser.add_argument("--por-horario", type=int, default=20, help="Reservas por horario (default 20).")
+        parser.add_argument(
+            "--scale",
+            type=int,
+            default=1,
+            help="Repite cada horario K veces (una copia por día siguiente) antes de sembrar.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000, help="Filas por lote/transacción.")
+        parser.add_argument("--seed", type=int, help="Semilla para nombres/cédulas/asientos reproducibles.")
+
+    def handle(self, *args, **options):
+        if options["seed"] is not None:
+            random.seed(options["seed"])
+
+        inicio = time.perf_counter()
+
+        if options["scale"] > 1:
+            copias = self._replicar_horarios(options["scale"] - 1, options["batch_size"])
+            self.stdout.write(f"✔ {copias} horarios replicados.")
+
+        modo = options["modo"]
+        if modo in ("real", "reset"):
+            borrar_reservas()
+
+        kwargs = {}
+        if modo == "real":
+            kwargs = {"pasajero": pasajero_real, "asientos_aleatorios": True}
+        elif modo == "reset":
+            kwargs = {"pasajero": lambda h, n: (f"Pasajero {n}", str(random.randint(1000000000, 9999999999)))}
+
+        creadas = sembrar_reservas(
+            Horario.objects.all(),
+            options["por_horario"],
+            batch_size=options["batch_size"],
+            **kwargs,
+        )
+
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {creadas} reservas creadas en {duracion:.2f}s "
+            f"({creadas / duracion if duracion else 0:.0f} filas/s)."
+        ))
+
+    def _replicar_horarios(self, veces, batch_size):
+        originales = list(Horario.objects.values_list("bus_id", "ruta_id", "hora_salida"))
+
+        nuevos = []
+        total = 0
+        for k in range(1, veces + 1):
+            desfase = timezone.timedelta(days=k)
+            for bus_id, ruta_id, hora_salida in originales:
+                nuevos.append(Horario(bus_id=bus_id, ruta_id=ruta_id, hora_salida=hora_salida + desfase))
+
+            if len(nuevos) >= batch_size:
+                Horario.objects.bulk_create(nuevos, batch_size=batch_size)
+                total += len(nuevos)
+                nuevos = []
+
+        Horario.objects.bulk_create(nuevos, batch_size=batch_size)
+        return total + len(nuevos)
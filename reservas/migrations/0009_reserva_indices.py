@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0004_horario_horario_salida_idx'),
+        ('reservas', '0008_alter_reserva_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['horario', 'asiento'], name='reserva_horario_asiento_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(condition=models.Q(('transferida', True)), fields=['horario', 'asiento'], name='reserva_transferida_idx'),
+        ),
+    ]
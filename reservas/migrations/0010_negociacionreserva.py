@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0009_reserva_indices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NegociacionReserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('negociacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enlaces', to='reservas.negociacion')),
+                ('reserva', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='enlaces_negociacion', to='reservas.reserva')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['reserva', 'negociacion'], name='negociacion_reserva_idx')],
+                'constraints': [models.UniqueConstraint(fields=('negociacion', 'reserva'), name='negociacion_reserva_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+from reservas import fts
+
+
+def instalar_fts(apps, schema_editor):
+    fts.instalar(schema_editor.connection)
+
+
+def desinstalar_fts(apps, schema_editor):
+    fts.desinstalar(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0004_horario_horario_salida_idx'),
+        ('reservas', '0010_negociacionreserva'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['cedula'], name='reserva_cedula_idx'),
+        ),
+        # Búsqueda por prefijo de nombre (solo SQLite con FTS5; en otra base no hace nada)
+        migrations.RunPython(instalar_fts, desinstalar_fts),
+    ]
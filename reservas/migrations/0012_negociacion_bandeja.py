@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copiar_cantidad_y_cooperativa(apps, schema_editor):
+    Negociacion = apps.get_model('reservas', 'Negociacion')
+    negociaciones = list(Negociacion.objects.select_related('destino__bus'))
+    for n in negociaciones:
+        n.cantidad_pasajeros = len(n.reservas or [])
+        n.cooperativa_destino_id = n.destino.bus.cooperativa_id
+    Negociacion.objects.bulk_update(
+        negociaciones, ['cantidad_pasajeros', 'cooperativa_destino'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0004_horario_horario_salida_idx'),
+        ('reservas', '0011_reserva_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='negociacion',
+            name='cantidad_pasajeros',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='negociacion',
+            name='cooperativa_destino',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='negociaciones_recibidas', to='administracion.cooperativa'),
+        ),
+        migrations.RunPython(copiar_cantidad_y_cooperativa, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='negociacion',
+            index=models.Index(fields=['cooperativa_destino', 'estado'], name='negociacion_bandeja_idx'),
+        ),
+    ]
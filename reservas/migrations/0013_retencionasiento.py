@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0005_horario_retenidos'),
+        ('reservas', '0012_negociacion_bandeja'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetencionAsiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asiento', models.PositiveIntegerField()),
+                ('creada', models.DateTimeField(auto_now_add=True)),
+                ('expira', models.DateTimeField()),
+                ('horario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='retenciones', to='administracion.horario')),
+                ('operador', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expira'], name='retencion_expira_idx')],
+                'constraints': [models.UniqueConstraint(fields=('horario', 'asiento'), name='retencion_asiento_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,85 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def reubicar_duplicados(apps, schema_editor):
+    # Antes del índice único: a cada asiento repetido lo conserva la
+    # reserva más vieja y las demás pasan al primer asiento libre (y no
+    # retenido) del horario (o, si el bus está lleno, a uno por encima de la capacidad,
+    # para no perder la reserva). Misma regla que reparar_asientos.
+    Horario = apps.get_model('administracion', 'Horario')
+    Reserva = apps.get_model('reservas', 'Reserva')
+
+    horario_ids = sorted({
+        fila['horario_id']
+        for fila in Reserva.objects.values('horario_id', 'asiento')
+        .annotate(n=Count('id')).filter(n__gt=1).order_by()
+    })
+
+    for horario in Horario.objects.filter(id__in=horario_ids).select_related('bus'):
+        filas = list(Reserva.objects.filter(horario_id=horario.id).order_by('id'))
+        usados = {r.asiento for r in filas}
+        # Tampoco a un asiento retenido: la retención se confirma en ese asiento
+        bits_retenidos = int.from_bytes(bytes(horario.retenidos_bitmap or b''), 'little')
+        retenidos = {i + 1 for i in range(bits_retenidos.bit_length()) if bits_retenidos >> i & 1}
+        vistos = set()
+        movidas = []
+        siguiente = 1
+        for r in filas:
+            if r.asiento not in vistos:
+                vistos.add(r.asiento)
+                continue
+            while siguiente in usados or siguiente in retenidos:
+                siguiente += 1
+            r.asiento = siguiente
+            usados.add(siguiente)
+            vistos.add(siguiente)
+            movidas.append(r)
+        Reserva.objects.bulk_update(movidas, ['asiento'], batch_size=500)
+
+        bits = 0
+        for asiento in usados:
+            bits |= 1 << (asiento - 1)
+        horario.asientos_bitmap = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+        horario.asientos_ocupados = len(filas)
+        horario.save(update_fields=['asientos_bitmap', 'asientos_ocupados'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0005_horario_retenidos'),
+        ('reservas', '0013_retencionasiento'),
+    ]
+
+    operations = [
+        migrations.RunPython(reubicar_duplicados, migrations.RunPython.noop),
+        # CREATE UNIQUE INDEX directo: AddConstraint en SQLite reconstruye
+        # toda reservas_reserva (y borra los triggers FTS)
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    'CREATE UNIQUE INDEX "unique_asiento_por_horario" '
+                    'ON "reservas_reserva" ("horario_id", "asiento")',
+                    'DROP INDEX "unique_asiento_por_horario"',
+                ),
+                migrations.RunSQL(
+                    'DROP INDEX "reserva_horario_asiento_idx"',
+                    'CREATE INDEX "reserva_horario_asiento_idx" '
+                    'ON "reservas_reserva" ("horario_id", "asiento")',
+                ),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='reserva',
+                    constraint=models.UniqueConstraint(
+                        fields=('horario', 'asiento'), name='unique_asiento_por_horario'
+                    ),
+                ),
+                migrations.RemoveIndex(
+                    model_name='reserva',
+                    name='reserva_horario_asiento_idx',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:57
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0014_reserva_asiento_unico'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reserva',
+            name='asiento',
+            field=models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='retencionasiento',
+            name='asiento',
+            field=models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
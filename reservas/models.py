@@ -1,27 +1,181 @@
-from django.db import models
-from administracion.models import Horario
+from django.conf import settings
+from django.core.validators import MinValueValidator
+from django.db import models, transaction
+from django.db.models import ExpressionWrapper, F
+from django.db.models.functions import Round
+from administracion.models import Cooperativa, Horario
 
 
 class Reserva(models.Model):
     horario = models.ForeignKey(Horario, on_delete=models.CASCADE)
     nombre_pasajero = models.CharField(max_length=100)
     cedula = models.CharField(max_length=10)
-    asiento = models.PositiveIntegerField()
+    asiento = models.PositiveIntegerField(validators=[MinValueValidator(1)])
     transferida = models.BooleanField(default=False)
 
     # ✅ NUEVO: marca si queda en restricción (cross-coop)
     restringida = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            # Un pasajero por asiento; también es el índice de las reservas
+            # de un horario por asiento (detalle, paginación por clave).
+            # Se crea con SQL en 0014 para no reconstruir la tabla en SQLite.
+            models.UniqueConstraint(fields=["horario", "asiento"], name="unique_asiento_por_horario"),
+        ]
+        indexes = [
+            # Búsqueda de pasajeros por cédula (la de nombre va por FTS5, ver 0011)
+            models.Index(fields=["cedula"], name="reserva_cedula_idx"),
+            # Solo las transferidas (reactivar_pasajeros)
+            models.Index(
+                fields=["horario", "asiento"],
+                condition=models.Q(transferida=True),
+                name="reserva_transferida_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.nombre_pasajero} - Asiento {self.asiento}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Asiento con el que se cargó, para saber si save() lo movió.
+        # Con .only()/.defer() sin horario o asiento no se sabe (None).
+        if "horario_id" in field_names and "asiento" in field_names:
+            instance._asiento_original = (
+                instance.__dict__.get("horario_id"),
+                instance.__dict__.get("asiento"),
+            )
+        else:
+            instance._asiento_original = None
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Guarda la reserva y, en la misma transacción, actualiza el
+        mapa de asientos/contador del horario (creación o movimiento).
+        """
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not {"horario", "horario_id", "asiento"} & set(update_fields):
+            # No se guardan horario ni asiento: el mapa no cambia
+            super().save(*args, **kwargs)
+            return
+
+        anterior = getattr(self, "_asiento_original", (None, None))
+        if anterior is None:
+            if not {"horario_id", "asiento"} & self.__dict__.keys():
+                # Cargada sin horario/asiento y sin tocarlos: Django no los guarda
+                super().save(*args, **kwargs)
+                return
+            # Se asignaron sin conocer los originales: se leen de la BD
+            anterior = (
+                Reserva.objects.filter(pk=self.pk).values_list("horario_id", "asiento").first()
+                or (None, None)
+            )
+
+        with transaction.atomic():
+            actual = (self.horario_id, self.asiento)
+            if anterior[0] is not None and anterior[0] != actual[0]:
+                # Cambio de horario: los dos bloqueados en orden de id, antes que nada
+                Horario.bloquear([anterior[0], actual[0]])
+
+            super().save(*args, **kwargs)
+
+            if anterior != actual:
+                if anterior[0] is not None:
+                    Horario.liberar_asiento(*anterior)
+                horario = Horario.ocupar_asiento(*actual)
+
+                # Mantener al día el horario que ya está en memoria
+                if horario is not None and Reserva.horario.is_cached(self):
+                    self.horario.asientos_bitmap = horario.asientos_bitmap
+                    self.horario.asientos_ocupados = horario.asientos_ocupados
+
+        self._asiento_original = actual
+
+
+class RetencionAsiento(models.Model):
+    """
+    Asiento apartado por unos minutos mientras el operador completa la
+    venta. Se refleja en Horario.retenidos_bitmap; al vencer lo limpia
+    el barrido (core.services.retencion_service.barrer_retenciones).
+    """
+    horario = models.ForeignKey(Horario, related_name='retenciones', on_delete=models.CASCADE)
+    asiento = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    operador = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL
+    )
+    creada = models.DateTimeField(auto_now_add=True)
+    expira = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            # Una sola retención por asiento (el horario además va bloqueado)
+            models.UniqueConstraint(fields=["horario", "asiento"], name="retencion_asiento_unica"),
+        ]
+        indexes = [
+            # Barrido de las vencidas, las más viejas primero
+            models.Index(fields=["expira"], name="retencion_expira_idx"),
+        ]
+
+    def __str__(self):
+        return f"Retención asiento {self.asiento} (horario {self.horario_id})"
+
+
+
+class NegociacionQuerySet(models.QuerySet):
+    def con_finanzas(self):
+        """
+        Ingreso, costos, gastos, comisión y márgenes calculados en la BD
+        (antes se hacía en Python, fila por fila, en panel_operador).
+        """
+        total = ExpressionWrapper(
+            F("cantidad_pasajeros") * F("costo_por_pasajero"), output_field=models.FloatField()
+        )
+        costo = ExpressionWrapper(
+            F("cantidad_pasajeros") * F("costo_operativo_destino"), output_field=models.FloatField()
+        )
+        gastos = total * Negociacion.TASA_GASTOS_ADMIN
+        comision = total * Negociacion.TASA_COMISION
+
+        return self.annotate(
+            total_origen=Round(total, 2),
+            costo_operativo_total=Round(costo, 2),
+            ganancia_destino=Round(total - costo, 2),
+            gastos_admin=Round(gastos, 2),
+            comision_sistema=Round(comision, 2),
+            margen_origen=Round(total - gastos - comision, 2),
+            margen_destino=Round(total - costo - gastos, 2),
+            # margen_origen + ganancia_destino
+            ganancia_sistema=Round(total * 2 - gastos - comision - costo, 2),
+        )
+
+    def bandeja(self, cooperativa):
+        """Pendientes hacia 'cooperativa' (índice negociacion_bandeja_idx), con finanzas."""
+        return (
+            self.filter(cooperativa_destino=cooperativa, estado="PENDIENTE")
+            .select_related(
+                "origen__bus__cooperativa", "origen__ruta", "destino__bus", "destino__ruta"
+            )
+            .con_finanzas()
+        )
 
 
 class Negociacion(models.Model):
+    TASA_GASTOS_ADMIN = 0.05
+    TASA_COMISION = 0.08
+
     origen = models.ForeignKey(Horario, related_name='neg_origen', on_delete=models.CASCADE)
     destino = models.ForeignKey(Horario, related_name='neg_destino', on_delete=models.CASCADE)
 
+    # Cooperativa del bus destino (copiada al guardar): la bandeja filtra por ella
+    cooperativa_destino = models.ForeignKey(
+        Cooperativa, related_name='negociaciones_recibidas', on_delete=models.CASCADE, null=True
+    )
+
     reservas = models.JSONField()  # IDs de reservas involucradas
+    cantidad_pasajeros = models.PositiveIntegerField(default=0)  # len(reservas), al guardar
 
     # Valores enviados por la COOPERATIVA origen
     costo_por_pasajero = models.FloatField()
@@ -39,5 +193,48 @@ class Negociacion(models.Model):
     # Campo cuando ya se cierra
     precio_final = models.FloatField(null=True, blank=True)
 
+    objects = NegociacionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Bandeja de entrada: pendientes por cooperativa destino (y por id, implícito)
+            models.Index(fields=["cooperativa_destino", "estado"], name="negociacion_bandeja_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.cantidad_pasajeros = len(self.reservas or [])
+        if self.cooperativa_destino_id is None and self.destino_id is not None:
+            self.cooperativa_destino_id = self.destino.bus.cooperativa_id
+        super().save(*args, **kwargs)
+
     def pasajeros(self):
-        return len(self.reservas)
+        return self.cantidad_pasajeros
+
+    def indexar_reservas(self):
+        """Copia self.reservas (JSON) a NegociacionReserva; se puede repetir."""
+        ids = {int(i) for i in self.reservas or []}
+        NegociacionReserva.objects.bulk_create(
+            [NegociacionReserva(negociacion=self, reserva_id=i) for i in ids], ignore_conflicts=True
+        )
+
+
+class NegociacionReserva(models.Model):
+    """Índice relacional de Negociacion.reservas (una fila por reserva)."""
+    negociacion = models.ForeignKey(Negociacion, related_name="enlaces", on_delete=models.CASCADE)
+    reserva = models.ForeignKey(
+        Reserva,
+        related_name="enlaces_negociacion",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["negociacion", "reserva"], name="negociacion_reserva_unica"),
+        ]
+        indexes = [
+            models.Index(fields=["reserva", "negociacion"], name="negociacion_reserva_idx"),
+        ]
+
+    def __str__(self):
+        return f"Negociación {self.negociacion_id} - Reserva {self.reserva_id}"
@@ -1,55 +1,156 @@
 import random
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count
+
+from administracion import asientos
 from administracion.models import Horario
+from administracion.signals import ocupacion_cambiada
 from reservas.models import Reserva
 
 
-def generar_reservas_dummy():
+# ---------------------------------------------------
+# Pipeline de carga masiva (bulk_create por lotes)
+# ---------------------------------------------------
+
+def borrar_reservas(horario_ids=None):
     """
-    Genera reservas dummy SIN duplicar asientos ni pasajeros.
-    Solo crea reservas donde faltan.
+    Borra reservas con un DELETE directo (sin cargar filas ni mandar
+    post_delete por cada una) y deja en cero el mapa de asientos de
+    los horarios afectados. Pensado para resetear datos de prueba.
     """
-    horarios = Horario.objects.all()
-
-    for h in horarios:
+    tabla = connection.ops.quote_name(Reserva._meta.db_table)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            if horario_ids is None:
+                cursor.execute(f"DELETE FROM {tabla}")
+            else:
+                horario_ids = list(horario_ids)
+                for i in range(0, len(horario_ids), 500):
+                    lote = horario_ids[i:i + 500]
+                    marcas = ", ".join(["%s"] * len(lote))
+                    cursor.execute(f"DELETE FROM {tabla} WHERE horario_id IN ({marcas})", lote)
+
+        horarios = Horario.objects.all()
+        if horario_ids is not None:
+            horarios = horarios.filter(id__in=horario_ids)
+        ocupacion_cambiada.send(
+            sender=Horario,
+            horario_ids=horario_ids if horario_ids is not None else list(horarios.values_list("id", flat=True)),
+        )
+        horarios.update(asientos_bitmap=b"", asientos_ocupados=0)
+
+
+def _horarios_por_tramos(horarios, tramo=2000):
+    # Recorre por id (keyset) en tramos: no deja un cursor abierto
+    # mientras se escribe en la misma tabla.
+    ultimo = 0
+    while True:
+        filas = list(
+            horarios.filter(id__gt=ultimo)
+            .order_by("id")
+            .values_list(
+                "id", "bus__capacidad", "asientos_bitmap", "asientos_ocupados", "retenidos_bitmap"
+            )[:tramo]
+        )
+        if not filas:
+            return
+        yield from filas
+        ultimo = filas[-1][0]
+
+
+def sembrar_reservas(
+    horarios,
+    cantidad,
+    pasajero=None,
+    asientos_aleatorios=False,
+    batch_size=5000,
+    rnd=None,
+):
+    """
+    Crea hasta 'cantidad' reservas por horario en los asientos libres.
+    'cantidad' puede ser un número o una función (horario_id, capacidad) -> int.
 
-        capacidad = h.bus.capacidad
+    - Los asientos libres salen del mapa de bits del horario (sin
+      consultas por horario).
+    - Las filas se arman en memoria y se insertan con bulk_create en
+      lotes de 'batch_size', cada lote en su propia transacción junto
+      con el mapa de asientos/contador de sus horarios.
+    - 'pasajero(horario_id, n)' devuelve (nombre, cedula).
 
-        # Asientos ya ocupados (evita duplicados)
-        asientos_ocupados = set(
-            Reserva.objects.filter(horario=h)
-            .values_list("asiento", flat=True)
+    Devuelve el total de reservas creadas.
+    """
+    rnd = rnd or random
+    pasajero = pasajero or (
+        lambda horario_id, n: (
+            f"Pasajero {rnd.randint(1000, 9999)}",
+            f"{rnd.randint(1000000000, 9999999999)}",
         )
+    )
 
-        # Crear máximo 20 o lo que falte
-        faltantes = capacidad - len(asientos_ocupados)
-        crear = min(20, faltantes)
+    total = 0
+    reservas = []
+    actualizados = []
 
-        # Si ya no hay espacio, saltar
-        if crear <= 0:
+    def guardar_lote():
+        with transaction.atomic():
+            Reserva.objects.bulk_create(reservas, batch_size=batch_size)
+            Horario.objects.bulk_update(
+                actualizados, ["asientos_bitmap", "asientos_ocupados"], batch_size=500
+            )
+            ocupacion_cambiada.send(sender=Horario, horario_ids=[h.id for h in actualizados])
+        reservas.clear()
+        actualizados.clear()
+
+    for horario_id, capacidad, bitmap, ocupados, retenidos in _horarios_por_tramos(horarios):
+        pedidas = cantidad(horario_id, capacidad) if callable(cantidad) else cantidad
+
+        # Tampoco los asientos retenidos por una venta en curso
+        no_disponibles = asientos.unir(bitmap, retenidos)
+        if asientos_aleatorios:
+            libres = asientos.libres(no_disponibles, capacidad)
+            elegidos = rnd.sample(libres, min(pedidas, len(libres)))
+        else:
+            elegidos = asientos.libres(no_disponibles, capacidad, pedidas)
+
+        if not elegidos:
             continue
 
-        # Generar nuevos pasajeros en los asientos disponibles
-        siguiente_asiento = 1
+        for n, asiento in enumerate(elegidos, start=1):
+            nombre, cedula = pasajero(horario_id, n)
+            reservas.append(Reserva(
+                horario_id=horario_id,
+                nombre_pasajero=nombre,
+                cedula=cedula,
+                asiento=asiento,
+            ))
 
-        for _ in range(crear):
+        bits = asientos.a_entero(bitmap)
+        for asiento in elegidos:
+            bits |= asientos.bit(asiento)
+        actualizados.append(Horario(
+            id=horario_id,
+            asientos_bitmap=asientos.a_bytes(bits),
+            asientos_ocupados=ocupados + len(elegidos),
+        ))
+        total += len(elegidos)
 
-            # Buscar siguiente asiento libre
-            while siguiente_asiento in asientos_ocupados:
-                siguiente_asiento += 1
+        if len(reservas) >= batch_size:
+            guardar_lote()
 
-            # Generar pasajero único
-            nombre = f"Pasajero {random.randint(1000, 9999)}"
-            cedula = f"{random.randint(1000000000, 9999999999)}"
+    if reservas:
+        guardar_lote()
 
-            Reserva.objects.create(
-                horario=h,
-                nombre_pasajero=nombre,
-                cedula=cedula,
-                asiento=siguiente_asiento
-            )
+    return total
 
-            # Marcar asiento como ocupado
-            asientos_ocupados.add(siguiente_asiento)
+
+def generar_reservas_dummy():
+    """
+    Genera reservas dummy SIN duplicar asientos ni pasajeros.
+    Solo crea reservas donde faltan (máximo 20 por horario).
+    """
+    return sembrar_reservas(Horario.objects.all(), cantidad=20)
 
 
 def generar_reservas_para_un_horario(horario_id, cantidad):
@@ -57,65 +158,183 @@ def generar_reservas_para_un_horario(horario_id, cantidad):
     Genera reservas adicionales sin duplicar asientos ni sobrescribir datos.
     """
 
-    try:
-        horario = Horario.objects.get(id=horario_id)
-    except Horario.DoesNotExist:
+    horarios = Horario.objects.filter(id=horario_id)
+    if not horarios.exists():
         return f"❌ El horario con ID {horario_id} no existe."
 
-    capacidad = horario.bus.capacidad
-
-    asientos_ocupados = set(
-        Reserva.objects.filter(horario=horario)
-        .values_list("asiento", flat=True)
+    creadas = sembrar_reservas(
+        horarios,
+        cantidad,
+        pasajero=lambda h, n: (
+            f"Pasajero Extra {random.randint(1000, 9999)}",
+            f"{random.randint(1000000000, 9999999999)}",
+        ),
     )
 
-    disponibles = capacidad - len(asientos_ocupados)
-    crear = min(cantidad, disponibles)
-
-    if crear <= 0:
+    if creadas <= 0:
         return "⚠ No hay asientos disponibles."
 
-    siguiente_asiento = 1
+    return f"✔ Se agregaron {creadas} reservas al horario {horario_id}."
 
-    for _ in range(crear):
 
-        while siguiente_asiento in asientos_ocupados:
-            siguiente_asiento += 1
 
-        nombre = f"Pasajero Extra {random.randint(1000, 9999)}"
-        cedula = f"{random.randint(1000000000, 9999999999)}"
 
-        Reserva.objects.create(
-            horario=horario,
-            nombre_pasajero=nombre,
-            cedula=cedula,
-            asiento=siguiente_asiento
-        )
+def asignar_asiento_libre(horario):
+    """
+    Retorna el primer asiento libre (ni ocupado ni retenido) en un horario.
+    Si no hay asientos disponibles → retorna None.
 
-        asientos_ocupados.add(siguiente_asiento)
+    Solo lee: para apartar el asiento usar retener_asientos
+    (core.services.retencion_service), que bloquea el horario.
+    """
 
-    return f"✔ Se agregaron {crear} reservas al horario {horario_id}."
+    # Búsqueda de bits sobre el mapa de ocupados | retenidos del horario
+    return horario.primer_asiento_libre()  # None si el bus está lleno
 
 
+# ---------------------------------------------------
+# Asignación contra el índice único (horario, asiento)
+# ---------------------------------------------------
 
+def reservar_asiento(horario, nombre_pasajero, cedula, asiento=None, intentos=3):
+    """
+    Crea la reserva en 'asiento' o, sin él, en el primer asiento libre
+    del mapa de bits. No pregunta antes si el asiento está ocupado: el
+    INSERT va en un savepoint y, si el índice unique_asiento_por_horario
+    lo rechaza (otro se lo ganó o el mapa estaba atrasado), prueba el
+    siguiente libre; agotados, relee el mapa hasta 'intentos' veces.
 
-def asignar_asiento_libre(horario):
+    El índice no sabe de retenciones: un 'asiento' pedido explícitamente
+    se valida contra el horario bloqueado (ocupados | retenidos).
+
+    Devuelve la Reserva, o None si no quedó asiento (o 'asiento' estaba
+    tomado o retenido).
     """
-    Retorna el primer asiento libre en un horario.
-    Si no hay asientos disponibles → retorna None.
+    descartados = set()
+
+    for _ in range(intentos):
+        candidatos = [asiento] if asiento else [
+            a for a in horario.asientos_libres() if a not in descartados
+        ]
+        if not candidatos:
+            return None
+
+        for candidato in candidatos:
+            try:
+                with transaction.atomic():
+                    if asiento:
+                        bloqueado = Horario.bloquear([horario.id])[horario.id]
+                        if not bloqueado.esta_disponible(asiento):
+                            return None
+                    return Reserva.objects.create(
+                        horario=horario,
+                        nombre_pasajero=nombre_pasajero,
+                        cedula=cedula,
+                        asiento=candidato,
+                    )
+            except IntegrityError:
+                descartados.add(candidato)
+
+        if asiento:
+            return None
+        horario = Horario.objects.select_related("bus").get(id=horario.id)
+
+    return None
+
+
+def mover_a_asientos_libres(reservas, destino, campos=()):
     """
+    Pasa 'reservas' (lista) a los primeros asientos libres de 'destino'
+    con un solo bulk_update de horario + asiento (+ 'campos'). 'destino'
+    debe venir bloqueado (select_for_update) por quien llama.
 
-    capacidad = horario.bus.capacidad
-
-    # Asientos ocupados
-    ocupados = set(
-        Reserva.objects.filter(horario=horario)
-        .values_list("asiento", flat=True)
+    Si el índice único rechaza el UPDATE (mapa de bits atrasado),
+    reconstruye el mapa del destino y reintenta una vez. Los mapas
+    quedan para quien llama (recalcular_asientos).
+    """
+    for intento in range(2):
+        libres = destino.asientos_libres(len(reservas))
+        if len(libres) < len(reservas):
+            raise ValueError("Error inesperado: no se encontró asiento libre en el bus destino.")
+
+        for r, asiento in zip(reservas, libres):
+            r.horario = destino
+            r.asiento = asiento
+
+        try:
+            with transaction.atomic():
+                Reserva.objects.bulk_update(reservas, ["horario", "asiento", *campos])
+            return libres
+        except IntegrityError:
+            if intento:
+                raise
+            Horario.recalcular_asientos([destino.id])
+            destino.refresh_from_db(fields=["asientos_bitmap", "asientos_ocupados"])
+
+
+def asientos_duplicados():
+    """
+    (horario_id, asiento, cantidad) de cada asiento con más de una
+    reserva: un solo GROUP BY ... HAVING sobre el índice (horario, asiento).
+    """
+    return list(
+        Reserva.objects.values("horario_id", "asiento")
+        .annotate(n=Count("id"))
+        .filter(n__gt=1)
+        .order_by("horario_id", "asiento")
+        .values_list("horario_id", "asiento", "n")
     )
 
-    # Buscar el primer asiento libre
-    for num in range(1, capacidad + 1):
-        if num not in ocupados:
-            return num
 
-    return None  # Bus lleno
+def reparar_asientos_duplicados(duplicados=None, batch_size=500):
+    """
+    En cada horario con asientos repetidos la reserva más vieja conserva
+    el asiento y las demás pasan al primer asiento ni ocupado ni retenido
+    (o, con el bus lleno, al primero por encima de la capacidad: no se
+    pierde ninguna).
+    Luego reconstruye el mapa de esos horarios.
+
+    Devuelve [(reserva_id, horario_id, asiento_anterior, asiento_nuevo)].
+    """
+    if duplicados is None:
+        duplicados = asientos_duplicados()
+    horario_ids = sorted({horario_id for horario_id, _, _ in duplicados})
+    cambios = []
+
+    for i in range(0, len(horario_ids), batch_size):
+        lote = horario_ids[i:i + batch_size]
+        with transaction.atomic():
+            filas = list(
+                Reserva.objects.filter(horario_id__in=lote)
+                .order_by("horario_id", "id")
+                .only("id", "horario_id", "asiento")
+            )
+            # Los retenidos cuentan como usados: al confirmar la retención
+            # ese asiento tiene que seguir libre
+            usados = {
+                horario_id: set(asientos.marcados(retenidos))
+                for horario_id, retenidos in Horario.objects.filter(id__in=lote)
+                .values_list("id", "retenidos_bitmap")
+            }
+            for r in filas:
+                usados[r.horario_id].add(r.asiento)
+
+            vistos = set()
+            movidas = []
+            for r in filas:
+                if (r.horario_id, r.asiento) not in vistos:
+                    vistos.add((r.horario_id, r.asiento))
+                    continue
+                nuevo = 1
+                while nuevo in usados[r.horario_id]:
+                    nuevo += 1
+                usados[r.horario_id].add(nuevo)
+                vistos.add((r.horario_id, nuevo))
+                cambios.append((r.id, r.horario_id, r.asiento, nuevo))
+                r.asiento = nuevo
+                movidas.append(r)
+
+            Reserva.objects.bulk_update(movidas, ["asiento"], batch_size=batch_size)
+            Horario.recalcular_asientos(lote)
+
+    return cambios
@@ -0,0 +1,20 @@
+from django.db import connections
+from django.db.models.signals import post_delete, post_migrate
+from django.dispatch import receiver
+
+from administracion.models import Horario
+from reservas import fts
+from reservas.models import Reserva
+
+
+@receiver(post_delete, sender=Reserva)
+def liberar_asiento_reserva(sender, instance, **kwargs):
+    # Se ejecuta dentro de la transacción del borrado (también en queryset.delete())
+    Horario.liberar_asiento(instance.horario_id, instance.asiento)
+
+
+@receiver(post_migrate)
+def asegurar_indice_fts(sender, using, **kwargs):
+    # Una migración que reconstruye reservas_reserva (SQLite) borra sus triggers
+    if sender.name == "reservas":
+        fts.instalar(connections[using])
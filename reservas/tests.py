@@ -1,3 +1,254 @@
+import io
+
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from administracion.models import Ruta, Horario
+from reservas.models import Negociacion, Reserva, RetencionAsiento
+from reservas.services import (
+    asientos_duplicados,
+    borrar_reservas,
+    generar_reservas_dummy,
+    reparar_asientos_duplicados,
+    reservar_asiento,
+    sembrar_reservas,
+)
+from reservas import urls
+from core.models import SolicitudIdempotente, TransferLog
+from core.services.retencion_service import RetencionError, confirmar_retencion, retener_asientos
+from core.testing import PresupuestoConsultasMixin, crear_cooperativa, crear_horario, sembrar_datos_vistas
+
+
+class SembrarReservasTests(TestCase):
+    def setUp(self):
+        cooperativa = crear_cooperativa()
+        ruta = Ruta.objects.create(origen="Quito", destino="Manta")
+        self.horarios = [
+            crear_horario(cooperativa, ruta, capacidad, timezone.now() + timezone.timedelta(hours=i + 1))
+            for i, capacidad in enumerate([40, 12, 30])
+        ]
+
+        Reserva.objects.create(
+            horario=self.horarios[0], nombre_pasajero="Existente", cedula="0102030405", asiento=2
+        )
+
+    def test_completa_sin_duplicar_y_actualiza_mapa(self):
+        creadas = generar_reservas_dummy()
+        self.assertEqual(creadas, 20 + 12 + 20)
+
+        for h in self.horarios:
+            asientos = list(Reserva.objects.filter(horario=h).values_list("asiento", flat=True))
+            self.assertEqual(len(asientos), len(set(asientos)))
+
+        self.assertEqual(Reserva.objects.filter(horario=self.horarios[0]).count(), 21)
+        self.assertEqual(Horario.recalcular_asientos(guardar=False), [])
+
+    def test_lotes_pequenos_y_asientos_aleatorios(self):
+        creadas = sembrar_reservas(
+            Horario.objects.all(), 10, asientos_aleatorios=True, batch_size=7
+        )
+        self.assertEqual(creadas, 30)
+        self.assertEqual(Horario.recalcular_asientos(guardar=False), [])
+
+    def test_borrar_reservas_resetea_mapa(self):
+        generar_reservas_dummy()
+        borrar_reservas([self.horarios[1].id])
+
+        self.assertFalse(Reserva.objects.filter(horario=self.horarios[1]).exists())
+        self.assertTrue(Reserva.objects.filter(horario=self.horarios[0]).exists())
+        self.assertEqual(Horario.recalcular_asientos(guardar=False), [])
+
+
+class AsientoUnicoTests(TestCase):
+    def setUp(self):
+        self.horario = crear_horario(capacidad=3, salida=timezone.now() + timezone.timedelta(hours=3))
+
+    def test_reintenta_si_el_mapa_esta_atrasado(self):
+        reservar_asiento(self.horario, "Uno", "0100000001")
+        # Mapa sin el asiento 1: el INSERT choca con el índice y pasa al 2
+        Horario.objects.filter(id=self.horario.id).update(asientos_bitmap=b"")
+        horario = Horario.objects.select_related("bus").get(id=self.horario.id)
+
+        reserva = reservar_asiento(horario, "Dos", "0100000002")
+        self.assertEqual(reserva.asiento, 2)
+        self.assertIsNone(reservar_asiento(horario, "Tres", "0100000003", asiento=1))
+
+    def test_escaner_y_reparacion(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX "unique_asiento_por_horario"')
+        Reserva.objects.bulk_create([
+            Reserva(horario=self.horario, nombre_pasajero=f"P{i}", cedula=f"010000000{i}", asiento=1)
+            for i in range(4)
+        ])
+        self.assertEqual(asientos_duplicados(), [(self.horario.id, 1, 4)])
+        with self.assertRaises(CommandError):
+            call_command("reparar_asientos", stdout=io.StringIO())
+
+        call_command("reparar_asientos", "--reparar", stdout=io.StringIO())
+        asientos = sorted(Reserva.objects.values_list("asiento", flat=True))
+        # Bus de 3 lleno: la cuarta queda por encima de la capacidad, no se pierde
+        self.assertEqual(asientos, [1, 2, 3, 4])
+        self.assertEqual(asientos_duplicados(), [])
+        self.assertEqual(Horario.recalcular_asientos(guardar=False), [])
+
+
+    def test_respeta_asientos_retenidos(self):
+        retencion, = retener_asientos(self.horario, asientos=[1])
+        self.assertIsNone(reservar_asiento(self.horario, "Otro", "0100000009", asiento=1))
+
+        # Un INSERT por fuera del servicio no deja que la confirmación reviente con IntegrityError
+        Reserva.objects.bulk_create([
+            Reserva(horario=self.horario, nombre_pasajero="Colado", cedula="0100000008", asiento=1)
+        ])
+        with self.assertRaises(RetencionError):
+            confirmar_retencion(retencion, "Dueño", "0100000007")
+        self.assertTrue(RetencionAsiento.objects.filter(id=retencion.id).exists())
+
+    def test_reparacion_salta_asientos_retenidos(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX "unique_asiento_por_horario"')
+        retener_asientos(self.horario, asientos=[2])
+        Reserva.objects.bulk_create([
+            Reserva(horario=self.horario, nombre_pasajero=f"P{i}", cedula=f"010000000{i}", asiento=1)
+            for i in range(2)
+        ])
+
+        reparar_asientos_duplicados()
+        self.assertEqual(sorted(Reserva.objects.values_list("asiento", flat=True)), [1, 3])
+
+
+class BandejaNegociacionesTests(TestCase):
+    def setUp(self):
+        self.destino = crear_cooperativa()
+        ruta = Ruta.objects.create(origen="Quito", destino="Loja")
+        salida = timezone.now() + timezone.timedelta(hours=2)
+        self.h_origen = crear_horario(ruta=ruta, salida=salida)
+        self.h_destino = crear_horario(self.destino, ruta, salida=salida)
+
+    def test_copia_datos_y_calcula_finanzas(self):
+        neg = Negociacion.objects.create(
+            origen=self.h_origen, destino=self.h_destino, reservas=[1, 2, 3],
+            costo_por_pasajero=12.5, costo_operativo_destino=4.0, estado="PENDIENTE",
+        )
+        Negociacion.objects.create(
+            origen=self.h_origen, destino=self.h_destino, reservas=[4],
+            costo_por_pasajero=10, costo_operativo_destino=3, estado="ACEPTADA",
+        )
+        self.assertEqual(neg.cantidad_pasajeros, 3)
+        self.assertEqual(neg.cooperativa_destino_id, self.destino.id)
+
+        with self.assertNumQueries(1):
+            bandeja = list(Negociacion.objects.bandeja(self.destino))
+        self.assertEqual([n.id for n in bandeja], [neg.id])
+
+        n = bandeja[0]
+        total, costo = 3 * 12.5, 3 * 4.0
+        self.assertEqual(n.total_origen, total)
+        self.assertEqual(n.ganancia_destino, total - costo)
+        # ROUND de SQLite redondea el medio centavo hacia arriba; round() de Python no siempre
+        self.assertAlmostEqual(n.margen_origen, total * (1 - 0.05 - 0.08), delta=0.006)
+        self.assertAlmostEqual(n.margen_destino, total - costo - total * 0.05, delta=0.006)
+        self.assertAlmostEqual(n.ganancia_sistema, n.margen_origen + n.ganancia_destino, delta=0.006)
+
+
+class EnvioIdempotenteTests(TestCase):
+    def setUp(self):
+        cooperativa = crear_cooperativa()
+        ruta = Ruta.objects.create(origen="Quito", destino="Tena")
+        salida = timezone.now() + timezone.timedelta(hours=2)
+        self.origen, self.destino = [
+            crear_horario(cooperativa, ruta, 10, salida + timezone.timedelta(minutes=30 * i))
+            for i in range(2)
+        ]
+        self.reservas = [
+            reservar_asiento(self.origen, f"P{i}", f"010000004{i}").id for i in range(2)
+        ]
+        self.client.force_login(User.objects.create_user("clave", password="x"))
+
+    def test_reenvio_con_la_misma_clave_no_repite_la_transferencia(self):
+        url = reverse("transferencias", args=[self.origen.id])
+        datos = {"reservas": self.reservas, "destino": self.destino.id, "clave_idempotencia": "abc123"}
+
+        self.assertRedirects(self.client.post(url, datos), reverse("panel_operador"), fetch_redirect_response=False)
+        self.assertEqual(TransferLog.objects.count(), 1)
+
+        # El reenvío solo busca la clave (más sesión y usuario) y responde igual
+        with self.assertNumQueries(3):
+            respuesta = self.client.post(url, datos)
+        self.assertRedirects(respuesta, reverse("panel_operador"), fetch_redirect_response=False)
+        self.assertEqual(TransferLog.objects.count(), 1)
+        self.assertEqual(Reserva.objects.filter(horario=self.destino).count(), 2)
+
+        solicitud = SolicitudIdempotente.objects.get()
+        self.assertTrue(solicitud.ok)
+        self.assertEqual(solicitud.mensaje, "Transferencia realizada correctamente.")
+
+        # Otra clave es otro envío y pasa por las validaciones: ya fueron transferidas
+        respuesta = self.client.post(url, {**datos, "clave_idempotencia": "def456"})
+        self.assertRedirects(respuesta, url, fetch_redirect_response=False)
+        self.assertEqual(TransferLog.objects.count(), 1)
+
+    def test_aceptar_negociacion_solo_por_post_y_si_esta_pendiente(self):
+        nego = Negociacion.objects.create(
+            origen=self.origen, destino=self.destino, reservas=self.reservas,
+            costo_por_pasajero=5, estado="PENDIENTE",
+        )
+        url = reverse("aceptar_negociacion", args=[nego.id])
+
+        self.assertEqual(self.client.get(url).status_code, 405)
+
+        self.client.post(reverse("rechazar_negociacion", args=[nego.id]))
+        nego.refresh_from_db()
+        self.assertEqual(nego.estado, "RECHAZADA")
+
+        # Rechazada: con una clave nueva tampoco se acepta
+        self.client.post(url, {"clave_idempotencia": "ghi789"})
+        nego.refresh_from_db()
+        self.assertEqual(nego.estado, "RECHAZADA")
+        self.assertEqual(TransferLog.objects.count(), 0)
+        self.assertFalse(SolicitudIdempotente.objects.get(clave="ghi789").ok)
+
+
+class PresupuestoConsultasVistasTests(PresupuestoConsultasMixin, TestCase):
+    URLS = urls
+    USUARIO = "usuario_operador"
+
+    # url name -> (máximo de consultas, argumentos según los datos sembrados)
+    PRESUPUESTOS = {
+        "panel_operador": (6, lambda d: []),
+        "detalle_reserva": (4, lambda d: [d["horario"].id]),
+        "transferencias": (8, lambda d: [d["horario"].id]),
+        "estadisticas_reserva": (4, lambda d: [d["horario"].id]),
+        "negociacion": (1, lambda d: []),
+        "aceptar_negociacion": (24, lambda d: [d["negociacion"].id]),
+        "rechazar_negociacion": (5, lambda d: [d["otra_negociacion"].id]),
+        "reactivar_pasajeros": (6, lambda d: []),
+        "reactivar_masivo": (2, lambda d: []),
+        "reactivar_pasajero": (6, lambda d: [d["transferida"].id]),
+        "historial_pasajero": (6, lambda d: [d["transferida"].id]),
+        "operador_logout": (4, lambda d: []),
+    }
+
+    # Las que cambian datos van por POST, con su clave como desde el panel
+    POST = {
+        "aceptar_negociacion": lambda d: {"clave_idempotencia": f"presupuesto-{d['negociacion'].id}"},
+        "rechazar_negociacion": lambda d: {},
+    }
+
+    def test_reenvio_de_aceptar_negociacion_solo_busca_la_clave(self):
+        datos = sembrar_datos_vistas()
+        self.client.force_login(datos[self.USUARIO])
+        url = reverse("aceptar_negociacion", args=[datos["negociacion"].id])
+
+        self.client.post(url, {"clave_idempotencia": "reenvio"})
+        datos["negociacion"].refresh_from_db()
+        self.assertEqual(datos["negociacion"].estado, "ACEPTADA")
 
-# Create your tests here.
+        # Sesión, usuario y la clave
+        with self.assertPresupuestoConsultas(3, etiqueta="reenvío"):
+            self.client.post(url, {"clave_idempotencia": "reenvio"})
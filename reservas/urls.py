@@ -27,5 +27,11 @@ urlpatterns = [
         
     path('reactivar/<int:id>/', views.reactivar_pasajero_individual, name='reactivar_pasajero'),
 
+    # Reactivación masiva (POST): seleccionados / por horario / por incidente / todos
+    path('reactivar/masivo/', views.reactivar_pasajeros_masivo, name='reactivar_masivo'),
+
+    # Historial de transferencias/negociaciones de un pasajero (id de Reserva)
+    path('pasajero/<int:id>/historial/', views.historial_pasajero, name='historial_pasajero'),
+
 
 ]
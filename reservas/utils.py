@@ -1,21 +1,17 @@
 import random
 from administracion.models import Horario
-from reservas.models import Reserva
+from reservas.services import borrar_reservas, sembrar_reservas
 
 def resetear_reservas():
     # Limpiar todas las reservas
-    Reserva.objects.all().delete()
+    borrar_reservas()
 
-    horarios = Horario.objects.all()
-
-    for h in horarios:
-        capacidad = h.bus.capacidad
-        cantidad = min(20, capacidad)
-
-        for i in range(1, cantidad + 1):
-            Reserva.objects.create(
-                horario=h,
-                nombre_pasajero=f"Pasajero {i}",
-                cedula=str(random.randint(1000000000, 9999999999)),
-                asiento=i
-            )
+    # 20 por horario (o la capacidad del bus) en los asientos 1..20
+    return sembrar_reservas(
+        Horario.objects.all(),
+        cantidad=20,
+        pasajero=lambda horario_id, n: (
+            f"Pasajero {n}",
+            str(random.randint(1000000000, 9999999999)),
+        ),
+    )
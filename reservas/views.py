@@ -8,7 +8,6 @@ from django.contrib import messages
 # Models
 from administracion.models import Operador, Horario
 from reservas.models import Reserva, Negociacion
-from core.models import IncidenteCooperativa
 
 
 # Servicios
@@ -31,7 +30,10 @@ from django.http import HttpResponse
 # -----------------------------------------------------------
 
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse
+from django.db import transaction
+from django.db.models import Q
+from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import logout
 from django.contrib import messages
@@ -45,6 +47,20 @@ from core.services_old import (
     ejecutar_transferencia,
     cumple_umbral,
 )
+from core.services import build_ocupacion_service
+from core.strategies import UmbralPorcentajeStrategy
+from core.metricas import PANEL_SEGUNDOS, cronometrar
+from core.paginacion import paginar_keyset
+from core.models import TransferLog
+from core.models import IncidenteCooperativa
+from core.services.incidente_service import incidentes_del_request
+from core.services.reactivacion_service import ReactivacionError, reactivar_masivo
+from core.services.idempotencia_service import (
+    clave_del_request,
+    ejecutar_una_vez,
+    nueva_clave,
+    resultado_previo,
+)
 
 
 
@@ -53,6 +69,7 @@ from core.services_old import (
 # -----------------------------------------------------------
 
 @login_required
+@cronometrar(PANEL_SEGUNDOS, vista="panel_operador")
 def panel_operador(request):
     try:
         operador = Operador.objects.get(user=request.user)
@@ -62,52 +79,37 @@ def panel_operador(request):
     cooperativa = operador.cooperativa
     horarios = Horario.objects.filter(bus__cooperativa=cooperativa)
 
+    # Ocupación + estado de todos los horarios en una sola consulta
+    horarios = build_ocupacion_service().calcular_muchos(
+        horarios,
+        umbral_strategy=UmbralPorcentajeStrategy(umbral_minimo=30),
+    )
+
     data = []
     for h in horarios:
-        ocupacion, usados, capacidad = calcular_ocupacion(h)
-        estado = "OK" if cumple_umbral(h) else "CRÍTICO"
-
         data.append({
             "horario": h,
-            "usados": usados,
-            "libres": capacidad - usados,
-            "total": capacidad,
-            "ocupacion": round(ocupacion, 2),
-            "estado": estado,
+            "usados": h.usados,
+            "libres": h.libres,
+            "total": h.capacidad,
+            "ocupacion": h.ocupacion_porcentaje,
+            "estado": h.estado,
         })
 
-    solicitudes = Negociacion.objects.filter(
-        destino__bus__cooperativa=cooperativa,
-        estado="PENDIENTE"
+    # Bandeja de negociaciones: finanzas calculadas en la BD, paginada por id
+    solicitudes = paginar_keyset(
+        Negociacion.objects.bandeja(cooperativa),
+        ("-id",),
+        request.GET.get("cursor"),
+        tamano=20,
     )
 
-    solicitudes_detalladas = []
-    for n in solicitudes:
-        cantidad = len(n.reservas)
-        precio = n.costo_por_pasajero
-        total_ingreso = cantidad * precio
-        costo_destino = cantidad * n.costo_operativo_destino
-
-        gastos_admin = total_ingreso * 0.05
-        comision = total_ingreso * 0.08
-
-        solicitudes_detalladas.append({
-            "obj": n,
-            "cantidad": cantidad,
-            "precio": precio,
-            "total_origen": round(total_ingreso, 2),
-            "costo_operativo_destino": round(costo_destino, 2),
-            "ganancia_destino": round(total_ingreso - costo_destino, 2),
-            "gastos_admin": round(gastos_admin, 2),
-            "comision_sistema": round(comision, 2),
-            "margen_origen": round(total_ingreso - gastos_admin - comision, 2),
-            "margen_destino": round((total_ingreso - costo_destino) - gastos_admin, 2),
-        })
-
     return render(request, "reservas/panel_operador.html", {
         "cooperativa": cooperativa,
         "data": data,
-        "solicitudes": solicitudes_detalladas,
+        "solicitudes": solicitudes,
+        "pagina": solicitudes,
+        "clave_idempotencia": nueva_clave(),
     })
 
 
@@ -122,16 +124,89 @@ def reactivar_pasajeros(request):
     coop = operador.cooperativa
 
     # Solo reservas transferidas y de la cooperativa del operador
-    reservas = Reserva.objects.filter(
-        transferida=True,
-        horario__bus__cooperativa=coop
-    ).order_by('horario__ruta__origen', 'horario__ruta__destino', 'asiento')
+    # Paginado por (horario, asiento) sobre el índice parcial de transferidas.
+    # Con IN (subconsulta) SQLite recorre el índice en orden, sin ordenar aparte.
+    reservas = paginar_keyset(
+        Reserva.objects.filter(
+            transferida=True,
+            horario_id__in=Horario.objects.filter(bus__cooperativa=coop).values('id'),
+        ).select_related('horario__ruta', 'horario__bus__cooperativa'),
+        ('horario_id', 'asiento', 'id'),
+        request.GET.get('cursor'),
+    )
+
+    # Para la reactivación masiva: horarios de esta página e incidentes vigentes
+    horarios = list({r.horario_id: r.horario for r in reservas}.values())
+    incidentes = (
+        IncidenteCooperativa.objects.vigentes()
+        .filter(Q(cooperativa=coop) | Q(bus__cooperativa=coop) | Q(ruta__isnull=False))
+        .select_related('cooperativa', 'bus', 'ruta')
+        .order_by('-fecha')
+    )
 
     return render(request, "reservas/reactivar_pasajeros.html", {
-        "reservas": reservas
+        "reservas": reservas,
+        "pagina": reservas,
+        "horarios": horarios,
+        "incidentes": incidentes,
     })
 
 
+@login_required
+@require_POST
+def reactivar_pasajeros_masivo(request):
+    """
+    Reactiva de una vez: los pasajeros marcados (reservas=...), todos los
+    de un horario (horario=<id>), los afectados por un incidente
+    (incidente=<id>) o todos (todos=1). Permiso e incidente se validan una
+    vez; la marca se quita con un solo UPDATE.
+    """
+    try:
+        operador = Operador.objects.select_related("cooperativa").get(user=request.user)
+    except Operador.DoesNotExist:
+        return redirect("login")
+
+    if not request.user.has_perm("reservas.can_reactivar"):
+        messages.error(request, "No tienes permisos para reactivar pasajeros transferidos.")
+        return redirect("reactivar_pasajeros")
+
+    try:
+        reserva_ids = [int(i) for i in request.POST.getlist("reservas")]
+        horario_id = int(request.POST["horario"]) if request.POST.get("horario") else None
+        incidente_id = int(request.POST["incidente"]) if request.POST.get("incidente") else None
+    except ValueError:
+        messages.error(request, "Selección inválida.")
+        return redirect("reactivar_pasajeros")
+
+    if not (reserva_ids or horario_id or incidente_id or request.POST.get("todos")):
+        messages.error(request, "Elige pasajeros, un horario o un incidente.")
+        return redirect("reactivar_pasajeros")
+
+    incidente = (
+        get_object_or_404(IncidenteCooperativa, id=incidente_id) if incidente_id else None
+    )
+
+    try:
+        log = reactivar_masivo(
+            operador.cooperativa,
+            request.user,
+            reserva_ids=reserva_ids,
+            horario_id=horario_id,
+            incidente=incidente,
+        )
+    except ReactivacionError as e:
+        messages.error(request, str(e))
+        return redirect("reactivar_pasajeros")
+
+    if log is None:
+        messages.info(request, "No hay pasajeros transferidos que coincidan con la selección.")
+    else:
+        messages.success(
+            request, f"{log.cantidad} pasajeros reactivados para nuevas transferencias."
+        )
+    return redirect("reactivar_pasajeros")
+
+
 
 
 @login_required
@@ -146,27 +221,15 @@ def reactivar_pasajero_individual(request, id):
 
 
     reserva = get_object_or_404(
-        Reserva,
+        Reserva.objects.select_related("horario"),
         id=id,
         horario__bus__cooperativa=coop
     )
 
-    # 🕒 Verificar si hay algún incidente activo que afecte a este bus / ruta / cooperativa (opcional)
-    incidentes_activos = IncidenteCooperativa.objects.filter(activo=True)
-    incidente_relacionado = None
-    for inc in incidentes_activos:
-        if not inc.esta_activo:
-            continue
-
-        if inc.bus and inc.bus == reserva.horario.bus:
-            incidente_relacionado = inc
-            break
-        if inc.ruta and inc.ruta == reserva.horario.ruta:
-            incidente_relacionado = inc
-            break
-        if inc.cooperativa and inc.cooperativa == coop:
-            incidente_relacionado = inc
-            break
+    # 🕒 Incidente vigente que afecte a este bus / ruta / cooperativa (una consulta indexada)
+    incidente_relacionado = incidentes_del_request(request).incidente_para(
+        reserva.horario.bus_id, reserva.horario.ruta_id, coop.id
+    )
 
     # Si quieres hacer obligatorio el incidente descomenta esto:
     # if not incidente_relacionado:
@@ -182,7 +245,7 @@ def reactivar_pasajero_individual(request, id):
         messages.success(
             request,
             f"El pasajero {reserva.nombre_pasajero} ha sido reactivado "
-            f"(incidente: {incidente_relacionado.tipo})."
+            f"(incidente de {incidente_relacionado.tipo}: {incidente_relacionado.descripcion})."
         )
     else:
         messages.success(
@@ -193,6 +256,48 @@ def reactivar_pasajero_individual(request, id):
     return redirect("reactivar_pasajeros")
 
 
+@login_required
+def historial_pasajero(request, id):
+    """
+    Transferencias y negociaciones por las que pasó una reserva, leídas
+    de las tablas de enlaces (índice por reserva, sin recorrer el JSON).
+    La ve la cooperativa que hoy tiene al pasajero y las que lo tuvieron.
+    """
+    try:
+        operador = Operador.objects.select_related("cooperativa").get(user=request.user)
+    except Operador.DoesNotExist:
+        return redirect("login")
+    coop_id = operador.cooperativa_id
+
+    reserva = get_object_or_404(
+        Reserva.objects.select_related("horario__ruta", "horario__bus__cooperativa"), id=id
+    )
+
+    logs = list(
+        TransferLog.objects.filter(enlaces__reserva_id=reserva.id)
+        .select_related("operador", "origen__ruta", "origen__bus", "destino__ruta", "destino__bus")
+        .order_by("-fecha", "-id")
+    )
+    negociaciones = list(
+        Negociacion.objects.filter(enlaces__reserva_id=reserva.id)
+        .select_related("origen__ruta", "origen__bus", "destino__ruta", "destino__bus")
+        .order_by("-fecha", "-id")
+    )
+
+    cooperativas = {reserva.horario.bus.cooperativa_id}
+    for obj in logs + negociaciones:
+        if obj.origen is not None:
+            cooperativas.add(obj.origen.bus.cooperativa_id)
+    if coop_id not in cooperativas:
+        raise Http404("Reserva no encontrada.")
+
+    return render(request, "reservas/historial_pasajero.html", {
+        "reserva": reserva,
+        "logs": logs,
+        "negociaciones": negociaciones,
+    })
+
+
 
 
 
@@ -272,18 +377,19 @@ def transferir_pasajeros(request, reserva_id, horario_id):
 
 @login_required
 def transferencias(request, id):
+    # Envío repetido (doble clic, reintento del navegador): se responde con
+    # el resultado guardado, sin tocar horarios ni reservas
+    clave = clave_del_request(request) if request.method == "POST" else None
+    previa = resultado_previo(request.user, "transferencia", clave)
+    if previa is not None:
+        return _responder_transferencia(request, *previa)
+
     origen = get_object_or_404(Horario, id=id)
     reservas = Reserva.objects.filter(horario=origen).order_by("asiento")
 
-    # Cargar opciones de la misma ruta sin filtrar por capacidad todavía
-    opciones = Horario.objects.filter(ruta=origen.ruta).exclude(id=origen.id)
-
-    # Calcular datos de ocupación para mostrarlos en el select
-    for h in opciones:
-        ocupacion, usados, capacidad = calcular_ocupacion(h)
-        h.libres = capacidad - usados
-        h.capacidad = capacidad
-        h.ocupacion_porcentaje = round(ocupacion, 2)
+    # Opciones de la misma ruta que no han salido, dentro de la ventana y
+    # con al menos un asiento libre (la cantidad exacta se valida al enviar)
+    opciones = buscar_opciones_transferencia(origen, 1)
 
     # =====================================================================
     # 🔥 PROCESAR POST (EL USUARIO INTENTÓ TRANSFERIR)
@@ -314,35 +420,31 @@ def transferencias(request, id):
             return redirect(request.path)
 
 
-        # ✔ MISMA COOPERATIVA → TRANSFERIR DIRECTAMENTE
-        if origen.bus.cooperativa == destino.bus.cooperativa:
-
-            ok, msg = ejecutar_transferencia(
-    reservas_objs,
-    destino,
-    operador=request.user
-)
-
-
-            if not ok:
-                messages.error(request, msg)
-                return redirect(request.path)
-
-            messages.success(request, "Transferencia realizada correctamente.")
-            return redirect("panel_operador")
-
-        # ✔ OTRA COOPERATIVA → CREAR NEGOCIACIÓN
-        Negociacion.objects.create(
-            origen=origen,
-            destino=destino,
-            reservas=seleccionados,
-            costo_por_pasajero=float(request.POST.get("costo_por_pasajero")),
-            comentario_origen=request.POST.get("comentario_origen", ""),
-            estado="PENDIENTE",
-        )
+        def procesar():
+            # ✔ MISMA COOPERATIVA → TRANSFERIR DIRECTAMENTE
+            if origen.bus.cooperativa == destino.bus.cooperativa:
+                ok, msg = ejecutar_transferencia(
+                    Reserva.objects.filter(id__in=seleccionados),
+                    destino,
+                    operador=request.user,
+                    reintentar=False,  # reintenta ejecutar_una_vez
+                )
+                return ok, msg if not ok else "Transferencia realizada correctamente."
+
+            # ✔ OTRA COOPERATIVA → CREAR NEGOCIACIÓN
+            neg = Negociacion.objects.create(
+                origen=origen,
+                destino=destino,
+                reservas=seleccionados,
+                costo_por_pasajero=float(request.POST.get("costo_por_pasajero")),
+                comentario_origen=request.POST.get("comentario_origen", ""),
+                estado="PENDIENTE",
+            )
+            neg.indexar_reservas()
+            return True, "Solicitud de negociación enviada."
 
-        messages.success(request, "Solicitud de negociación enviada.")
-        return redirect("panel_operador")
+        ok, msg = ejecutar_una_vez(request.user, "transferencia", clave, procesar)
+        return _responder_transferencia(request, ok, msg)
 
     # =====================================================================
     # Mostrar página normalmente
@@ -351,27 +453,41 @@ def transferencias(request, id):
         "horario": origen,
         "reservas": reservas,
         "opciones": opciones,
+        "clave_idempotencia": nueva_clave(),
     })
 
 
+def _responder_transferencia(request, ok, msg):
+    if not ok:
+        messages.error(request, msg)
+        return redirect(request.path)
+    messages.success(request, msg)
+    return redirect("panel_operador")
+
+
 # -----------------------------------------------------------
 # 📌 DETALLES Y ESTADÍSTICAS
 # -----------------------------------------------------------
 
 @login_required
 def detalle_reserva(request, id):
-    horario = get_object_or_404(Horario, id=id)
-    reservas = Reserva.objects.filter(horario=horario).order_by("asiento")
+    horario = get_object_or_404(Horario.objects.select_related("bus", "ruta"), id=id)
+    reservas = paginar_keyset(
+        Reserva.objects.filter(horario=horario),
+        ("asiento", "id"),
+        request.GET.get("cursor"),
+    )
 
     return render(request, "reservas/detalle_reserva.html", {
         "horario": horario,
         "reservas": reservas,
+        "pagina": reservas,
     })
 
 
 @login_required
 def estadisticas_reserva(request, id):
-    horario = get_object_or_404(Horario, id=id)
+    horario = get_object_or_404(Horario.objects.select_related("bus", "ruta"), id=id)
 
     ocupacion, usados, total = calcular_ocupacion(horario)
     estado = "OK" if cumple_umbral(horario) else "CRÍTICO"
@@ -460,35 +576,59 @@ def responder_negociacion(request, id):
 
 
 @login_required
+@require_POST
 def aceptar_negociacion(request, id):
-    nego = get_object_or_404(Negociacion, id=id)
+    operacion = f"aceptar_negociacion:{id}"
+    clave = clave_del_request(request)
+    resultado = resultado_previo(request.user, operacion, clave)
 
-    reservas_qs = Reserva.objects.filter(id__in=nego.reservas)
+    if resultado is None:
+        get_object_or_404(Negociacion.objects.only("id"), id=id)
 
-    ok, msg = ejecutar_transferencia(
-    reservas_qs,
-    nego.destino,
-    operador=request.user
-)
+        def aceptar():
+            # Releída bloqueada dentro de la transacción: otra aceptación o
+            # un rechazo al mismo tiempo esperan y después ven el nuevo estado
+            nego = Negociacion.objects.select_for_update().get(id=id)
+            if nego.estado != "PENDIENTE":
+                return False, "La negociación ya no está pendiente."
 
+            ok, msg = ejecutar_transferencia(
+                Reserva.objects.filter(id__in=nego.reservas),
+                nego.destino,
+                operador=request.user,
+                reintentar=False,  # reintenta ejecutar_una_vez
+            )
+            if not ok:
+                return ok, msg
+
+            nego.estado = "ACEPTADA"
+            nego.save()
+            return True, "Negociación aceptada y transferencia aplicada correctamente."
 
+        resultado = ejecutar_una_vez(request.user, operacion, clave, aceptar)
+
+    ok, msg = resultado
     if not ok:
         messages.error(request, msg)
         return redirect("panel_operador")
 
-    nego.estado = "ACEPTADA"
-    nego.save()
-
-    messages.success(request, "Negociación aceptada y transferencia aplicada correctamente.")
+    messages.success(request, msg)
     return redirect("panel_operador")
 
 
-
+@require_POST
 def rechazar_negociacion(request, id):
-    negociacion = get_object_or_404(Negociacion, id=id)
-    negociacion.estado = "RECHAZADA"
-    negociacion.comentario_destino = "Se rechazó la oferta."
-    negociacion.save()
+    get_object_or_404(Negociacion.objects.only("id"), id=id)
+
+    with transaction.atomic():
+        negociacion = Negociacion.objects.select_for_update().get(id=id)
+        if negociacion.estado != "PENDIENTE":
+            messages.error(request, "La negociación ya no está pendiente.")
+            return redirect("panel_operador")
+
+        negociacion.estado = "RECHAZADA"
+        negociacion.comentario_destino = "Se rechazó la oferta."
+        negociacion.save()
     return redirect("panel_operador")
 
 
@@ -502,6 +642,7 @@ def negociar(request, id):
         "neg": nego,
         "ingreso_b": round(ingreso, 2),
         "ganancia_b": round(ingreso - costo, 2),
+        "clave_idempotencia": nueva_clave(),
     })
 
 # -----------------------------------------------------------
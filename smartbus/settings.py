@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,8 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    # Primero: el tiempo "total" y el SQL abarcan toda la pila
+    'core.middleware.PerfilamientoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,8 +56,30 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+
+    # Al final: así el tiempo de "vista" no incluye otros middlewares
+    'core.middleware.PerfilamientoVistaMiddleware',
 ]
 
+# Perfilamiento de requests (opt-in): SMARTBUS_PERFILAMIENTO=1
+# MUESTREO = fracción de requests perfilados (0.0 a 1.0)
+PERFILAMIENTO = {
+    'ACTIVO': os.environ.get('SMARTBUS_PERFILAMIENTO') == '1',
+    'MUESTREO': float(os.environ.get('SMARTBUS_PERFILAMIENTO_MUESTREO', '1.0')),
+    'LOG': BASE_DIR / 'logs' / 'perfilamiento.log',
+    'MAX_BYTES': 5 * 1024 * 1024,
+    'BACKUPS': 5,
+    'TOP': 5,
+}
+
+# Métricas Prometheus en /metrics/. Con varios workers de gunicorn, cada
+# proceso escribe su archivo en DIRECTORIO y el endpoint suma todos
+# (vaciar el directorio al arrancar). TOKEN opcional: "Authorization: Bearer <token>".
+METRICAS = {
+    'DIRECTORIO': os.environ.get('SMARTBUS_METRICAS_DIR'),
+    'TOKEN': os.environ.get('SMARTBUS_METRICAS_TOKEN'),
+}
+
 ROOT_URLCONF = 'smartbus.urls'
 
 TEMPLATES = [
@@ -85,6 +110,70 @@ DATABASES = {
     }
 }
 
+# Perfil de producción de SQLite (opt-in): SMARTBUS_SQLITE_PRODUCCION=1
+# - WAL: los lectores no esperan al que escribe (y viceversa).
+# - BEGIN IMMEDIATE: la transacción toma el bloqueo de escritura al
+#   empezar; con DEFERRED, dos que leen y luego escriben chocan con
+#   "database is locked" sin esperar el timeout.
+# - Pragmas por conexión y conexiones persistentes (CONN_MAX_AGE).
+SQLITE_PRAGMAS_PRODUCCION = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',        # seguro con WAL; fsync solo en checkpoint
+    'cache_size': -32000,           # negativo = KiB → ~32 MB por conexión
+    'mmap_size': 268435456,         # 256 MB
+    'temp_store': 'MEMORY',
+}
+SQLITE_OPCIONES_PRODUCCION = {
+    'init_command': '; '.join(f'PRAGMA {k}={v}' for k, v in SQLITE_PRAGMAS_PRODUCCION.items()),
+    'transaction_mode': 'IMMEDIATE',
+    'timeout': 20,                  # segundos esperando el bloqueo (busy_timeout)
+}
+
+if os.environ.get('SMARTBUS_SQLITE_PRODUCCION') == '1':
+    DATABASES['default'].update({
+        'OPTIONS': SQLITE_OPCIONES_PRODUCCION,
+        'CONN_MAX_AGE': int(os.environ.get('SMARTBUS_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+    })
+
+# Reintento con espera exponencial de las transacciones de transferencia
+# que chocan con un bloqueo (core.reintentos.con_reintentos)
+REINTENTOS_BLOQUEO = {
+    'INTENTOS': 5,
+    'ESPERA': 0.05,     # segundos antes del 2.º intento; se duplica en cada uno
+}
+
+
+# Caché: en memoria del proceso por defecto; con varios workers de
+# gunicorn usar SMARTBUS_CACHE_DIR (FileBasedCache, compartida) para que
+# la invalidación de la caché de ocupación llegue a todos.
+if os.environ.get('SMARTBUS_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['SMARTBUS_CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Caché de ocupación por horario (core.services.CacheOcupacionService)
+OCUPACION_CACHE = {
+    'ACTIVA': True,
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+# Retención temporal de asientos (core.services.retencion_service)
+RETENCION_ASIENTOS = {
+    'TTL': int(os.environ.get('SMARTBUS_RETENCION_TTL', '300')),  # segundos
+    'LOTE_BARRIDO': 500,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -18,12 +18,15 @@ from django.contrib import admin
 from django.urls import path, include
 from django.http import HttpResponseRedirect
 
+from core.views import metricas_prometheus
+
 def redirect_to_login(request):
     return HttpResponseRedirect('/login/')
 
 urlpatterns = [
     path('', redirect_to_login), 
     path('admin/', admin.site.urls),
+    path('metrics/', metricas_prometheus, name='metricas'),
     path('panel/operador/', include('reservas.urls')),
     path('', include('administracion.urls')),
 ]